@@ -0,0 +1,312 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# Run from the repo root or from benchmarks/: python benchmarks/bench_offline.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixture_server import DEFAULT_FIXTURES_DIR, FixtureServer, load_fixture_sites
+
+try:
+    import resource
+except ImportError: # Windows: no peak RSS
+    resource = None
+
+# ==============================================================================
+# Offline end-to-end benchmarks.
+# Replays a fixture set (see fixture_server.py; synthetic_fixtures.py writes a
+# stand-in one if none exists) from local servers with injected latency/jitter
+# and runs the real pipelines against it:
+#   amlegal_sync / amlegal_async   url_queue_builder.build_url_queue
+#   wikipedia_bulk                 wikipedia_scraper.scrape_wikipedia_pages_bulk
+#   municode_many                  municode_archive.get_urls_from_municode_many
+# plus CPU-only parse benchmarks per module on the same bodies:
+#   parse_amlegal  parse_wikipedia  parse_municode  parse_robots
+# Every scenario runs in a fresh process, so peak RSS is its own. Reported:
+#   wall_s, requests, throughput_rps, p50_ms / p99_ms (time to response headers,
+#   from requests' Response.elapsed), items (URLs / pages found - a change means
+#   the output changed, not just the speed), parse_ms, peak_rss_mb.
+# --save-baseline stores the results; later runs compare against them and exit
+# with status 1 when a metric regresses by more than --tolerance.
+#   python benchmarks/bench_offline.py --latency 0.02 --jitter 0.01 --save-baseline
+#   python benchmarks/bench_offline.py --latency 0.02 --jitter 0.01
+# ==============================================================================
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+USER_AGENT = "AvniProjectBot/1.0 (benchmark)"
+
+# Metrics where bigger is better; items must match exactly; everything else is a cost
+_HIGHER_IS_BETTER = ("throughput_rps", "mb_per_s")
+_EXACT = ("items", "requests")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list (None if it is empty)."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def _best_time(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+# --- Network scenarios ---
+# Each takes ({site: base URL}, {site: manifest entry}) and returns the number of items produced.
+
+def _run_amlegal(base_urls, entries, use_async):
+    from url_queue_builder import build_url_queue
+    entry = entries["amlegal"]
+    items = 0
+    for path in entry["start_paths"]:
+        url_queue, _ = build_url_queue("amlegal", base_urls["amlegal"] + path, USER_AGENT, max_depth=entry.get("max_depth", 2),
+                                       use_async=use_async)
+        items += len(url_queue)
+    return items
+
+
+def _run_wikipedia_bulk(base_urls, entries):
+    from wikipedia_scraper import scrape_wikipedia_pages_bulk
+    links = [base_urls["wikipedia"] + path for path in entries["wikipedia"]["article_paths"]]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # parse_workers=0 keeps parsing in this process, so its memory shows up in peak RSS
+        summary = scrape_wikipedia_pages_bulk(links, USER_AGENT, output_path=os.path.join(tmp_dir, "pages.jsonl"), parse_workers=0)
+    return summary["pages"]
+
+
+def _run_municode_many(base_urls, entries):
+    from municode_archive import get_urls_from_municode_many
+    cities = [tuple(city) for city in entries["municode"]["cities"]]
+    results = get_urls_from_municode_many(cities, USER_AGENT, memo_path=None, api_base=base_urls["municode"])
+    return sum(len(url_queue) for url_queue, _ in results.values())
+
+
+NETWORK_SCENARIOS = {
+    "amlegal_sync": ("amlegal", lambda base_urls, entries: _run_amlegal(base_urls, entries, use_async=False)),
+    "amlegal_async": ("amlegal", lambda base_urls, entries: _run_amlegal(base_urls, entries, use_async=True)),
+    "wikipedia_bulk": ("wikipedia", _run_wikipedia_bulk),
+    "municode_many": ("municode", _run_municode_many),
+}
+
+
+# --- Parse scenarios ---
+# Each takes the site's FixtureSite and returns (function to time, bytes it parses).
+
+def _parse_amlegal(site):
+    from bs4 import BeautifulSoup
+    from html_parsing import parse_with
+    from publisher_adapters import AmLegalAdapter
+    adapter = AmLegalAdapter()
+    pages = [(key.endswith("/overview"), body.decode("utf-8")) for key, body in site.bodies("text/html")]
+
+    def run():
+        links = 0
+        for is_root, html in pages:
+            links += len(adapter.extract_links(BeautifulSoup(html, "html.parser"), is_root))
+            links += len(parse_with(html, adapter.link_extractor(is_root)).links)
+        return links
+    return run, sum(len(html) for _, html in pages)
+
+
+def _parse_wikipedia(site):
+    from wikipedia_scraper import extract_wikipedia_page
+    pages = [body.decode("utf-8") for _, body in site.bodies("text/html")]
+    return lambda: sum(len(extract_wikipedia_page(html)[2]) for html in pages), sum(len(html) for html in pages)
+
+
+def _parse_municode(site):
+    from municode_archive import iter_municonext_toc
+    bodies = [body for key, body in site.bodies("application/json") if key.startswith("/CodesContent")]
+    return (lambda: sum(1 for body in bodies for _ in iter_municonext_toc(json.loads(body), "https://library.municode.com")),
+            sum(len(body) for body in bodies))
+
+
+def _parse_robots(site):
+    # Parses every recorded robots.txt and matches every recorded path of every site against it
+    from robots_matcher import CompiledRobotsRules
+    sites = load_fixture_sites(os.path.dirname(site.site_dir))
+    robots = [s.body("/robots.txt").decode("utf-8") for s in sites.values() if "/robots.txt" in s.responses]
+    urls = [f"http://127.0.0.1{key}" for s in sites.values() for key in s.responses]
+
+    def run():
+        allowed = 0
+        for body in robots:
+            allowed += len(CompiledRobotsRules.parse(body, USER_AGENT).can_fetch_many(urls))
+        return allowed
+    return run, sum(len(body) for body in robots)
+
+
+PARSE_SCENARIOS = {
+    "parse_amlegal": ("amlegal", _parse_amlegal),
+    "parse_wikipedia": ("wikipedia", _parse_wikipedia),
+    "parse_municode": ("municode", _parse_municode),
+    "parse_robots": ("amlegal", _parse_robots),
+}
+
+
+def _scenario_child(name, fixtures_dir, base_urls, repeat, conn):
+    # Runs one scenario in a fresh process and sends its metrics back through conn
+    try:
+        sites = load_fixture_sites(fixtures_dir)
+        if name in PARSE_SCENARIOS:
+            site_name, setup = PARSE_SCENARIOS[name]
+            run, n_bytes = setup(sites[site_name])
+            parse_time, items = _best_time(run, repeat)
+            conn.send({"parse_ms": parse_time * 1000, "mb_per_s": n_bytes / parse_time / 1e6 if parse_time else None,
+                       "items": items, "peak_rss_mb": _peak_rss_mb()})
+            return
+
+        import http_client
+        site_name, run = NETWORK_SCENARIOS[name]
+        latencies = []
+        http_client.get_session(base_urls[site_name]).hooks["response"].append(
+            lambda response, *args, **kwargs: latencies.append(response.elapsed.total_seconds())
+        )
+        entries = {site: sites[site].entry for site in sites}
+        best = None
+        for _ in range(repeat):
+            del latencies[:]
+            with contextlib.redirect_stdout(io.StringIO()): # The pipelines print per-page progress
+                start = time.perf_counter()
+                items = run(base_urls, entries)
+                wall = time.perf_counter() - start
+            if best is None or wall < best["wall_s"]:
+                ordered = sorted(latencies)
+                best = {
+                    "wall_s": wall,
+                    "requests": len(ordered),
+                    "throughput_rps": len(ordered) / wall if wall else None,
+                    "p50_ms": percentile(ordered, 0.5) * 1000 if ordered else None,
+                    "p99_ms": percentile(ordered, 0.99) * 1000 if ordered else None,
+                    "items": items,
+                }
+        best["peak_rss_mb"] = _peak_rss_mb()
+        conn.send(best)
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_scenario(name, fixtures_dir, base_urls, repeat):
+    context = multiprocessing.get_context("spawn") # Fresh interpreter: nothing inherited inflates peak RSS
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_scenario_child, args=(name, fixtures_dir, base_urls, repeat, child_conn))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = {"error": f"scenario process exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Prints each metric against the baseline; returns the list of (scenario, metric) that regressed."""
+    regressions = []
+    for name, metrics in results.items():
+        base_metrics = baseline.get(name)
+        if not base_metrics or "error" in metrics:
+            continue
+        for metric, value in metrics.items():
+            base_value = base_metrics.get(metric)
+            if value is None or base_value is None:
+                continue
+            if metric in _EXACT:
+                regressed = value != base_value
+            elif metric in _HIGHER_IS_BETTER:
+                regressed = value < base_value * (1 - tolerance)
+            else:
+                regressed = value > base_value * (1 + tolerance)
+            change = (value - base_value) / base_value * 100 if base_value else 0.0
+            verdict = "REGRESSION" if regressed else "ok"
+            print(f"  {name:<16} {metric:<15} {value:12.2f} {base_value:12.2f} {change:+8.1f}%  {verdict}")
+            if regressed:
+                regressions.append((name, metric))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Offline benchmarks against recorded fixtures.")
+    arg_parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Fixture set directory")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="Seconds the stand-in servers add to every response")
+    arg_parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay per response, up to this many seconds")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario (best is reported)")
+    arg_parser.add_argument("--scenarios", nargs="+", choices=sorted(NETWORK_SCENARIOS) + sorted(PARSE_SCENARIOS),
+                            help="Scenarios to run (default: all the fixture set has sites for)")
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results file")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before a metric counts as regressed")
+    args = arg_parser.parse_args()
+
+    if not load_fixture_sites(args.fixtures):
+        from synthetic_fixtures import write_synthetic_fixtures
+        print(f"No fixtures in {args.fixtures}; writing the synthetic stand-in set")
+        write_synthetic_fixtures(args.fixtures)
+
+    settings = {"latency": args.latency, "jitter": args.jitter, "repeat": args.repeat}
+    results = {}
+    with FixtureServer(args.fixtures, args.latency, args.jitter) as server:
+        base_urls = {site: server.base_url(site) for site in server.sites}
+        all_scenarios = dict(NETWORK_SCENARIOS, **PARSE_SCENARIOS)
+        names = args.scenarios or [name for name, (site, _) in all_scenarios.items() if site in server.sites]
+        print(f"Fixtures: {args.fixtures} ({', '.join(server.sites)}); latency={args.latency}s jitter={args.jitter}s\n")
+        for name in names:
+            if all_scenarios[name][0] not in server.sites:
+                print(f"  {name:<16} skipped: no {all_scenarios[name][0]} fixtures")
+                continue
+            metrics = run_scenario(name, args.fixtures, base_urls, args.repeat)
+            results[name] = metrics
+            if "error" in metrics:
+                print(f"  {name:<16} ERROR {metrics['error']}")
+            else:
+                print(f"  {name:<16} " + "  ".join(f"{metric}={value:.2f}" if isinstance(value, float) else f"{metric}={value}"
+                                                  for metric, value in metrics.items() if value is not None))
+
+    status = 0
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "scenarios": results}, f, indent=1, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print(f"\nWarning: baseline was taken with {baseline.get('settings')}, this run used {settings}")
+        print(f"\nCompared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline.get("scenarios", {}), args.tolerance)
+        print(f"\n{len(regressions)} regression(s)" + (": " + ", ".join(f"{n}.{m}" for n, m in regressions) if regressions else ""))
+        status = 1 if regressions else 0
+    if any("error" in metrics for metrics in results.values()):
+        status = 1
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import time
+from urllib.parse import urljoin
+
+# Run from the repo root or from benchmarks/: python benchmarks/bench_wikipedia_parsing.py saved_article.html ...
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_parsing import available_backends
+from wikipedia_scraper import extract_wikipedia_page
+
+# ==============================================================================
+# Parsing benchmark for scrape_wikipedia_page on saved article HTML.
+# Compares the original BeautifulSoup("html.parser") + repeated find_all
+# extraction against the single-pass extractor on every installed backend,
+# and checks that they all extract the same text, tables and links.
+# Save an article with e.g.:
+#   curl -A "AvniProjectBot/1.0" https://en.wikipedia.org/wiki/Chicago -o chicago.html
+# ==============================================================================
+
+
+def legacy_extract(html):
+    # The extraction scrape_wikipedia_page used before the single-pass extractor, minus the prints,
+    # with its div exclusion fixed (it passed CSS selectors to find() as tag names)
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    article_text_parts = []
+    content_div = soup.find("div", id="mw-content-text")
+    if content_div:
+        parser_output_div = content_div.find("div", class_="mw-parser-output")
+        if parser_output_div:
+            for p_tag in parser_output_div.find_all("p", recursive=False):
+                article_text_parts.append(p_tag.get_text(separator=" ", strip=True))
+            for child_element in parser_output_div.find_all(recursive=False):
+                if child_element.name == 'div' and not child_element.select_one(
+                        'table, .infobox, .thumb, .tright, .tleft, .rellink, .noprint, .mw-references-wrap'):
+                    for p_tag_in_div in child_element.find_all("p"):
+                        article_text_parts.append(p_tag_in_div.get_text(separator=" ", strip=True))
+    main_text = "\n\n".join(filter(None, article_text_parts))
+
+    tables_data = []
+    for table_tag in soup.find_all("table", class_="wikitable"):
+        current_table_data = []
+        for row in table_tag.find_all("tr"):
+            row_data = [cell.get_text(separator=" ", strip=True) for cell in row.find_all(["th", "td"])]
+            if row_data:
+                current_table_data.append(row_data)
+        if current_table_data:
+            tables_data.append(current_table_data)
+
+    links = set()
+    search_area_for_links = content_div if content_div else soup
+    for link_tag in search_area_for_links.find_all("a", href=True):
+        href = link_tag["href"]
+        if href.startswith("/wiki/") and ":" not in href:
+            links.add(urljoin("https://en.wikipedia.org", href))
+    return main_text, tables_data, sorted(links)
+
+
+def best_time(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark Wikipedia HTML extraction backends.")
+    arg_parser.add_argument("html_files", nargs="+", help="Saved Wikipedia article HTML files")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = arg_parser.parse_args()
+
+    for path in args.html_files:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        print(f"\n=== {path} ({len(html) / 1024:.0f} KiB) ===")
+
+        legacy_time, legacy_result = best_time(lambda: legacy_extract(html), args.repeat)
+        print(f"  {'legacy bs4/html.parser':<24} {legacy_time * 1000:9.1f} ms")
+
+        for backend in available_backends():
+            backend_time, result = best_time(lambda: extract_wikipedia_page(html, backend), args.repeat)
+            same = "same output" if result == legacy_result else "OUTPUT DIFFERS"
+            print(f"  {backend:<24} {backend_time * 1000:9.1f} ms  {legacy_time / backend_time:5.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
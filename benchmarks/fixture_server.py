@@ -0,0 +1,258 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Run from the repo root or from benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ==============================================================================
+# Recorded HTTP fixtures and a local stand-in server that replays them.
+# A fixture set is a directory with one sub-directory per site:
+#   <fixtures>/<site>/manifest.json   {"entry": {...}, "responses": {key: response}}
+#   <fixtures>/<site>/bodies/<hash>   raw response bodies
+# key is the request path plus its query with the parameters sorted (see
+# fixture_key), so the order requests puts params in doesn't matter.
+# Each site is served on its own port, so the absolute-path hrefs of the
+# recorded pages ("/codes/...", "/wiki/...") resolve back to the same site.
+# latency/jitter (seconds) delay every response: latency + uniform(0, jitter).
+#
+# Record live responses with:
+#   python benchmarks/fixture_server.py record amlegal https://codelibrary.amlegal.com/codes/tippecanoe/latest/overview
+#   python benchmarks/fixture_server.py record wikipedia https://en.wikipedia.org/wiki/Monowi,_Nebraska ...
+#   python benchmarks/fixture_server.py record municode miami:fl tampa:fl
+# Serve a fixture set by hand with:
+#   python benchmarks/fixture_server.py serve --latency 0.05
+# ==============================================================================
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Response headers worth replaying; everything else (dates, cookies, CDN ids) is dropped
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires", "Retry-After")
+
+
+def fixture_key(path_url):
+    """Manifest key for a request path with query ("/Clients/name?stateAbbr=fl&clientName=miami")."""
+    split_url = urlsplit(path_url)
+    path = split_url.path or "/"
+    if not split_url.query:
+        return path
+    return path + "?" + urlencode(sorted(parse_qsl(split_url.query, keep_blank_values=True)))
+
+
+class FixtureSite:
+    """One site's recorded responses: manifest entry points plus key -> (status, headers, body path)."""
+
+    def __init__(self, site_dir):
+        self.site_dir = site_dir
+        self.name = os.path.basename(os.path.normpath(site_dir))
+        manifest_path = os.path.join(site_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        else:
+            manifest = {}
+        self.entry = manifest.get("entry", {})
+        self.responses = manifest.get("responses", {})
+
+    def add(self, path_url, status, headers, body):
+        """Stores one response (body as bytes); call save() afterwards."""
+        key = fixture_key(path_url)
+        body_name = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        os.makedirs(os.path.join(self.site_dir, "bodies"), exist_ok=True)
+        with open(os.path.join(self.site_dir, "bodies", body_name), "wb") as f:
+            f.write(body)
+        kept = {name: headers[name] for name in _KEPT_HEADERS if name in headers}
+        self.responses[key] = {"status": status, "headers": kept, "body": body_name}
+
+    def body(self, key):
+        with open(os.path.join(self.site_dir, "bodies", self.responses[key]["body"]), "rb") as f:
+            return f.read()
+
+    def bodies(self, content_type):
+        """(key, body) for every recorded 200 response whose Content-Type starts with content_type."""
+        for key, response in sorted(self.responses.items()):
+            if response["status"] == 200 and response["headers"].get("Content-Type", "").startswith(content_type):
+                yield key, self.body(key)
+
+    def save(self):
+        os.makedirs(self.site_dir, exist_ok=True)
+        tmp_path = os.path.join(self.site_dir, "manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entry": self.entry, "responses": self.responses}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, os.path.join(self.site_dir, "manifest.json"))
+
+
+def load_fixture_sites(fixtures_dir=DEFAULT_FIXTURES_DIR):
+    """{site name: FixtureSite} for every site directory with a manifest."""
+    sites = {}
+    if os.path.isdir(fixtures_dir):
+        for name in sorted(os.listdir(fixtures_dir)):
+            if os.path.exists(os.path.join(fixtures_dir, name, "manifest.json")):
+                sites[name] = FixtureSite(os.path.join(fixtures_dir, name))
+    return sites
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real sites
+
+    def do_GET(self):
+        server = self.server
+        response = server.site.responses.get(fixture_key(self.path))
+        delay = server.latency + (random.uniform(0, server.jitter) if server.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if response is None:
+            status, headers, body = 404, {"Content-Type": "text/plain"}, b"No fixture recorded for this URL\n"
+        else:
+            status, headers, body = response["status"], response["headers"], server.site.body(fixture_key(self.path))
+        with server.stats_lock:
+            server.requests_served += 1
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Quiet; a benchmark makes thousands of requests
+
+
+class FixtureServer:
+    """
+    Serves every site of a fixture set on 127.0.0.1, one port per site, from a background thread.
+    Use as a context manager; base_url(site) is the site's "http://127.0.0.1:port".
+    """
+
+    def __init__(self, fixtures_dir=DEFAULT_FIXTURES_DIR, latency=0.0, jitter=0.0):
+        self.sites = load_fixture_sites(fixtures_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self._servers = {}
+
+    def start(self):
+        for name, site in self.sites.items():
+            server = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+            server.daemon_threads = True
+            server.site = site
+            server.latency = self.latency
+            server.jitter = self.jitter
+            server.requests_served = 0
+            server.stats_lock = threading.Lock()
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._servers[name] = server
+        return self
+
+    def base_url(self, site):
+        return f"http://127.0.0.1:{self._servers[site].server_port}"
+
+    def requests_served(self, site=None):
+        servers = [self._servers[site]] if site else self._servers.values()
+        return sum(server.requests_served for server in servers)
+
+    def stop(self):
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+        self._servers = {}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+# --- Recording ---
+# Runs the project's own fetchers against the live site with a response hook on the
+# pooled session (http_client), so exactly the requests a real run makes get recorded.
+
+def _recording_hook(site):
+    def hook(response, *args, **kwargs):
+        body = response.content
+        site.add(response.request.path_url, response.status_code, response.headers, body)
+        raw = io.BytesIO(body) # Streaming readers (ijson) read .raw, which .content just drained
+        raw.decode_content = True
+        response.raw = raw
+        return response
+    return hook
+
+
+def record(site_name, targets, fixtures_dir=DEFAULT_FIXTURES_DIR, user_agent="AvniProjectBot/1.0", max_depth=2):
+    """
+    Records a site. targets: AmLegal overview URLs, Wikipedia article URLs or Municode "city:st" pairs.
+    The entry points are stored in the manifest so the benchmark knows where to start.
+    """
+    import http_client
+
+    site = FixtureSite(os.path.join(fixtures_dir, site_name))
+    hook = _recording_hook(site)
+
+    def attach(url):
+        hooks = http_client.get_session(url).hooks["response"]
+        if hook not in hooks:
+            hooks.append(hook)
+
+    if site_name == "amlegal":
+        from url_queue_builder import build_url_queue
+        for url in targets:
+            attach(url)
+            http_client.get(urlsplit(url)._replace(path="/robots.txt", query="").geturl(), headers={"User-Agent": user_agent}, timeout=10)
+            build_url_queue("amlegal", url, user_agent, max_depth=max_depth)
+        site.entry = {"start_paths": [urlsplit(url).path for url in targets], "max_depth": max_depth}
+    elif site_name == "wikipedia":
+        for url in targets:
+            attach(url)
+            response = http_client.get(url, headers={"User-Agent": user_agent}, timeout=15)
+            print(f"  {response.status_code} {url}")
+        http_client.get(urlsplit(targets[0])._replace(path="/robots.txt", query="").geturl(), headers={"User-Agent": user_agent}, timeout=10)
+        site.entry = {"article_paths": [urlsplit(url).path for url in targets]}
+    elif site_name == "municode":
+        from municode_archive import MUNICODE_API_BASE, get_urls_from_municode_many
+        attach(MUNICODE_API_BASE)
+        cities = [tuple(target.split(":", 1)) for target in targets]
+        get_urls_from_municode_many(cities, user_agent, memo_path=None)
+        site.entry = {"cities": [list(city) for city in cities]}
+    else:
+        raise ValueError(f"Unknown site {site_name!r}; choose amlegal, wikipedia or municode")
+    site.save()
+    print(f"Recorded {len(site.responses)} responses into {site.site_dir}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Record or serve HTTP fixtures for the offline benchmarks.")
+    arg_parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Fixture set directory")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Record live responses for one site")
+    record_parser.add_argument("site", choices=("amlegal", "wikipedia", "municode"))
+    record_parser.add_argument("targets", nargs="+", help="Overview/article URLs, or city:st pairs for Municode")
+    record_parser.add_argument("--user-agent", default="AvniProjectBot/1.0")
+    record_parser.add_argument("--max-depth", type=int, default=2, help="AmLegal crawl depth")
+    serve_parser = commands.add_parser("serve", help="Serve a fixture set until interrupted")
+    serve_parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    serve_parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay, up to this many seconds")
+    args = arg_parser.parse_args()
+
+    if args.command == "record":
+        record(args.site, args.targets, args.fixtures, args.user_agent, args.max_depth)
+        return
+    with FixtureServer(args.fixtures, args.latency, args.jitter) as server:
+        for site in server.sites:
+            print(f"  {site:<10} {server.base_url(site)}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
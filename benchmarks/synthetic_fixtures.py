@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixture_server import DEFAULT_FIXTURES_DIR, FixtureSite
+
+# ==============================================================================
+# Deterministic stand-in fixtures, for machines that can't (or shouldn't) record
+# the live sites. The pages copy the structure the scrapers key on - AmLegal's
+# codenav__toc / #codecontent / Normal-Level divs, Wikipedia's skin around
+# div.mw-parser-output with an infobox and wikitables, Municode's Clients /
+# Products / Jobs / CodesContent JSON - padded with navigation, scripts and
+# boilerplate to realistic page sizes. Same seed -> byte-identical fixtures,
+# so baselines taken on them stay comparable.
+# Recorded fixtures (fixture_server.py record ...) replace these site by site.
+# ==============================================================================
+
+_WORDS = ("ordinance", "section", "shall", "permit", "zoning", "district", "the", "of", "and", "any", "person",
+          "residential", "animal", "council", "village", "county", "river", "census", "population", "within",
+          "provided", "that", "no", "structure", "may", "be", "located", "feet", "from", "property", "line")
+
+_ROBOTS_TXT = b"User-agent: *\nDisallow: /search\nDisallow: /w/\nAllow: /w/load.php\nDisallow: /*?print=\n"
+
+
+def _sentence(rng, n_words):
+    return " ".join(rng.choice(_WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def _boilerplate(rng, n_links):
+    # Site chrome every real page carries: nav links, an inline script and a footer
+    nav = "".join(f'<li><a href="/help/topic-{i}">Help topic {i}</a></li>' for i in range(n_links))
+    script = "<script>window.__STATE__ = " + json.dumps({"k%d" % i: rng.random() for i in range(40)}) + ";</script>"
+    return f'<nav><ul>{nav}</ul></nav>{script}', f'<footer><p>{_sentence(rng, 40)}</p></footer>'
+
+
+def _add_html(site, path, html):
+    site.add(path, 200, {"Content-Type": "text/html; charset=utf-8"}, html.encode("utf-8"))
+
+
+def _amlegal_site(fixtures_dir, rng, chapters, sections):
+    site = FixtureSite(os.path.join(fixtures_dir, "amlegal"))
+    code = "/codes/benchville/latest"
+    head, foot = _boilerplate(rng, 60)
+    toc = "".join(
+        f'<div class="toc-entry"><div class="toc-entry__wrap"><a href="{code}/benchville_in/0-0-0-{c}">Chapter {c}</a>'
+        f'<span class="toc-entry__count">{sections}</span></div></div>'
+        for c in range(1, chapters + 1)
+    )
+    _add_html(site, f"{code}/overview",
+              f'<html><head><title>Benchville</title></head><body>{head}<div class="codenav__toc">{toc}</div>{foot}</body></html>')
+    for c in range(1, chapters + 1):
+        items = "".join(
+            f'<div class="Normal-Level"><a href="{code}/benchville_in/0-0-0-{c * 1000 + s}">§ {c}.{s:02d}</a> {_sentence(rng, 6)}</div>'
+            f'<div class="Section"><p>{" ".join(_sentence(rng, rng.randint(12, 40)) for _ in range(rng.randint(2, 6)))}</p></div>'
+            for s in range(1, sections + 1)
+        )
+        _add_html(site, f"{code}/benchville_in/0-0-0-{c}",
+                  f'<html><head><title>Chapter {c}</title></head><body>{head}'
+                  f'<div id="codecontent"><h1>CHAPTER {c}</h1>{items}</div>{foot}</body></html>')
+        for s in range(1, sections + 1): # Leaf pages, only fetched by fingerprinting crawls
+            _add_html(site, f"{code}/benchville_in/0-0-0-{c * 1000 + s}",
+                      f'<html><head><title>§ {c}.{s:02d}</title></head><body>{head}'
+                      f'<div id="codecontent"><h2>§ {c}.{s:02d}</h2><p>{_sentence(rng, rng.randint(40, 200))}</p></div>{foot}</body></html>')
+    site.add("/robots.txt", 200, {"Content-Type": "text/plain"}, _ROBOTS_TXT)
+    site.entry = {"start_paths": [f"{code}/overview"], "max_depth": 2}
+    site.save()
+
+
+def _wikipedia_article(rng, title, n_sections):
+    parts = [
+        f'<!DOCTYPE html><html><head><title>{title} - Wikipedia</title><script>var conf={{"wgTitle":"{title}"}};</script></head><body>',
+        '<div id="mw-navigation"><a href="/wiki/Main_Page">Main page</a><a href="/wiki/Special:Random">Random</a></div>',
+        '<div id="mw-content-text" class="mw-body-content"><div class="mw-content-ltr mw-parser-output" lang="en">',
+        f'<table class="infobox ib-settlement vcard"><tbody><tr><th colspan="2">{title}</th></tr>'
+        f'<tr><th>Country</th><td><a href="/wiki/United_States">United States</a></td></tr>'
+        f'<tr><th>Population</th><td>{rng.randint(1, 90000):,}<sup><a href="#cite_note-1">[1]</a></sup></td></tr>'
+        f'<tr><th>Area</th><td>{rng.uniform(0.2, 40):.2f} sq mi</td></tr>'
+        f'<tr><th>Coordinates</th><td>{rng.randint(25, 48)}°{rng.randint(0, 59)}′N {rng.randint(70, 120)}°{rng.randint(0, 59)}′W</td></tr>'
+        '</tbody></table>',
+        f'<p><b>{title}</b> is a <a href="/wiki/Village_(United_States)">village</a> in '
+        f'<a href="/wiki/County_{rng.randint(1, 300)}">County {rng.randint(1, 300)}</a>. {_sentence(rng, 30)}</p>',
+    ]
+    for s in range(n_sections):
+        parts.append(f'<div class="mw-heading mw-heading2"><h2 id="S{s}">Section {s}</h2>'
+                     f'<span class="mw-editsection"><a href="/w/index.php?title=X&amp;action=edit&amp;section={s}">edit</a></span></div>')
+        for k in range(rng.randint(2, 5)):
+            words = " ".join(rng.choice((
+                rng.choice(_WORDS), rng.choice(_WORDS), rng.choice(_WORDS),
+                f'<a href="/wiki/Town_{rng.randint(0, 500)}">town</a>',
+                f'<a href="/wiki/File:Map_{k}.png">map</a>',
+                f'<sup><a href="#cite_note-{k}">[{k}]</a></sup>',
+                '<a href="https://example.org/source">source</a>',
+            )) for _ in range(rng.randint(30, 80)))
+            parts.append(f"<p>{words}</p>")
+        if s % 3 == 0:
+            rows = "".join(
+                f'<tr><td>{1900 + 10 * i}</td><td>{rng.randint(10, 99999):,}</td><td>{rng.uniform(-20, 40):.1f}%</td>'
+                f'<td>May {i % 28 + 1}, {1900 + 10 * i}</td></tr>'
+                for i in range(rng.randint(8, 20))
+            )
+            parts.append('<table class="wikitable"><tbody><tr><th rowspan="2">Year</th><th colspan="2">Population</th>'
+                         f'<th rowspan="2">Census date</th></tr><tr><th>Total</th><th>Change</th></tr>{rows}</tbody></table>')
+    parts.append('<div class="reflist"><ol class="references">'
+                 + "".join(f'<li id="cite_note-{i}">{_sentence(rng, 10)}</li>' for i in range(20)) + "</ol></div>")
+    parts.append('</div></div><div id="catlinks"><a href="/wiki/Category:Villages">Villages</a></div></body></html>')
+    return "".join(parts)
+
+
+def _wikipedia_site(fixtures_dir, rng, articles):
+    site = FixtureSite(os.path.join(fixtures_dir, "wikipedia"))
+    paths = []
+    for i in range(articles):
+        title = f"Benchtown_{i},_Nebraska"
+        _add_html(site, f"/wiki/{title}", _wikipedia_article(rng, title.replace("_", " "), rng.randint(8, 30)))
+        paths.append(f"/wiki/{title}")
+    site.add("/robots.txt", 200, {"Content-Type": "text/plain"}, _ROBOTS_TXT)
+    site.entry = {"article_paths": paths}
+    site.save()
+
+
+def _municode_toc(rng, depth, breadth, path=""):
+    nodes = []
+    for i in range(breadth):
+        node_path = f"{path}{'_' if path else ''}CH{i}" if depth == 0 else f"{path}_S{i}"
+        node = {"NodePath": node_path, "Title": _sentence(rng, 4)}
+        if depth < 2:
+            node["ChildNodes"] = _municode_toc(rng, depth + 1, breadth, node_path)
+        nodes.append(node)
+    return nodes
+
+
+def _municode_site(fixtures_dir, rng, cities):
+    site = FixtureSite(os.path.join(fixtures_dir, "municode"))
+    json_headers = {"Content-Type": "application/json; charset=utf-8"}
+    city_list = []
+    for i in range(cities):
+        city, state = f"benchcity{i}", "ne"
+        client_id, product_id, job_id = 1000 + i, 5000 + i, 9000 + i
+        site.add(f"/Clients/name?clientName={city}&stateAbbr={state}", 200, json_headers, json.dumps({"ClientID": client_id}).encode())
+        site.add(f"/Products/name?clientId={client_id}&productName=code of ordinances", 200, json_headers,
+                 json.dumps({"ProductID": product_id}).encode())
+        site.add(f"/Jobs/latest/{product_id}", 200, json_headers, json.dumps({"Id": job_id}).encode())
+        toc = {"Docs": [{"NodePath": "TIT1", "Title": "Code of ordinances", "ChildNodes": _municode_toc(rng, 0, rng.randint(6, 10))}]}
+        site.add(f"/CodesContent?jobId={job_id}&productId={product_id}", 200, json_headers, json.dumps(toc).encode())
+        city_list.append([city, state])
+    site.entry = {"cities": city_list}
+    site.save()
+
+
+def write_synthetic_fixtures(fixtures_dir=DEFAULT_FIXTURES_DIR, seed=0, chapters=25, sections=20, articles=20, cities=10):
+    """Writes the amlegal, wikipedia and municode stand-in sites into fixtures_dir."""
+    rng = random.Random(seed)
+    _amlegal_site(fixtures_dir, rng, chapters, sections)
+    _wikipedia_site(fixtures_dir, rng, articles)
+    _municode_site(fixtures_dir, rng, cities)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Write deterministic stand-in fixtures for the offline benchmarks.")
+    arg_parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Fixture set directory")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    write_synthetic_fixtures(args.fixtures, args.seed)
+    print(f"Wrote synthetic fixtures to {args.fixtures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import hashlib
+import re
+import sqlite3
+import time
+
+# ==============================================================================
+# Content fingerprints for incremental re-indexing of municipal codes.
+# Each ordinance page's text is normalized (lowercased, split into words, so
+# markup, whitespace and punctuation differences don't count) and reduced to a
+# 64-bit SimHash over word shingles. FingerprintSnapshot keeps the fingerprints
+# of the last run in SQLite and, given this run's, reports which URLs were
+# added, removed or changed since then.
+# ==============================================================================
+
+_WORD = re.compile(r"\w+")
+
+_SHINGLE_SIZE = 3 # Words per feature: order matters, so a moved sentence still changes the hash
+
+
+def normalize_text(text):
+    """Lowercased word tokens of text."""
+    return _WORD.findall(text.lower())
+
+
+def _as_signed(value):
+    # SQLite INTEGER is signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def simhash(text, shingle_size=_SHINGLE_SIZE):
+    """
+    64-bit SimHash (as a signed int, ready for SQLite) of text's normalized words.
+    Similar texts get fingerprints a small Hamming distance apart; identical
+    normalized text always gives the same fingerprint.
+    """
+    words = normalize_text(text)
+    if len(words) < shingle_size:
+        features = {" ".join(words)}
+    else:
+        features = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+
+    hashes = [
+        int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for feature in features
+    ]
+    half = len(hashes) / 2
+    fingerprint = 0
+    for bit in range(64):
+        # Majority vote per bit (every feature weighs the same)
+        if sum((h >> bit) & 1 for h in hashes) > half:
+            fingerprint |= 1 << bit
+    return _as_signed(fingerprint)
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two fingerprints."""
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+class FingerprintSnapshot:
+    """
+    Fingerprints from the previous run, stored in one SQLite file per crawl.
+    change_threshold: Hamming distance above which a page counts as changed;
+    0 (the default) reports any change in the normalized text.
+    """
+
+    def __init__(self, path, change_threshold=0):
+        self.path = path
+        self.change_threshold = change_threshold
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints (url TEXT PRIMARY KEY, fingerprint INTEGER, updated_at REAL NOT NULL)"
+        )
+
+    def load(self):
+        """Returns {url: fingerprint} from the last update (fingerprint is None if it was never fetched)."""
+        return dict(self._conn.execute("SELECT url, fingerprint FROM fingerprints"))
+
+    def update(self, urls, fingerprints):
+        """
+        Compares this run against the stored snapshot, then stores this run.
+        urls: every URL discovered this run.
+        fingerprints: {url: fingerprint} for the URLs whose content was fetched; a URL
+        without one (fetch failed, resumed run) keeps its old fingerprint and is not
+        reported as changed.
+        Returns {"added": [...], "removed": [...], "changed": [...]} with sorted URLs.
+        """
+        previous = self.load()
+        current = set(urls)
+        added = sorted(current - previous.keys())
+        removed = sorted(previous.keys() - current)
+        changed = []
+        for url in sorted(current & previous.keys()):
+            new = fingerprints.get(url)
+            if new is None:
+                continue
+            old = previous[url]
+            if old is None or hamming_distance(old, new) > self.change_threshold:
+                changed.append(url)
+
+        now = time.time()
+        with self._conn:
+            self._conn.executemany("DELETE FROM fingerprints WHERE url = ?", ((url,) for url in removed))
+            self._conn.executemany(
+                "INSERT INTO fingerprints (url, fingerprint, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET fingerprint = COALESCE(excluded.fingerprint, fingerprint), "
+                "updated_at = excluded.updated_at",
+                ((url, fingerprints.get(url), now) for url in current),
+            )
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,171 @@
+import hashlib
+import math
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit
+
+# ==============================================================================
+# BFS frontier for the code-library crawlers.
+# URLs are canonicalized once, when they are enqueued, and deduplicated on a
+# compact 64-bit key, so the same page never sits in the queue twice (whatever
+# its fragment, host casing or explicit default port). Paths and queries are kept
+# byte for byte: servers may treat parameter order or percent-encoding as
+# significant, and merging two different URLs would silently drop a page.
+# ==============================================================================
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def canonicalize_url(url):
+    """
+    Canonical form used for dedup and for the final url_queue:
+    fragment stripped, scheme/host lowercased, default port dropped,
+    empty path replaced by "/"; the query is left exactly as it was.
+    """
+    return _canonicalize(url)[0]
+
+
+def _canonicalize(url):
+    # Returns (canonical_url, canonical_netloc) from a single urlsplit
+    split_url = urlsplit(url)
+    scheme = split_url.scheme.lower()
+    netloc = split_url.netloc.lower()
+    host, sep, port = netloc.rpartition(":")
+    if sep and _DEFAULT_PORTS.get(scheme) == port:
+        netloc = host
+    return urlunsplit((scheme, netloc, split_url.path or "/", split_url.query, "")), netloc
+
+
+def canonical_host(url):
+    """Host part of the canonical URL (lowercased, default port dropped)."""
+    return _canonicalize(url)[1]
+
+
+def url_key(canonical_url):
+    """64-bit signed integer key for a canonical URL (fits an SQLite INTEGER)."""
+    digest = hashlib.blake2b(canonical_url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class CrawlFrontier:
+    """
+    FIFO frontier with O(1) enqueue/dequeue (collections.deque) and
+    enqueue-time dedup. Only 64-bit keys are kept for the seen set, not the
+    URL strings themselves.
+    If allowed_host is given (see canonical_host), URLs on any other host are rejected.
+    track_new_keys=True remembers keys added since the last drain_new_keys() call,
+    so a checkpoint only has to write the new ones (see crawl_state).
+    """
+
+    def __init__(self, allowed_host=None, track_new_keys=False):
+        self.allowed_host = allowed_host
+        self._queue = deque() # (canonical_url, depth)
+        self._seen = set()    # url_key() of everything ever enqueued
+        self._new_keys = [] if track_new_keys else None
+
+    def add(self, url, depth):
+        """Enqueues url at depth. Returns the canonical URL, or None if it was rejected or already seen."""
+        canonical, netloc = _canonicalize(url)
+        if self.allowed_host is not None and netloc != self.allowed_host:
+            return None
+        key = url_key(canonical)
+        if key in self._seen:
+            return None
+        self._seen.add(key)
+        if self._new_keys is not None:
+            self._new_keys.append(key)
+        self._queue.append((canonical, depth))
+        return canonical
+
+    def requeue(self, url, depth):
+        """Enqueues url even if it was seen before (used to retry failed pages on resume)."""
+        canonical = canonicalize_url(url)
+        self._seen.add(url_key(canonical))
+        self._queue.append((canonical, depth))
+        return canonical
+
+    def pop(self):
+        return self._queue.popleft()
+
+    def pop_level(self):
+        """Dequeues every entry at the depth currently at the head of the queue."""
+        if not self._queue:
+            return []
+        depth = self._queue[0][1]
+        level = []
+        while self._queue and self._queue[0][1] == depth:
+            level.append(self._queue.popleft())
+        return level
+
+    def pending(self):
+        """Snapshot of the queue as a list of (canonical_url, depth)."""
+        return list(self._queue)
+
+    def drain_new_keys(self):
+        keys = self._new_keys or []
+        if self._new_keys is not None:
+            self._new_keys = []
+        return keys
+
+    def restore(self, entries, seen_keys):
+        """Reloads a saved queue and seen-key set (entries must already be canonical)."""
+        self._queue.extend(entries)
+        self._seen.update(seen_keys)
+
+    def __contains__(self, url):
+        return url_key(canonicalize_url(url)) in self._seen
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __bool__(self):
+        return bool(self._queue)
+
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set of strings for very large visited sets: about
+    1.2 MB per million items at error_rate=0.01, whatever the item length.
+    Membership tests never miss an added item; unseen items test positive with
+    probability error_rate once capacity items are in.
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+
+    def _positions(self, item):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit blake2b digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        """Adds item. Returns False if it was (probably) already present."""
+        bits = self._bits
+        new = False
+        for position in self._positions(item):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        if new:
+            self._count += 1
+        return new
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self):
+        """Number of distinct items added (approximate: false positives are not counted)."""
+        return self._count
+
+    @property
+    def size_bytes(self):
+        return len(self._bits)
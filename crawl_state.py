@@ -0,0 +1,106 @@
+import sqlite3
+import time
+
+# ==============================================================================
+# Resumable crawl state for the code-library crawlers.
+# The frontier, the seen-URL keys, the discovered ordinance URLs and per-URL
+# errors are checkpointed to one SQLite file. Seen keys and discovered URLs are
+# append-only (only what is new since the last checkpoint is written); an
+# error row is dropped once a resumed crawl fetches its URL successfully; the
+# frontier table is rewritten each checkpoint. Each checkpoint is one
+# transaction, so a crash leaves the previous complete checkpoint behind.
+# ==============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS frontier (seq INTEGER PRIMARY KEY, url TEXT NOT NULL, depth INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS seen (key INTEGER PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS discovered (url TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS errors (url TEXT PRIMARY KEY, depth INTEGER NOT NULL, error TEXT, attempts INTEGER NOT NULL DEFAULT 1);
+"""
+
+
+class CrawlCheckpoint:
+    """
+    Checkpoint file for one crawl root. Raises ValueError if path already holds
+    the state of a different root URL.
+    max_attempts: failed pages are re-queued on resume until they have failed this many times.
+    """
+
+    def __init__(self, path, root_url, max_attempts=3):
+        self.path = path
+        self.root_url = root_url
+        self.max_attempts = max_attempts
+        self._retrying = set() # Failed URLs load() put back in the frontier
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        stored_root = self._meta("root_url")
+        if stored_root is None:
+            with self._conn:
+                self._set_meta("root_url", root_url)
+        elif stored_root != root_url:
+            self._conn.close()
+            raise ValueError(f"Checkpoint {path} belongs to {stored_root}, not {root_url}")
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def is_complete(self):
+        return self._meta("status") == "complete"
+
+    def load(self, frontier):
+        """
+        Restores saved state into frontier (a crawl_frontier.CrawlFrontier).
+        Returns the list of discovered URLs, or None if nothing was saved yet.
+        """
+        if self._meta("status") is None:
+            return None
+        entries = self._conn.execute("SELECT url, depth FROM frontier ORDER BY seq").fetchall()
+        seen_keys = [row[0] for row in self._conn.execute("SELECT key FROM seen")]
+        frontier.restore(entries, seen_keys)
+        if not self.is_complete:
+            retry = self._conn.execute(
+                "SELECT url, depth FROM errors WHERE attempts < ?", (self.max_attempts,)
+            ).fetchall()
+            for url, depth in retry:
+                frontier.requeue(url, depth)
+                self._retrying.add(url)
+        return [row[0] for row in self._conn.execute("SELECT url FROM discovered")]
+
+    def save(self, frontier, new_discovered=(), new_errors=(), complete=False, fetched=()):
+        """
+        Writes one checkpoint: the current frontier plus everything new since the last save.
+        new_errors: (url, depth, error message) tuples.
+        fetched: URLs fetched successfully since the last save; the errors of retried ones are cleared.
+        """
+        resolved = [(url,) for url in fetched if url in self._retrying] if self._retrying else []
+        with self._conn:
+            self._conn.executemany("DELETE FROM errors WHERE url = ?", resolved)
+            self._conn.execute("DELETE FROM frontier")
+            self._conn.executemany("INSERT INTO frontier (url, depth) VALUES (?, ?)", frontier.pending())
+            self._conn.executemany("INSERT OR IGNORE INTO seen (key) VALUES (?)",
+                                   ((key,) for key in frontier.drain_new_keys()))
+            self._conn.executemany("INSERT OR IGNORE INTO discovered (url) VALUES (?)",
+                                   ((url,) for url in new_discovered))
+            self._conn.executemany(
+                "INSERT INTO errors (url, depth, error) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET error = excluded.error, attempts = attempts + 1",
+                new_errors,
+            )
+            self._set_meta("status", "complete" if complete else "running")
+            self._set_meta("updated_at", time.time())
+        self._retrying.difference_update(url for url, in resolved)
+
+    def errors(self):
+        """All recorded errors as (url, depth, error, attempts)."""
+        return self._conn.execute("SELECT url, depth, error, attempts FROM errors ORDER BY url").fetchall()
+
+    def close(self):
+        self._conn.close()
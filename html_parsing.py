@@ -0,0 +1,255 @@
+from html.parser import HTMLParser
+
+# ==============================================================================
+# Pluggable HTML parser backends that all speak the same event protocol.
+# An extractor is any object with three methods:
+#     start(tag, attrs)   attrs supports .get(name)
+#     end(tag)
+#     text(data)
+# Each backend drives those callbacks in document order with properly nested
+# start/end pairs, so one extractor can collect everything it needs in a single
+# pass whatever parser produced the events.
+#
+# Backends, fastest first (used when installed):
+#   "selectolax" - lexbor C parser, tree walked once
+#   "lxml"       - libxml2 parser, walked with etree.iterwalk
+#   "html.parser" - stdlib tokenizer, no tree at all (always available)
+# ==============================================================================
+
+_BACKEND_PREFERENCE = ("selectolax", "lxml", "html.parser")
+
+# Text inside these never counts as page text (same as BeautifulSoup's get_text)
+_NON_TEXT_TAGS = frozenset(["script", "style", "template", "noscript"])
+
+_VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+])
+
+# Block-level start tags that implicitly close an open <p> (HTML5 "close a p element")
+_CLOSES_P = frozenset([
+    "address", "article", "aside", "blockquote", "center", "details", "dialog", "dir",
+    "div", "dl", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3",
+    "h4", "h5", "h6", "header", "hgroup", "hr", "main", "menu", "nav", "ol", "p", "pre",
+    "section", "summary", "table", "ul",
+])
+
+# An open <p> is not closed across these (they start a new "button scope")
+_P_SCOPE_BOUNDARY = frozenset(["table", "td", "th", "caption", "button", "object", "template", "html"])
+
+# tag -> (tags it implicitly closes, tags that stop the search, whether to close everything
+# inside a stopping tag when no target is open). The nearest open target is closed together
+# with everything opened after it, so a new <tr> ends the previous row, not just its last cell.
+_ROW_GROUPS = frozenset(["tbody", "thead", "tfoot"])
+_IMPLIED_CLOSE = {
+    "li": (frozenset(["li"]), frozenset(["ul", "ol", "table"]), False),
+    "dt": (frozenset(["dt", "dd"]), frozenset(["dl", "table"]), False),
+    "dd": (frozenset(["dt", "dd"]), frozenset(["dl", "table"]), False),
+    "tr": (frozenset(["tr"]), _ROW_GROUPS | {"table"}, True),
+    "td": (frozenset(["td", "th"]), frozenset(["tr", "table"]), False),
+    "th": (frozenset(["td", "th"]), frozenset(["tr", "table"]), False),
+    "tbody": (_ROW_GROUPS, frozenset(["table"]), True),
+    "thead": (_ROW_GROUPS, frozenset(["table"]), True),
+    "tfoot": (_ROW_GROUPS, frozenset(["table"]), True),
+    "option": (frozenset(["option"]), frozenset(["select"]), False),
+}
+
+
+def available_backends():
+    """Installed backends, fastest first."""
+    backends = []
+    try:
+        import selectolax.lexbor  # noqa: F401
+        backends.append("selectolax")
+    except ImportError:
+        pass
+    try:
+        import lxml.html  # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    backends.append("html.parser")
+    return backends
+
+
+def resolve_backend(backend=None):
+    """Returns backend if given (checking it is installed), else the fastest installed one."""
+    installed = available_backends()
+    if backend is None:
+        return installed[0]
+    if backend not in _BACKEND_PREFERENCE:
+        raise ValueError(f"Unknown parser backend {backend!r}; choose from {_BACKEND_PREFERENCE}")
+    if backend not in installed:
+        raise ImportError(f"Parser backend {backend!r} is not installed")
+    return backend
+
+
+def parse_with(markup, extractor, backend=None):
+    """Runs extractor over markup with the chosen backend and returns the extractor."""
+    backend = resolve_backend(backend)
+    if backend == "selectolax":
+        _walk_selectolax(markup, extractor)
+    elif backend == "lxml":
+        _walk_lxml(markup, extractor)
+    else:
+        event_parser = StdlibEventParser(extractor)
+        event_parser.feed(markup)
+        event_parser.close()
+    return extractor
+
+
+def parse_stream(response, extractor, chunk_size=64 * 1024):
+    """
+    Incremental version of parse_with for a requests response fetched with stream=True.
+    The body is decoded and tokenized chunk by chunk as it arrives, so no full copy of
+    the document (or a tree) is ever held. If the extractor sets .done (e.g. once its
+    target container has closed), reading stops and the connection is released early.
+    """
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        # requests would fall back to ISO-8859-1 for text/*; HTML without a declared charset is nearly always UTF-8
+        response.encoding = "utf-8"
+    event_parser = StdlibEventParser(extractor)
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size, decode_unicode=True):
+            event_parser.feed(chunk)
+            if getattr(extractor, "done", False):
+                break
+        event_parser.close()
+    finally:
+        response.close()
+    return extractor
+
+
+def _walk_selectolax(markup, extractor):
+    from selectolax.lexbor import LexborHTMLParser
+
+    start, end, text = extractor.start, extractor.end, extractor.text
+    node = LexborHTMLParser(markup).root
+    stack = [] # Open element nodes; their .next is visited after their children
+    while node is not None or stack:
+        if node is None:
+            node = stack.pop()
+            end(node.tag)
+            node = node.next
+            continue
+        tag = node.tag
+        if tag == "-text":
+            text(node.text(deep=False))
+            node = node.next
+        elif tag[0] in "-_#!": # Comments, doctype
+            node = node.next
+        else:
+            start(tag, node.attributes)
+            stack.append(node)
+            node = node.child
+
+
+def _walk_lxml(markup, extractor):
+    from lxml import etree
+    import lxml.html
+
+    start, end, text = extractor.start, extractor.end, extractor.text
+    root = lxml.html.document_fromstring(markup)
+    for event, element in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+        if event == "comment" or event == "pi": # Only the tail of a comment is page text
+            if element.tail:
+                text(element.tail)
+        elif event == "start":
+            start(element.tag, element.attrib)
+            if element.text:
+                text(element.text)
+        else:
+            end(element.tag)
+            if element.tail:
+                text(element.tail)
+
+
+class StdlibEventParser(HTMLParser):
+    """
+    html.parser tokenizer that turns tags into balanced start/end events without
+    building a tree. It applies the common HTML5 implied-end-tag rules (unclosed
+    <p>, <li>, <td>, <tr>, ...), void elements and stray end tags.
+    Consecutive text chunks are merged, so feeding the document in pieces
+    (feed() per network chunk) gives the same events as feeding it whole.
+    """
+
+    def __init__(self, extractor):
+        super().__init__(convert_charrefs=True)
+        self.extractor = extractor
+        self._open = []     # Tag names of open elements
+        self._pending = []  # Text not yet handed to the extractor
+
+    def _flush_text(self):
+        if self._pending:
+            self.extractor.text("".join(self._pending))
+            self._pending = []
+
+    def _close_until(self, index):
+        # Emits end events for every open element from the top of the stack down to index
+        while len(self._open) > index:
+            self.extractor.end(self._open.pop())
+
+    def _find_open(self, targets, boundary):
+        for i in range(len(self._open) - 1, -1, -1):
+            tag = self._open[i]
+            if tag in targets:
+                return i
+            if tag in boundary:
+                return -1
+        return -1
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in _CLOSES_P:
+            i = self._find_open(("p",), _P_SCOPE_BOUNDARY)
+            if i >= 0:
+                self._close_until(i)
+        implied = _IMPLIED_CLOSE.get(tag)
+        if implied is not None:
+            targets, boundary, inside_boundary = implied
+            for i in range(len(self._open) - 1, -1, -1):
+                open_tag = self._open[i]
+                if open_tag in targets:
+                    self._close_until(i)
+                    break
+                if open_tag in boundary:
+                    if inside_boundary:
+                        self._close_until(i + 1)
+                    break
+        self.extractor.start(tag, dict(attrs))
+        if tag in _VOID_TAGS:
+            self.extractor.end(tag)
+        else:
+            self._open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+        self.extractor.start(tag, dict(attrs))
+        self.extractor.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS:
+            return
+        # Stray end tags (nothing open with that name) are ignored, like browsers do
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i] == tag:
+                self._flush_text()
+                self._close_until(i)
+                return
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        # Text on either side of a comment stays two text nodes, as in the tree backends
+        self._flush_text()
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        self._close_until(0)
+
+
+def is_non_text_tag(tag):
+    """True for elements whose text BeautifulSoup's get_text() would skip (script, style, ...)."""
+    return tag in _NON_TEXT_TAGS
@@ -0,0 +1,205 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import metrics
+from response_cache import CachedResponse
+
+# ==============================================================================
+# Shared HTTP client for every fetcher in this project.
+# Each host (codelibrary.amlegal.com, en.wikipedia.org, api.municode.com, ...)
+# gets one requests.Session with a keep-alive connection pool, so repeated
+# fetches reuse the same TCP+TLS connection instead of handshaking every time.
+# ==============================================================================
+
+# brotli is optional; only advertise "br" if we can actually decode it.
+try:
+    import brotli  # noqa: F401
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        _ACCEPT_ENCODING = "gzip, deflate"
+
+# --- Tunables (change with configure_http_client) ---
+_settings = {
+    "pool_connections": 4,   # Connection pools cached per session (one per scheme/host/port)
+    "pool_maxsize": 16,      # Keep-alive connections kept open per host
+    "max_retries": 3,        # Retries on connection errors and retryable statuses
+    "backoff_factor": 0.5,   # Sleep 0.5s, 1s, 2s, ... between retries
+    "status_forcelist": (429, 500, 502, 503, 504),
+}
+
+_sessions = {} # host -> requests.Session
+_sessions_lock = threading.Lock()
+
+
+def configure_http_client(**settings):
+    """
+    Changes pool/retry settings. Existing sessions are closed so the next
+    request picks the new settings up.
+    """
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError(f"Unknown HTTP client settings: {sorted(unknown)}")
+    _settings.update(settings)
+    close_sessions()
+
+
+# --- Connection timing (metrics.http_connect_seconds) ---
+# urllib3 opens connections in HTTPConnection.connect(); these subclasses time it
+# (name lookup, TCP handshake and, for https, the TLS handshake) while metrics is enabled.
+
+class _TimedConnectMixin:
+    def connect(self):
+        if not metrics.enabled:
+            return super().connect()
+        start_time = time.perf_counter()
+        super().connect()
+        host = self.host if self.port in (None, self.default_port) else f"{self.host}:{self.port}" # Same label as urlsplit().netloc
+        metrics.observe("http_connect_seconds", time.perf_counter() - start_time, host=host)
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+def _build_session():
+    retry = Retry(
+        total=_settings["max_retries"],
+        connect=_settings["max_retries"],
+        read=_settings["max_retries"],
+        backoff_factor=_settings["backoff_factor"],
+        status_forcelist=_settings["status_forcelist"],
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False, # Hand the last response back so raise_for_status() still works for callers
+    )
+    adapter = _TimedHTTPAdapter(
+        pool_connections=_settings["pool_connections"],
+        pool_maxsize=_settings["pool_maxsize"],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = _ACCEPT_ENCODING
+    return session
+
+
+def get_session(url):
+    """Returns the pooled session for the host of url, creating it on first use."""
+    host = urlsplit(url).netloc.lower()
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _build_session()
+                _sessions[host] = session
+    return session
+
+
+def get(url, scheduler=None, **kwargs):
+    """
+    Drop-in replacement for requests.get that goes through the pooled session for url's host.
+    If scheduler (a politeness.PolitenessScheduler) is given, waits for the host's
+    next slot first and reports the outcome back to it afterwards.
+    """
+    if scheduler is None:
+        return _session_get(url, **kwargs)
+
+    scheduler.wait(url)
+    start_time = time.monotonic()
+    try:
+        response = _session_get(url, **kwargs)
+    except requests.RequestException:
+        scheduler.record(url, status_code=None)
+        raise
+    scheduler.record_response(url, response, time.monotonic() - start_time)
+    return response
+
+
+def _session_get(url, **kwargs):
+    # The pooled GET, recording request counts, TTFB, download time and size while metrics is enabled
+    if not metrics.enabled:
+        return get_session(url).get(url, **kwargs)
+    host = urlsplit(url).netloc.lower()
+    start_time = time.perf_counter()
+    try:
+        response = get_session(url).get(url, **kwargs)
+    except requests.RequestException as e:
+        metrics.count("http_errors_total", host=host, error=type(e).__name__)
+        raise
+    metrics.count("http_requests_total", host=host, status=response.status_code)
+    ttfb = response.elapsed.total_seconds()
+    metrics.observe("http_ttfb_seconds", ttfb, host=host)
+    if not kwargs.get("stream"): # A streamed body is read later, by the caller
+        metrics.observe("http_download_seconds", max(0.0, time.perf_counter() - start_time - ttfb), host=host)
+        metrics.observe("http_response_bytes", response.raw.tell() or len(response.content), host=host)
+    return response
+
+
+def conditional_get(url, cache, scheduler=None, headers=None, **kwargs):
+    """
+    GET that revalidates against a response_cache.ResponseCache.
+    Sends If-None-Match / If-Modified-Since for cached URLs; a 304 is answered from
+    the cache (result.not_modified is True), a 200 replaces the cached copy.
+    Returns a response_cache.CachedResponse.
+    """
+    headers = dict(headers or {})
+    cached_validators = cache.validators(url)
+    if cached_validators is not None:
+        etag, last_modified = cached_validators
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = get(url, scheduler=scheduler, headers=headers, **kwargs)
+    if response.status_code == 304 and cached_validators is not None:
+        cached = cache.load_body(url)
+        if cached is not None:
+            cache.touch(url, response)
+            return CachedResponse(url, 304, cached[0], True, response)
+        # Entry vanished (evicted) between the two lookups: fetch it again unconditionally
+        for header in ("If-None-Match", "If-Modified-Since"):
+            headers.pop(header, None)
+        response = get(url, scheduler=scheduler, headers=headers, **kwargs)
+
+    if response.status_code == 200:
+        cache.store(url, response)
+    return CachedResponse(url, response.status_code, response.text, False, response)
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
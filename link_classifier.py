@@ -0,0 +1,164 @@
+import re
+from array import array
+from urllib.parse import quote, unquote, urljoin
+
+# ==============================================================================
+# Wikipedia link classification.
+# One compiled regex sorts an href into one of:
+#   article    /wiki/Title (or the same as an absolute / protocol-relative URL)
+#   namespace  /wiki/File:..., /wiki/Category:..., /wiki/Help:... (known namespaces only,
+#              so articles like "Star Wars: Episode IV" stay articles)
+#   red_link   /w/index.php?title=Title&action=edit&redlink=1 (page does not exist)
+#   external   any other absolute URL (other hosts, mailto:, ...)
+#   anchor     #fragment on the same page
+#   other      everything else on the wiki (/w/index.php edit/history links, ...)
+# Wiki targets come back as canonical titles: percent-decoded, "_" -> " ",
+# first letter capitalized, namespace name normalized and, if a redirect map is
+# given, resolved to the redirect's target.
+# ==============================================================================
+
+ARTICLE, NAMESPACE, RED_LINK, EXTERNAL, ANCHOR, OTHER = range(6)
+LINK_KINDS = ("article", "namespace", "red_link", "external", "anchor", "other")
+
+DEFAULT_NAMESPACES = (
+    "Talk", "User", "User talk", "Wikipedia", "Wikipedia talk", "File", "File talk",
+    "MediaWiki", "MediaWiki talk", "Template", "Template talk", "Help", "Help talk",
+    "Category", "Category talk", "Portal", "Portal talk", "Draft", "Draft talk",
+    "TimedText", "TimedText talk", "Module", "Module talk", "Special", "Media",
+    "Image", "WP", "Project",
+)
+
+# Verdict memo is dropped once it grows past this many hrefs
+_MAX_CACHED_HREFS = 100000
+
+_TITLE_PARAM = re.compile(r"(?:^|&)title=([^&]*)")
+
+
+def article_url(base_url, title):
+    """URL of an article in the form MediaWiki renders it: spaces as "_", non-ASCII and reserved characters ("?", "#", "%", "&", ...) percent-encoded."""
+    return f"{base_url.rstrip('/')}/wiki/{quote(title.replace(' ', '_'), safe=';@$!*(),/~:')}"
+
+
+class LinkClassifier:
+    """
+    base_url: the wiki the hrefs come from; absolute links to its host count as wiki links.
+    namespaces: namespace names that make a "Prefix:Title" link a namespace link.
+    redirects: optional {title: target title} used to resolve redirect titles.
+    """
+
+    def __init__(self, base_url="https://en.wikipedia.org", namespaces=DEFAULT_NAMESPACES, redirects=None):
+        self.base_url = base_url.rstrip("/")
+        self.redirects = redirects or {}
+        self._namespaces = {name.lower(): name for name in namespaces}
+        host = re.escape(self.base_url.split("://", 1)[-1])
+        self._pattern = re.compile(
+            r"(?:(?:https?:)?//" + host + r")?(?:"
+            r"/wiki/(?P<wiki>[^?#]*)(?:\?[^#]*)?(?:#(?P<fragment>.*))?"
+            r"|/w/index\.php\?(?P<query>[^#]*)(?:#.*)?"
+            r")\Z"
+            r"|#(?P<anchor>.*)\Z"
+            r"|(?P<external>[A-Za-z][A-Za-z0-9+.-]*:.*|//.*)\Z",
+            re.DOTALL,
+        )
+        self._cache = {}
+
+    def canonical_title(self, raw_title):
+        """MediaWiki's canonical form of a title taken from a URL, with redirects resolved."""
+        title = " ".join(unquote(raw_title).replace("_", " ").split())
+        if not title:
+            return title
+        prefix, colon, rest = title.partition(":")
+        namespace = self._namespaces.get(prefix.strip().lower()) if colon else None
+        if namespace is not None:
+            rest = rest.strip()
+            title = f"{namespace}:{rest[:1].upper()}{rest[1:]}"
+        else:
+            title = title[:1].upper() + title[1:]
+        return self.redirects.get(title, title)
+
+    def is_namespace_title(self, title):
+        prefix, colon, _ = title.partition(":")
+        return bool(colon) and prefix.lower() in self._namespaces
+
+    def classify(self, href):
+        """Returns (kind, target): a canonical title for wiki links, the URL for external links, the fragment for anchors."""
+        result = self._cache.get(href)
+        if result is not None:
+            return result
+        match = self._pattern.match(href.strip())
+        if match is None:
+            result = (OTHER, urljoin(self.base_url + "/", href))
+        else:
+            wiki, _, query, anchor, external = match.groups()
+            if wiki is not None:
+                title = self.canonical_title(wiki)
+                if not title:
+                    result = (OTHER, self.base_url + "/wiki/")
+                else:
+                    result = (NAMESPACE if self.is_namespace_title(title) else ARTICLE, title)
+            elif query is not None:
+                title_match = _TITLE_PARAM.search(query)
+                if title_match is not None and "redlink=1" in query:
+                    result = (RED_LINK, self.canonical_title(title_match.group(1)))
+                else:
+                    result = (OTHER, self.base_url + "/w/index.php?" + query)
+            elif anchor is not None:
+                result = (ANCHOR, unquote(anchor))
+            else:
+                result = (EXTERNAL, external)
+        if len(self._cache) >= _MAX_CACHED_HREFS:
+            self._cache.clear()
+        self._cache[href] = result
+        return result
+
+    def article_url(self, title):
+        return article_url(self.base_url, title)
+
+
+class PageLinks:
+    """
+    Every link of one page in compact, column-oriented form.
+    Targets and section headings are interned (stored once, referenced by index):
+        kinds[i]        index into LINK_KINDS
+        target_ids[i]   index into targets
+        section_ids[i]  index into sections (0 is the lead section, named "")
+        anchor_texts[i] link text (only when the extractor was asked to keep context)
+    """
+
+    def __init__(self, keep_context=True):
+        self.keep_context = keep_context
+        self.targets = []
+        self.sections = [""]
+        self.kinds = array("b")
+        self.target_ids = array("I")
+        self.section_ids = array("I")
+        self.anchor_texts = []
+        self._target_index = {}
+
+    def add(self, kind, target, anchor_text=""):
+        target_id = self._target_index.get(target)
+        if target_id is None:
+            target_id = self._target_index[target] = len(self.targets)
+            self.targets.append(target)
+        self.kinds.append(kind)
+        self.target_ids.append(target_id)
+        self.section_ids.append(len(self.sections) - 1)
+        if self.keep_context:
+            self.anchor_texts.append(anchor_text)
+
+    def start_section(self, heading):
+        self.sections.append(heading)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        """Yields (kind name, target, section heading, anchor text) per link, in page order."""
+        for i in range(len(self.kinds)):
+            yield (LINK_KINDS[self.kinds[i]], self.targets[self.target_ids[i]], self.sections[self.section_ids[i]],
+                   self.anchor_texts[i] if self.keep_context else None)
+
+    def targets_of_kind(self, kind):
+        """Sorted unique targets of one kind (ARTICLE, NAMESPACE, ...), e.g. the article link graph edges."""
+        ids = {target_id for link_kind, target_id in zip(self.kinds, self.target_ids) if link_kind == kind}
+        return sorted(self.targets[target_id] for target_id in ids)
@@ -0,0 +1,117 @@
+from urllib.parse import unquote, urlsplit
+
+import http_client
+
+# ==============================================================================
+# Minimal MediaWiki action API client (https://www.mediawiki.org/wiki/API:Main_page).
+#   query_pages       - one request per 50 titles: existence, redirects, article
+#                       links, categories and page props, following "continue"
+#   parse_page_html   - action=parse: the article's rendered div.mw-parser-output
+#                       without the skin (navigation, sidebars, footer)
+# Every call takes api_url, so a mirror, another language or a local stand-in
+# server serving recorded responses can replace en.wikipedia.org.
+# ==============================================================================
+
+DEFAULT_API_URL = "https://en.wikipedia.org/w/api.php"
+
+# Most titles the API accepts per query for normal (non-bot) clients
+MAX_TITLES_PER_QUERY = 50
+
+
+class MediaWikiAPIError(Exception):
+    """The API answered with an error object ({"error": {"code": ..., "info": ...}})."""
+
+    def __init__(self, code, info):
+        super().__init__(f"{code}: {info}")
+        self.code = code
+        self.info = info
+
+
+def title_from_url(url_or_title):
+    """Page title from an article URL (".../wiki/Monowi,_Nebraska"), or the argument itself if it is already a title."""
+    if "://" not in url_or_title:
+        return url_or_title.replace("_", " ")
+    path = urlsplit(url_or_title).path
+    _, marker, raw_title = path.partition("/wiki/")
+    if not marker:
+        raise ValueError(f"Not an article URL: {url_or_title}")
+    return unquote(raw_title).replace("_", " ")
+
+
+def _api_get(api_url, params, headers, scheduler=None):
+    params = dict(params, format="json", formatversion="2")
+    response = http_client.get(api_url, scheduler=scheduler, headers=headers, params=params, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        raise MediaWikiAPIError(data["error"].get("code"), data["error"].get("info"))
+    return data
+
+
+def query_pages(titles, user_agent, api_url=DEFAULT_API_URL, scheduler=None, batch_size=MAX_TITLES_PER_QUERY):
+    """
+    Looks titles up MAX_TITLES_PER_QUERY at a time. Returns {requested title: page} where page is
+    {"title": resolved title, "exists": bool, "links": [article titles], "categories": [names], "pageprops": {...}}.
+    Redirects and title normalization are followed, so several requested titles can share one page.
+    """
+    headers = {"User-Agent": user_agent}
+    titles = list(dict.fromkeys(titles))
+    results = {}
+    for start in range(0, len(titles), batch_size):
+        batch = titles[start:start + batch_size]
+        params = {
+            "action": "query",
+            "titles": "|".join(batch),
+            "prop": "links|categories|pageprops",
+            "plnamespace": "0",
+            "pllimit": "max",
+            "cllimit": "max",
+            "clshow": "!hidden",
+            "redirects": "1",
+        }
+        pages = {}
+        renamed = {} # from -> to, for normalized and redirected titles
+        while True:
+            data = _api_get(api_url, params, headers, scheduler)
+            query = data.get("query", {})
+            for entry in query.get("normalized", []) + query.get("redirects", []):
+                renamed[entry["from"]] = entry["to"]
+            for page in query.get("pages", []):
+                record = pages.setdefault(page["title"], {
+                    "title": page["title"],
+                    "exists": not page.get("missing", False) and not page.get("invalid", False),
+                    "links": [],
+                    "categories": [],
+                    "pageprops": {},
+                })
+                record["links"].extend(link["title"] for link in page.get("links", []))
+                record["categories"].extend(category["title"].partition(":")[2] for category in page.get("categories", []))
+                record["pageprops"].update(page.get("pageprops", {}))
+            if "continue" not in data:
+                break
+            params.update(data["continue"]) # Long link lists arrive in several responses
+        for record in pages.values():
+            record["links"] = list(dict.fromkeys(record["links"]))
+            record["categories"] = list(dict.fromkeys(record["categories"]))
+
+        for title in batch:
+            resolved = title
+            for _ in range(len(renamed) + 1): # Follows normalized -> redirect chains, never loops forever
+                if resolved not in renamed:
+                    break
+                resolved = renamed[resolved]
+            results[title] = pages.get(resolved, {"title": resolved, "exists": False, "links": [], "categories": [], "pageprops": {}})
+    return results
+
+
+def parse_page_html(title, user_agent, api_url=DEFAULT_API_URL, scheduler=None):
+    """Rendered HTML of one article (its div.mw-parser-output, no skin), following redirects."""
+    data = _api_get(api_url, {
+        "action": "parse",
+        "page": title,
+        "prop": "text",
+        "redirects": "1",
+        "disableeditsection": "1",
+        "disabletoc": "1",
+    }, {"User-Agent": user_agent}, scheduler)
+    return data["parse"]["text"]
@@ -0,0 +1,257 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# ==============================================================================
+# Process-wide instrumentation: counters, gauges, latency histograms and
+# tracing hooks, shared by every fetcher in this project.
+# Off by default. While disabled, every call returns right after checking one
+# module flag, so instrumented hot loops cost next to nothing.
+#   metrics.enable(metrics.JsonlExporter("crawl_metrics.jsonl"), interval=5)
+#   ... run a crawl ...
+#   metrics.disable() # exports one last time
+# Names follow Prometheus conventions: *_total counters, *_seconds / *_bytes
+# histograms; labels are keyword arguments (host="...", publisher="...").
+# With interval set, a background thread exports every interval seconds, so a
+# JSON lines file becomes a time series (queue depth over time, throughput, ...).
+# What the project records:
+#   http_requests_total{host,status}   http_errors_total{host,error}
+#   http_connect_seconds{host}         new connection: DNS + TCP + TLS
+#   http_ttfb_seconds{host}            request sent -> response headers parsed
+#   http_download_seconds{host}        headers -> body read (non-streamed responses)
+#   http_response_bytes{host}          bytes on the wire (still compressed)
+#   parse_seconds{module,mode}         HTML/JSON parsing per page
+#   index_query_seconds                ordinance_index searches
+#   politeness_wait_seconds{host}     time spent waiting for the host's next slot
+#   frontier_size{crawl}, in_flight{crawl}, level_size{crawl} (async BFS) gauges
+#   crawl_pages_total{crawl}, crawl_errors_total{crawl,error}, cache_revalidated_total{module}
+# ==============================================================================
+
+# Histogram bucket upper bounds in seconds (HTTP phases and parse times)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bucket upper bounds for *_bytes histograms
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+enabled = False
+
+_lock = threading.Lock()
+_counters = {}   # (name, labels) -> value
+_gauges = {}     # (name, labels) -> value
+_histograms = {} # (name, labels) -> [bucket bounds, per-bucket counts (+Inf last), sum, count]
+_exporters = []
+_trace_hooks = []
+_flusher = None  # (thread, stop event) while interval exporting runs
+
+
+def _key(name, labels):
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items())) if labels else ()
+
+
+def count(name, value=1, **labels):
+    """Adds value to a counter."""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Sets a gauge to its current value (queue depth, requests in flight, ...)."""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name, value, **labels):
+    """Records one value in a histogram; names ending in _bytes get BYTE_BUCKETS, others DEFAULT_BUCKETS."""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            bounds = BYTE_BUCKETS if name.endswith("_bytes") else DEFAULT_BUCKETS
+            histogram = _histograms[key] = [bounds, [0] * (len(bounds) + 1), 0.0, 0]
+        histogram[1][bisect.bisect_left(histogram[0], value)] += 1
+        histogram[2] += value
+        histogram[3] += 1
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        observe(self.name, duration, **self.labels)
+        for hook in _trace_hooks:
+            hook(self.name, self.start, duration, self.labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, **labels):
+    """Context manager observing the duration of its block in histogram name (and reporting it to trace hooks)."""
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+def add_trace_hook(hook):
+    """hook(name, start, duration, labels) is called after every timer() block, e.g. to emit spans to a tracer."""
+    _trace_hooks.append(hook)
+
+
+def remove_trace_hook(hook):
+    _trace_hooks.remove(hook)
+
+
+def snapshot():
+    """Current values: {"time", "counters", "gauges", "histograms"}, each metric as a dict with its labels."""
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in _counters.items()]
+        gauges = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in _gauges.items()]
+        histograms = [
+            {"name": name, "labels": dict(labels), "buckets": list(bounds), "counts": list(counts), "sum": total, "count": n}
+            for (name, labels), (bounds, counts, total, n) in _histograms.items()
+        ]
+    return {"time": time.time(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+def export():
+    """Hands one snapshot to every exporter."""
+    if not _exporters:
+        return
+    current = snapshot()
+    for exporter in list(_exporters):
+        exporter.export(current)
+
+
+def _flush_every(interval, stop):
+    while not stop.wait(interval):
+        export()
+
+
+def enable(*exporters, interval=None):
+    """Turns recording on. exporters get a snapshot on export()/disable(), and every interval seconds if set."""
+    global enabled, _flusher
+    _exporters.extend(exporters)
+    enabled = True
+    if interval and _flusher is None:
+        stop = threading.Event()
+        thread = threading.Thread(target=_flush_every, args=(interval, stop), daemon=True)
+        thread.start()
+        _flusher = (thread, stop)
+
+
+def disable():
+    """Stops interval exporting, exports one last snapshot, closes the exporters and turns recording off."""
+    global enabled, _flusher
+    if _flusher is not None:
+        thread, stop = _flusher
+        stop.set()
+        thread.join()
+        _flusher = None
+    export()
+    for exporter in _exporters:
+        exporter.close()
+    del _exporters[:]
+    enabled = False
+
+
+def reset():
+    """Drops every recorded value (exporters and hooks stay)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+# --- Exporters ---
+
+class JsonlExporter:
+    """Appends one snapshot per export to path as a JSON line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._file_lock = threading.Lock()
+
+    def export(self, current):
+        with self._file_lock:
+            self._file.write(json.dumps(current) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _prometheus_labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for name, value in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+class PrometheusTextfileExporter:
+    """
+    Rewrites path in the Prometheus text exposition format on every export (atomically,
+    so node_exporter's textfile collector never reads half a file). prefix is put before every name.
+    """
+
+    def __init__(self, path, prefix=""):
+        self.path = path
+        self.prefix = prefix
+
+    def export(self, current):
+        lines = []
+        for kind, metrics in (("counter", current["counters"]), ("gauge", current["gauges"])):
+            for name in sorted({metric["name"] for metric in metrics}):
+                lines.append(f"# TYPE {self.prefix}{name} {kind}")
+                for metric in metrics:
+                    if metric["name"] == name:
+                        lines.append(f"{self.prefix}{name}{_prometheus_labels(metric['labels'])} {metric['value']}")
+        histograms = current["histograms"]
+        for name in sorted({metric["name"] for metric in histograms}):
+            full_name = self.prefix + name
+            lines.append(f"# TYPE {full_name} histogram")
+            for metric in histograms:
+                if metric["name"] != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(list(metric["buckets"]) + ["+Inf"], metric["counts"]):
+                    cumulative += bucket_count
+                    lines.append(f"{full_name}_bucket{_prometheus_labels(metric['labels'], ('le', bound))} {cumulative}")
+                lines.append(f"{full_name}_sum{_prometheus_labels(metric['labels'])} {metric['sum']}")
+                lines.append(f"{full_name}_count{_prometheus_labels(metric['labels'])} {metric['count']}")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        pass
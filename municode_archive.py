@@ -1,6 +1,11 @@
-import requests # For making HTTP requests
+import requests # For exception types; fetches go through http_client
+import http_client # Pooled keep-alive sessions
+import metrics
 import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 # from urllib.parse import urlsplit # Only if get_base_url stays here and is used
 
 # ==============================================================================
@@ -18,24 +23,104 @@ import time
 #     split_url = urlsplit(url)
 #     return f"{split_url.scheme}://{split_url.netloc}"
 
-# Helper function originally for get_urls_from_municode_next
-def _extract_municonext_urls_recursive(node, base_url_prefix, url_list):
-    if not isinstance(node, dict):
-        return
-
-    # Hypothetical new keys - UPDATE BASED ON NEW DEBUG OUTPUT
-    node_path = node.get("NodePath") # Example: "NodePath" instead of "path"
-    if node_path:
-        if not node_path.startswith("/"):
-            node_path = "/" + node_path
-        full_url = base_url_prefix + node_path
-        url_list.append(full_url)
-
-    # Hypothetical new keys - UPDATE BASED ON NEW DEBUG OUTPUT
-    children = node.get("ChildNodes") # Example: "ChildNodes" instead of "children"
-    if isinstance(children, list):
-        for child_node in children:
-            _extract_municonext_urls_recursive(child_node, base_url_prefix, url_list)
+# ijson is optional; with it, CodesContent responses are walked as they download
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# --- ToC walkers (originally for get_urls_from_municode_next) ---
+# Both yield (url, titles) in document order: a node before its children, where
+# titles is the tuple of "Title"s from the top of the ToC down to the node.
+# Neither recurses, so arbitrarily deep codes can't hit the recursion limit.
+
+# Hypothetical keys - UPDATE BASED ON NEW DEBUG OUTPUT
+_NODE_PATH_KEY = "NodePath"     # Example: "NodePath" instead of "path"
+_NODE_TITLE_KEY = "Title"
+_CHILD_KEYS = ("ChildNodes", "Docs") # Example: "ChildNodes" instead of "children"; "Docs" at the top level
+
+
+def _node_url(node_path, base_url_prefix):
+    if not node_path.startswith("/"):
+        node_path = "/" + node_path
+    return base_url_prefix + node_path
+
+
+def iter_municonext_toc(root, base_url_prefix):
+    """Walks an already-parsed ToC (dict) with an explicit stack."""
+    stack = [(root, ())]
+    while stack:
+        node, parent_titles = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        title = node.get(_NODE_TITLE_KEY)
+        titles = parent_titles + (title,) if title else parent_titles
+        node_path = node.get(_NODE_PATH_KEY)
+        if node_path:
+            yield _node_url(node_path, base_url_prefix), titles
+        for key in reversed(_CHILD_KEYS):
+            children = node.get(key)
+            if isinstance(children, list):
+                stack.extend((child, titles) for child in reversed(children)) # Reversed so pops come out in order
+
+
+def iter_municonext_toc_events(events, base_url_prefix):
+    """
+    Walks ijson-style (prefix, event, value) events of a ToC without building it, so memory stays
+    flat whatever the document size. A node is yielded as soon as its children start (or when it
+    closes), so "NodePath" and "Title" must come before its "ChildNodes" for children to see them.
+    """
+    stack = [] # Open containers: [is_node, node_path, title, emitted, current_key] for maps, None for arrays
+    child_arrays = [] # For each open array: True if its items are ToC nodes
+
+    def node_titles():
+        return tuple(frame[2] for frame in stack if frame is not None and frame[0] and frame[2])
+
+    for _, event, value in events:
+        top = stack[-1] if stack else None
+        if event == "start_map":
+            # The root object and the items of a node's ChildNodes/Docs arrays are ToC nodes
+            is_node = not stack or (top is None and child_arrays[-1])
+            stack.append([is_node, None, None, False, None])
+        elif event == "map_key":
+            top[4] = value
+        elif event == "start_array":
+            is_child_array = top is not None and top[0] and top[4] in _CHILD_KEYS
+            if is_child_array and top[1] and not top[3]:
+                top[3] = True
+                yield _node_url(top[1], base_url_prefix), node_titles()
+            stack.append(None)
+            child_arrays.append(is_child_array)
+        elif event == "end_array":
+            stack.pop()
+            child_arrays.pop()
+        elif event == "end_map":
+            frame = stack.pop()
+            if frame[0] and frame[1] and not frame[3]:
+                stack.append(frame) # Back on the stack so node_titles() includes its own title
+                yield _node_url(frame[1], base_url_prefix), node_titles()
+                stack.pop()
+        elif top is not None and top[0] and event in ("string", "number"):
+            if top[4] == _NODE_PATH_KEY:
+                top[1] = str(value)
+            elif top[4] == _NODE_TITLE_KEY:
+                top[2] = str(value)
+
+
+def iter_municonext_toc_response(response, base_url_prefix):
+    """
+    Walks a CodesContent response. With ijson installed and a response fetched with stream=True,
+    the body is parsed as it downloads; otherwise it is loaded with json first.
+    """
+    if ijson is not None:
+        response.raw.decode_content = True # Let urllib3 undo gzip/deflate before ijson sees the bytes
+        try:
+            yield from iter_municonext_toc_events(ijson.parse(response.raw), base_url_prefix)
+        finally:
+            response.close()
+    else:
+        yield from iter_municonext_toc(response.json(), base_url_prefix)
+
 
 # ------------------------------------------------------------------------------
 # Archived MunicodeNEXT Parser
@@ -64,7 +149,7 @@ def get_urls_from_municode_next(city_name, state_abbr, bot_user_agent):
         print(f"  Fetching clientId from: {client_id_url}")
 
         # 2. Make the request
-        response = requests.get(client_id_url, headers=headers, timeout=10) # Added timeout
+        response = http_client.get(client_id_url, headers=headers, timeout=10) # Added timeout
         response.raise_for_status() # This will raise an HTTPError if the HTTP request returned an unsuccessful status code
 
         # 3. Parse the JSON response
@@ -108,7 +193,7 @@ def get_urls_from_municode_next(city_name, state_abbr, bot_user_agent):
             print(f"  Fetching productId from: {product_id_url}")
 
             # 2. Make the request
-            response = requests.get(product_id_url, headers=headers, timeout=10)
+            response = http_client.get(product_id_url, headers=headers, timeout=10)
             response.raise_for_status()
 
             # 3. Parse the JSON response
@@ -146,7 +231,7 @@ def get_urls_from_municode_next(city_name, state_abbr, bot_user_agent):
             print(f"  Fetching jobId from: {job_id_url}")
 
             # 2. Make the request
-            response = requests.get(job_id_url, headers=headers, timeout=10)
+            response = http_client.get(job_id_url, headers=headers, timeout=10)
             response.raise_for_status()
 
             # 3. Parse the JSON response
@@ -184,7 +269,7 @@ def get_urls_from_municode_next(city_name, state_abbr, bot_user_agent):
             print(f"  Fetching Table of Contents (ToC) from: {toc_url}")
 
             # 2. Make the request
-            response = requests.get(toc_url, headers=headers, timeout=15) # Increased timeout slightly for potentially larger response
+            response = http_client.get(toc_url, headers=headers, timeout=15) # Increased timeout slightly for potentially larger response
             response.raise_for_status()
 
             # 3. Parse the JSON response
@@ -281,6 +366,152 @@ def get_urls_from_municode_next(city_name, state_abbr, bot_user_agent):
 
     return url_queue, duration
 
+# ------------------------------------------------------------------------------
+# Batched Municode pipeline
+# Same four lookups as get_urls_from_municode_next (clientId -> productId -> jobId
+# -> CodesContent), for many (city, state) pairs at once:
+#   - cities run concurrently in a thread pool (pass a politeness.PolitenessScheduler
+#     to keep api.municode.com's request rate polite)
+#   - clientId and productId never change for a city, so they are memoized on disk
+#     (MunicodeIdMemo) and a repeat run only makes the jobId and ToC calls
+#   - no per-step debug printing; one summary line per city
+# jobId is never memoized: it moves whenever Municode publishes a new supplement.
+# ------------------------------------------------------------------------------
+
+MUNICODE_API_BASE = "https://api.municode.com"
+MUNICODE_LIBRARY_BASE = "https://library.municode.com"
+
+
+class MunicodeIdMemo:
+    """
+    On-disk memo of clientId/productId per (city, state), as one JSON file.
+    Cities Municode doesn't know are remembered too, but retried after negative_ttl seconds.
+    Thread-safe; call save() to write changes (written atomically).
+    """
+
+    def __init__(self, path, negative_ttl=86400):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {} # Corrupt or unreadable memo: start over
+
+    @staticmethod
+    def _key(city_name, state_abbr):
+        return f"{city_name.lower()}|{state_abbr.lower()}"
+
+    def get(self, city_name, state_abbr):
+        """Returns (client_id, product_id) - None for an ID known not to exist - or None if not memoized."""
+        with self._lock:
+            entry = self._entries.get(self._key(city_name, state_abbr))
+        if entry is None:
+            return None
+        if entry["product_id"] is None and time.time() - entry["stored_at"] > self.negative_ttl:
+            return None
+        return entry["client_id"], entry["product_id"]
+
+    def set(self, city_name, state_abbr, client_id, product_id):
+        with self._lock:
+            self._entries[self._key(city_name, state_abbr)] = {
+                "client_id": client_id, "product_id": product_id, "stored_at": time.time(),
+            }
+            self._dirty = True
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path) # Atomic swap so a crash never leaves half a file
+            self._dirty = False
+
+
+def _municode_json(url, headers, scheduler, timeout=10, params=None):
+    response = http_client.get(url, scheduler=scheduler, headers=headers, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def _resolve_municode_ids(city_name, state_abbr, headers, scheduler, api_base):
+    # The two stable lookups; returns (client_id, product_id) with None for whatever was not found
+    data = _municode_json(f"{api_base}/Clients/name", headers, scheduler,
+                          params={"clientName": city_name.lower(), "stateAbbr": state_abbr.lower()})
+    client_id = data.get("ClientID") if isinstance(data, dict) else None
+    if not client_id:
+        return None, None
+    data = _municode_json(f"{api_base}/Products/name", headers, scheduler,
+                          params={"clientId": client_id, "productName": "code of ordinances"})
+    product_id = data.get("ProductID") if isinstance(data, dict) else None
+    return client_id, product_id or None
+
+
+def _municode_city_urls(city_name, state_abbr, headers, scheduler, api_base, memo):
+    ids = memo.get(city_name, state_abbr)
+    if ids is None:
+        ids = _resolve_municode_ids(city_name, state_abbr, headers, scheduler, api_base)
+        memo.set(city_name, state_abbr, *ids)
+    client_id, product_id = ids
+    if not product_id:
+        raise LookupError(f"No Municode code of ordinances for {city_name}, {state_abbr}")
+
+    job = _municode_json(f"{api_base}/Jobs/latest/{product_id}", headers, scheduler)
+    job_id = job.get("Id") if isinstance(job, dict) else None
+    if not job_id:
+        raise LookupError(f"No published job for product {product_id}")
+    # Streamed: a multi-megabyte ToC is walked as it arrives instead of being loaded whole
+    response = http_client.get(f"{api_base}/CodesContent", scheduler=scheduler, headers=headers, timeout=15, stream=True,
+                               params={"jobId": job_id, "productId": product_id})
+    response.raise_for_status()
+    base_url_prefix = f"{MUNICODE_LIBRARY_BASE}/{state_abbr.lower()}/{city_name.lower().replace(' ', '_')}/codes/code_of_ordinances"
+    with metrics.timer("parse_seconds", module="municode", mode="toc"): # Includes reading the body
+        return sorted({url for url, _ in iter_municonext_toc_response(response, base_url_prefix)})
+
+
+def get_urls_from_municode_many(cities, bot_user_agent, max_workers=8, memo_path=".municode_ids.json",
+                                scheduler=None, api_base=MUNICODE_API_BASE):
+    """
+    Runs the Municode lookups for every (city_name, state_abbr) in cities concurrently.
+    memo_path: JSON file memoizing clientId/productId between runs (None keeps it in memory only).
+    api_base: Municode API root (swap in a mirror or a local stand-in server).
+    Returns {(city_name, state_abbr): (url_queue, duration)}; url_queue is [] when a lookup failed.
+    """
+    headers = {"User-Agent": bot_user_agent, "Accept": "application/json"}
+    memo = MunicodeIdMemo(memo_path)
+    cities = list(dict.fromkeys(cities))
+    print(f"Processing {len(cities)} MunicodeNEXT cities (max_workers={max_workers})")
+    start_time = time.time()
+
+    def run_city(city):
+        city_start = time.time()
+        try:
+            url_queue = _municode_city_urls(city[0], city[1], headers, scheduler, api_base, memo)
+        except (requests.RequestException, ValueError, LookupError) as e: # ValueError covers bad JSON
+            metrics.count("crawl_errors_total", crawl="municode", error=type(e).__name__)
+            print(f"  ❗️ {city[0]}, {city[1]}: {e}")
+            url_queue = []
+        duration = time.time() - city_start
+        print(f"  {city[0]}, {city[1]}: {len(url_queue)} URLs in {duration:.2f} s")
+        return url_queue, duration
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(zip(cities, executor.map(run_city, cities)))
+    finally:
+        memo.save()
+
+    print(f"Finished {len(cities)} cities in {time.time() - start_time:.2f} s")
+    return results
+
 # --- main block to test ---
 if __name__ == "__main__":
     my_user_agent = "AvniProjectBot/1.0"
@@ -293,3 +524,6 @@ if __name__ == "__main__":
     )
     # ... (rest of the test block)
 
+    # Batched version for a multi-city run; clientId/productId are memoized in .municode_ids.json
+    # municode_results = get_urls_from_municode_many([("miami", "fl"), ("tampa", "fl")], my_user_agent)
+
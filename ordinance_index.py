@@ -0,0 +1,615 @@
+import bisect
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import http_client
+import metrics
+from html_parsing import parse_stream, parse_with
+from publisher_adapters import get_adapter
+
+# ==============================================================================
+# Ordinance full-text index.
+# build_ordinance_index fetches every page of each city's url_queue (from
+# url_queue_builder / sharded_crawl), splits the ordinance body into headed
+# sections (adapter.section_extractor) and writes one index file that
+# OrdinanceIndex memory-maps, so opening it reads only the header and queries
+# touch just the postings they need:
+#   index = OrdinanceIndex("ordinances.idx")
+#   index.search('"chicken" AND residential')
+#   index.search('"keeping of chickens" AND NOT commercial', city="tippecanoe")
+# Queries: words, "quoted phrases", AND / OR / NOT (upper case) and parentheses;
+# adjacent operands are ANDed. Matching is case-insensitive on alphanumeric
+# tokens, so "6.04.010" matches the phrase 6 04 010; operands without any ("§",
+# "-", "&") are dropped, so "§ 10.09" searches for 10 09.
+# One document = one section (heading + body). Identical sections of a city
+# (chapter pages repeat their sections' text) are indexed once.
+#
+# File layout (native unsigned ints; little-endian only):
+#   header                    _HEADER, padded to _HEADER_SIZE
+#   per term, in term order   docs uint32[n], position ends uint32[n]
+#                             (cumulative), positions uint32[n_positions]
+#   term offsets              uint64[n_terms + 1] into the term blob
+#   term entries              uint64[3 * n_terms]: postings offset, n, n_positions
+#   term blob                 UTF-8 terms, sorted
+#   section cities            uint32[n_sections], ids into the city list
+#   section meta offsets      uint64[n_sections + 1] into the meta blob
+#   section meta blob         JSON [url, heading] per section
+#   city list                 JSON list of city names
+# The writer buffers postings in memory and spills sorted runs to temporary
+# files past spill_positions, merging them at close, so the corpus never has
+# to fit in memory.
+# ==============================================================================
+
+_MAGIC = b"ORDIDX01"
+_HEADER = struct.Struct("<8sB3xII8Q")
+_HEADER_SIZE = 128
+_RUN_ENTRY = struct.Struct("<III") # term length, n, n_positions
+
+_TOKEN = re.compile(r"[^\W_]+")
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|([()])|([^\s()"]+)')
+# Parse node of an operand with no tokens; removed from the AND / OR / NOT around it
+_EMPTY = ("empty",)
+
+# A term's postings are probed with binary search instead of being read whole
+# when they are this many times longer than the candidate set
+_PROBE_RATIO = 16
+
+
+def tokenize(text):
+    """Lower-cased alphanumeric tokens of text, the index's terms."""
+    return _TOKEN.findall(text.lower())
+
+
+def _write_aligned(f, data, alignment=8):
+    padding = -f.tell() % alignment
+    if padding:
+        f.write(b"\0" * padding)
+    offset = f.tell()
+    f.write(data)
+    return offset
+
+
+class OrdinanceIndexWriter:
+    """
+    Builds an index file section by section; close() (or leaving the with block) writes it.
+    spill_positions: buffered term positions before a sorted run is spilled to a temporary file.
+    """
+
+    def __init__(self, path, spill_positions=20_000_000):
+        if sys.byteorder != "little":
+            raise ValueError("The ordinance index format is little-endian only")
+        self.path = path
+        self.spill_positions = spill_positions
+        self._cities = {} # City name -> id
+        self._section_cities = array("I")
+        self._meta_offsets = array("Q", [0])
+        self._meta_file = tempfile.TemporaryFile()
+        self._postings = {} # Term -> (section ids, positions per section, positions)
+        self._buffered = 0
+        self._runs = []
+        self._seen = set() # Digests of (city, heading, text) already indexed
+
+    def __len__(self):
+        return len(self._section_cities)
+
+    def add_section(self, city, url, heading, text):
+        """Indexes one section; returns its id, or None if the city already has an identical section."""
+        digest = hashlib.blake2b(f"{city}\0{heading}\0{text}".encode("utf-8"), digest_size=16).digest()
+        if digest in self._seen:
+            return None
+        self._seen.add(digest)
+
+        section_id = len(self._section_cities)
+        self._section_cities.append(self._cities.setdefault(city, len(self._cities)))
+        meta = json.dumps([url, heading], ensure_ascii=False).encode("utf-8")
+        self._meta_file.write(meta)
+        self._meta_offsets.append(self._meta_offsets[-1] + len(meta))
+
+        positions_by_term = {}
+        heading_terms = tokenize(heading)
+        for position, term in enumerate(heading_terms):
+            positions_by_term.setdefault(term, []).append(position)
+        body_start = len(heading_terms) + 1 # A gap, so phrases don't run from the heading into the body
+        body_terms = tokenize(text)
+        for position, term in enumerate(body_terms, body_start):
+            positions_by_term.setdefault(term, []).append(position)
+        for term, term_positions in positions_by_term.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("I"), array("I"))
+            postings[0].append(section_id)
+            postings[1].append(len(term_positions))
+            postings[2].extend(term_positions)
+        self._buffered += len(heading_terms) + len(body_terms)
+        if self._buffered >= self.spill_positions:
+            self._spill()
+        return section_id
+
+    def _sorted_postings(self):
+        for term in sorted(self._postings):
+            yield (term, len(self._runs)) + self._postings[term]
+
+    def _spill(self):
+        run = tempfile.TemporaryFile()
+        for term, _, sections, counts, positions in self._sorted_postings():
+            encoded = term.encode("utf-8")
+            run.write(_RUN_ENTRY.pack(len(encoded), len(sections), len(positions)))
+            run.write(encoded)
+            for values in (sections, counts, positions):
+                values.tofile(run)
+        run.seek(0)
+        self._runs.append(run)
+        self._postings = {}
+        self._buffered = 0
+
+    @staticmethod
+    def _read_run(run, run_number):
+        while True:
+            entry = run.read(_RUN_ENTRY.size)
+            if not entry:
+                return
+            term_length, n, n_positions = _RUN_ENTRY.unpack(entry)
+            term = run.read(term_length).decode("utf-8")
+            sections, counts, positions = array("I"), array("I"), array("I")
+            sections.fromfile(run, n)
+            counts.fromfile(run, n)
+            positions.fromfile(run, n_positions)
+            yield term, run_number, sections, counts, positions
+
+    def _merged_postings(self):
+        # Runs hold increasing section ids, so a term's postings concatenate in run order
+        if not self._runs:
+            yield from ((term, sections, counts, positions) for term, _, sections, counts, positions in self._sorted_postings())
+            return
+        if self._postings:
+            self._spill()
+        merged = heapq.merge(*(self._read_run(run, run_number) for run_number, run in enumerate(self._runs)))
+        current = None
+        for term, _, sections, counts, positions in merged:
+            if current is not None and current[0] == term:
+                current[1].extend(sections)
+                current[2].extend(counts)
+                current[3].extend(positions)
+                continue
+            if current is not None:
+                yield current
+            current = (term, sections, counts, positions)
+        if current is not None:
+            yield current
+
+    def close(self):
+        """Writes the index file (atomically) and frees the buffers."""
+        tmp_path = self.path + ".tmp"
+        term_offsets = array("Q", [0])
+        term_entries = array("Q")
+        term_blob = bytearray()
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * _HEADER_SIZE)
+            for term, sections, counts, positions in self._merged_postings():
+                ends = array("I", counts)
+                for i in range(1, len(ends)):
+                    ends[i] += ends[i - 1]
+                term_entries.extend((f.tell(), len(sections), len(positions)))
+                sections.tofile(f)
+                ends.tofile(f)
+                positions.tofile(f)
+                term_blob += term.encode("utf-8")
+                term_offsets.append(len(term_blob))
+
+            term_offsets_at = _write_aligned(f, term_offsets.tobytes())
+            term_entries_at = _write_aligned(f, term_entries.tobytes())
+            term_blob_at = _write_aligned(f, term_blob)
+            section_cities_at = _write_aligned(f, self._section_cities.tobytes())
+            meta_offsets_at = _write_aligned(f, self._meta_offsets.tobytes())
+            meta_blob_at = _write_aligned(f, b"")
+            self._meta_file.seek(0)
+            shutil.copyfileobj(self._meta_file, f)
+            city_list = json.dumps(sorted(self._cities, key=self._cities.get), ensure_ascii=False).encode("utf-8")
+            city_list_at = _write_aligned(f, city_list)
+
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, 1, len(self._section_cities), len(term_entries) // 3, term_offsets_at, term_entries_at,
+                                 term_blob_at, section_cities_at, meta_offsets_at, meta_blob_at, city_list_at, len(city_list)))
+        os.replace(tmp_path, self.path)
+        self._discard()
+
+    def _discard(self):
+        for run in self._runs:
+            run.close()
+        self._runs = []
+        self._postings = {}
+        self._meta_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+
+
+class OrdinanceIndex:
+    """A memory-mapped index file written by OrdinanceIndexWriter. Use as a context manager or close() it."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        (magic, little_endian, self.n_sections, self.n_terms, term_offsets_at, term_entries_at, term_blob_at, section_cities_at,
+         meta_offsets_at, meta_blob_at, city_list_at, city_list_size) = _HEADER.unpack_from(self._view)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an ordinance index")
+        if not little_endian or sys.byteorder != "little":
+            self.close()
+            raise ValueError("The ordinance index format is little-endian only")
+        self._term_offsets = self._view[term_offsets_at:term_offsets_at + 8 * (self.n_terms + 1)].cast("Q")
+        self._term_entries = self._view[term_entries_at:term_entries_at + 24 * self.n_terms].cast("Q")
+        self._term_blob = self._view[term_blob_at:term_blob_at + self._term_offsets[self.n_terms]]
+        self._section_cities = self._view[section_cities_at:section_cities_at + 4 * self.n_sections].cast("I")
+        self._meta_offsets = self._view[meta_offsets_at:meta_offsets_at + 8 * (self.n_sections + 1)].cast("Q")
+        self._meta_blob_at = meta_blob_at
+        self.cities = json.loads(bytes(self._view[city_list_at:city_list_at + city_list_size]))
+        self._city_ids = {city: city_id for city_id, city in enumerate(self.cities)}
+
+    def _term_id(self, term):
+        key = term.encode("utf-8")
+        offsets = self._term_offsets
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_blob[offsets[mid]:offsets[mid + 1]].tobytes() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self._term_blob[offsets[lo]:offsets[lo + 1]].tobytes() == key:
+            return lo
+        return None
+
+    @staticmethod
+    def _release(postings):
+        # Views into the mapping must be gone before close() can unmap it
+        for view in postings:
+            view.release()
+
+    def _postings(self, term):
+        # (section ids, cumulative position ends, positions) as views into the mapping, or None;
+        # callers _release them when done, so a query interrupted by an exception leaves none behind
+        term_id = self._term_id(term)
+        if term_id is None:
+            return None
+        offset, n, n_positions = self._term_entries[3 * term_id:3 * term_id + 3]
+        sections = self._view[offset:offset + 4 * n].cast("I")
+        ends = self._view[offset + 4 * n:offset + 8 * n].cast("I")
+        positions = self._view[offset + 8 * n:offset + 8 * n + 4 * n_positions].cast("I")
+        return sections, ends, positions
+
+    def document_frequency(self, term):
+        """Number of sections containing term (a single token)."""
+        term_id = self._term_id(term)
+        return 0 if term_id is None else self._term_entries[3 * term_id + 1]
+
+    def section(self, section_id):
+        """{"id", "city", "url", "heading"} of one section."""
+        start = self._meta_blob_at + self._meta_offsets[section_id]
+        end = self._meta_blob_at + self._meta_offsets[section_id + 1]
+        url, heading = json.loads(bytes(self._view[start:end]))
+        return {"id": section_id, "city": self.cities[self._section_cities[section_id]], "url": url, "heading": heading}
+
+    # --- Queries ---
+
+    def _parse_query(self, query):
+        # Recursive descent over: or := and ("OR" and)*; and := not ("AND"? not)*; not := "NOT" not | atom
+        tokens = []
+        for phrase, paren, word in _QUERY_TOKEN.findall(query):
+            if paren:
+                tokens.append(paren)
+            elif word in ("AND", "OR", "NOT"):
+                tokens.append(word)
+            else:
+                terms = tokenize(phrase or word)
+                tokens.append(_EMPTY if not terms else ("term", terms[0]) if len(terms) == 1 else ("phrase", terms))
+        position = 0
+
+        def peek():
+            return tokens[position] if position < len(tokens) else None
+
+        def combine(kind, operands):
+            operands = [node for node in operands if node is not _EMPTY]
+            if not operands:
+                return _EMPTY
+            return operands[0] if len(operands) == 1 else (kind, operands)
+
+        def parse_or():
+            nonlocal position
+            operands = [parse_and()]
+            while peek() == "OR":
+                position += 1
+                operands.append(parse_and())
+            return combine("or", operands)
+
+        def parse_and():
+            nonlocal position
+            operands = [parse_not()]
+            while peek() not in (None, "OR", ")"):
+                if peek() == "AND":
+                    position += 1
+                operands.append(parse_not())
+            return combine("and", operands)
+
+        def parse_not():
+            nonlocal position
+            token = peek()
+            if token == "NOT":
+                position += 1
+                operand = parse_not()
+                return _EMPTY if operand is _EMPTY else ("not", operand)
+            if token == "(":
+                position += 1
+                node = parse_or()
+                if peek() != ")":
+                    raise ValueError(f"Unbalanced parentheses in query {query!r}")
+                position += 1
+                return node
+            if token is None or isinstance(token, str):
+                raise ValueError(f"Expected a word or phrase at {token or 'end'!r} in query {query!r}")
+            position += 1
+            return token
+
+        if not tokens:
+            raise ValueError("Empty query")
+        node = parse_or()
+        if position != len(tokens):
+            raise ValueError(f"Unexpected {tokens[position]!r} in query {query!r}")
+        if node is _EMPTY:
+            raise ValueError(f"No searchable words in query {query!r}")
+        return node
+
+    def _size_estimate(self, node):
+        if node[0] == "term":
+            return self.document_frequency(node[1])
+        if node[0] == "phrase":
+            return min((self.document_frequency(term) for term in node[1]), default=0)
+        return self.n_sections
+
+    def _intersect_term(self, candidates, term):
+        postings = self._postings(term)
+        if postings is None:
+            return set()
+        sections = postings[0]
+        try:
+            if len(sections) > _PROBE_RATIO * len(candidates):
+                # Few candidates against a long list: binary-search it instead of reading it all
+                hits = set()
+                for section_id in candidates:
+                    i = bisect.bisect_left(sections, section_id)
+                    if i < len(sections) and sections[i] == section_id:
+                        hits.add(section_id)
+                return hits
+            return candidates.intersection(sections)
+        finally:
+            self._release(postings)
+
+    def _evaluate_and(self, operands):
+        positive = sorted((node for node in operands if node[0] != "not"), key=self._size_estimate)
+        negative = [node[1] for node in operands if node[0] == "not"]
+        if positive:
+            result = self._evaluate(positive[0])
+            for node in positive[1:]:
+                if not result:
+                    break
+                result = self._intersect_term(result, node[1]) if node[0] == "term" else result & self._evaluate(node, result)
+        else:
+            result = set(range(self.n_sections))
+        for node in negative:
+            if not result:
+                break
+            result -= self._evaluate(node)
+        return result
+
+    def _evaluate_phrase(self, terms, candidates=None):
+        if candidates is None:
+            candidates = self._evaluate(min((("term", term) for term in terms), key=self._size_estimate))
+        for term in terms:
+            if not candidates:
+                return candidates
+            candidates = self._intersect_term(candidates, term)
+        postings = [self._postings(term) for term in terms]
+        try:
+            # Rarest term (fewest positions overall) first; each term's phrase start positions are its positions minus its offset
+            order = sorted(range(len(terms)), key=lambda k: len(postings[k][2]))
+            shifts = [(-k).__add__ for k in order]
+            ordered = [postings[k] for k in order]
+            lows = [0] * len(ordered) # Candidates are visited in order, so each term's search resumes where the last one ended
+            hits = set()
+            for section_id in sorted(candidates):
+                starts = None
+                for k, (sections, ends, positions) in enumerate(ordered):
+                    i = lows[k] = bisect.bisect_left(sections, section_id, lows[k])
+                    with positions[ends[i - 1] if i else 0:ends[i]] as term_positions:
+                        if starts is None:
+                            starts = set(map(shifts[k], term_positions))
+                        else:
+                            starts.intersection_update(map(shifts[k], term_positions))
+                    if not starts:
+                        break
+                if starts:
+                    hits.add(section_id)
+            return hits
+        finally:
+            for term_postings in postings:
+                self._release(term_postings)
+
+    def _evaluate(self, node, candidates=None):
+        kind = node[0]
+        if kind == "term":
+            postings = self._postings(node[1])
+            if postings is None:
+                return set()
+            try:
+                return set(postings[0])
+            finally:
+                self._release(postings)
+        if kind == "phrase":
+            return self._evaluate_phrase(node[1], candidates)
+        if kind == "and":
+            return self._evaluate_and(node[1])
+        if kind == "or":
+            result = set()
+            for operand in node[1]:
+                result |= self._evaluate(operand)
+            return result
+        return set(range(self.n_sections)) - self._evaluate(node[1])
+
+    def search_ids(self, query, city=None):
+        """Sorted ids of the sections matching query, optionally only those of city. Raises ValueError on a malformed query."""
+        with metrics.timer("index_query_seconds"):
+            section_ids = self._evaluate(self._parse_query(query))
+            if city is not None:
+                city_id = self._city_ids.get(city)
+                section_ids = {section_id for section_id in section_ids if self._section_cities[section_id] == city_id}
+            return sorted(section_ids)
+
+    def search(self, query, city=None, limit=None):
+        """Matching sections as dicts (see section), in index order: cities and pages in url_queues order, then page order."""
+        return [self.section(section_id) for section_id in self.search_ids(query, city)[:limit]]
+
+    def close(self):
+        for name in ("_term_offsets", "_term_entries", "_term_blob", "_section_cities", "_meta_offsets", "_view"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# --- Fetching section text ---
+
+def _parse_sections(adapter, markup):
+    with metrics.timer("parse_seconds", module=adapter.name, mode="sections"):
+        extractor = adapter.section_extractor()
+        if extractor is not None:
+            return parse_with(markup, extractor).sections
+        from bs4 import BeautifulSoup
+        text = " ".join(adapter.extract_text(BeautifulSoup(markup, "html.parser")).split())
+        return [("", text)] if text else []
+
+
+def fetch_sections(adapter, url, headers, scheduler=None, cache=None):
+    """[(heading, text)] of one ordinance page; with a response_cache.ResponseCache, unchanged pages aren't parsed again."""
+    cache_kind = f"{adapter.name}_sections"
+    if cache is not None:
+        response = http_client.conditional_get(url, cache, scheduler=scheduler, headers=headers, timeout=15)
+        response.raise_for_status()
+        if response.not_modified:
+            cached_sections = cache.load_parsed(url, cache_kind)
+            if cached_sections is not None:
+                metrics.count("cache_revalidated_total", module=adapter.name)
+                return [tuple(section) for section in cached_sections]
+        sections = _parse_sections(adapter, response.text)
+        cache.store_parsed(url, cache_kind, sections)
+        return sections
+
+    extractor = adapter.section_extractor()
+    if extractor is None:
+        response = http_client.get(url, scheduler=scheduler, headers=headers, timeout=15)
+        response.raise_for_status()
+        return _parse_sections(adapter, response.text)
+    response = http_client.get(url, scheduler=scheduler, headers=headers, timeout=15, stream=True)
+    response.raise_for_status()
+    with metrics.timer("parse_seconds", module=adapter.name, mode="sections"): # Includes reading the body
+        return parse_stream(response, extractor).sections
+
+
+def build_ordinance_index(index_path, url_queues, bot_user_agent, publisher="amlegal", max_workers=8, scheduler=None, cache=None,
+                          spill_positions=20_000_000):
+    """
+    Fetches every page of url_queues ({city: url_queue}, e.g. sharded_crawl results) and writes the index to index_path.
+    Pages are fetched concurrently but indexed in queue order, so section ids are the same on every build of the same pages.
+    Pass a politeness.PolitenessScheduler to throttle per host. Returns the failed pages as [(city, url, error)].
+    """
+    adapter = get_adapter(publisher)
+    headers = {"User-Agent": bot_user_agent}
+    tasks = enumerate((city, url) for city, url_queue in url_queues.items() for url in url_queue)
+    errors = []
+    pages = 0
+    start_time = time.time()
+    print(f"Indexing {sum(len(url_queue) for url_queue in url_queues.values())} pages of {len(url_queues)} codes into {index_path}")
+
+    with OrdinanceIndexWriter(index_path, spill_positions) as writer, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}  # future -> (queue position, city, url)
+        finished = {} # queue position -> (city, url, future) for pages done ahead of an earlier one
+        next_position = 0
+        while True:
+            # Bounded (fetching and waiting to be indexed), so huge queues don't turn into millions of futures
+            while len(pending) + len(finished) < 4 * max_workers:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                position, (city, url) = task
+                pending[pool.submit(fetch_sections, adapter, url, headers, scheduler, cache)] = (position, city, url)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                position, city, url = pending.pop(future)
+                finished[position] = (city, url, future)
+            while next_position in finished:
+                city, url, future = finished.pop(next_position)
+                next_position += 1
+                try:
+                    sections = future.result()
+                except Exception as e:
+                    metrics.count("crawl_errors_total", crawl="ordinance_index", error=type(e).__name__)
+                    errors.append((city, url, str(e)))
+                    continue
+                metrics.count("crawl_pages_total", crawl="ordinance_index")
+                pages += 1
+                for heading, text in sections:
+                    writer.add_section(city, url, heading, text)
+        n_sections = len(writer)
+
+    print(f"  Indexed {n_sections} sections from {pages} pages in {time.time() - start_time:.2f} s; {len(errors)} pages failed")
+    for city, url, error in errors[:5]:
+        print(f"    {city}: {url}: {error}")
+    return errors
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Search an ordinance index built by build_ordinance_index.")
+    arg_parser.add_argument("index_path")
+    arg_parser.add_argument("query", help='e.g. \'"chicken" AND residential\'')
+    arg_parser.add_argument("--city", default=None)
+    arg_parser.add_argument("--limit", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    with OrdinanceIndex(args.index_path) as index:
+        start = time.perf_counter()
+        section_ids = index.search_ids(args.query, args.city)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{len(section_ids)} sections in {elapsed_ms:.2f} ms")
+        for section_id in section_ids[:args.limit]:
+            section = index.section(section_id)
+            print(f"  [{section['city']}] {section['heading'] or '(no heading)'}  {section['url']}")
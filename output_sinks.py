@@ -0,0 +1,134 @@
+import gzip
+import json
+
+# ==============================================================================
+# Streaming output sinks for scraped pages.
+# Every page becomes a few flat records in ONE output file instead of a CSV per
+# table:
+#   {"record": "page",  "url", "fetched_at", "main_text", "links"}
+#   {"record": "table", "url", "fetched_at", "table_index", "rows"}
+#   {"record": "infobox", "url", "fetched_at", "rows"}   rows: [label, value] pairs
+#   {"record": "error", "url", "fetched_at", "error"}
+# fetched_at is Unix time in seconds. Records are buffered and written in
+# batches. Two formats:
+#   JSONL   - appends; gzip-compressed when the path ends in ".gz"
+#   Parquet - one row group per batch, zstd-compressed; needs pyarrow
+# Use open_sink(path) to pick the format from the file name.
+# ==============================================================================
+
+# Column order shared by both formats (JSONL lines only carry the fields of their record type)
+RECORD_FIELDS = ("record", "url", "fetched_at", "main_text", "links", "table_index", "rows", "error")
+
+
+class _BatchedSink:
+    def __init__(self, path, batch_size):
+        self.path = path
+        self.batch_size = batch_size
+        self.records_written = 0
+        self._batch = []
+
+    def write(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_page(self, url, fetched_at, main_text, tables, links, infobox_rows=None):
+        """One page record, one table record per table (table_index counts from 0) and an infobox record if there are infobox rows."""
+        self.write({"record": "page", "url": url, "fetched_at": fetched_at, "main_text": main_text, "links": list(links)})
+        for table_index, rows in enumerate(tables):
+            self.write({"record": "table", "url": url, "fetched_at": fetched_at, "table_index": table_index, "rows": rows})
+        if infobox_rows:
+            self.write({"record": "infobox", "url": url, "fetched_at": fetched_at, "rows": [list(row) for row in infobox_rows]})
+
+    def write_error(self, url, fetched_at, error):
+        self.write({"record": "error", "url": url, "fetched_at": fetched_at, "error": str(error)})
+
+    def flush(self):
+        if self._batch:
+            self._write_batch(self._batch)
+            self.records_written += len(self._batch)
+            self._batch = []
+
+    def _write_batch(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonlSink(_BatchedSink):
+    """
+    Appends records to path as JSON lines, batch_size records per write.
+    A path ending in ".gz" is gzip-compressed; each run appends a new gzip member, which gzip readers accept.
+    """
+
+    def __init__(self, path, batch_size=100, compresslevel=6):
+        super().__init__(path, batch_size)
+        if path.endswith(".gz"):
+            self._file = gzip.open(path, "at", encoding="utf-8", compresslevel=compresslevel)
+        else:
+            self._file = open(path, "a", encoding="utf-8")
+
+    def _write_batch(self, records):
+        self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class ParquetSink(_BatchedSink):
+    """
+    Writes records to a new Parquet file at path (an existing file is replaced), one row group
+    per batch_size records. The file is only readable once close() has written its footer.
+    """
+
+    def __init__(self, path, batch_size=1000, compression="zstd"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from e
+        super().__init__(path, batch_size)
+        self._pa = pa
+        self._schema = pa.schema([
+            ("record", pa.string()),
+            ("url", pa.string()),
+            ("fetched_at", pa.timestamp("ms", tz="UTC")),
+            ("main_text", pa.string()),
+            ("links", pa.list_(pa.string())),
+            ("table_index", pa.int32()),
+            ("rows", pa.list_(pa.list_(pa.string()))),
+            ("error", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema, compression=compression)
+
+    def _write_batch(self, records):
+        columns = {field: [record.get(field) for record in records] for field in RECORD_FIELDS}
+        columns["fetched_at"] = [int(t * 1000) if t is not None else None for t in columns["fetched_at"]]
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+
+    def close(self):
+        super().close()
+        self._writer.close()
+
+
+def open_sink(path, output_format=None, **options):
+    """
+    Opens a sink for path. output_format is "jsonl" or "parquet"; None picks it from the
+    extension (".parquet" -> Parquet, anything else -> JSONL). options go to the sink class.
+    """
+    if output_format is None:
+        output_format = "parquet" if path.endswith(".parquet") else "jsonl"
+    if output_format == "jsonl":
+        return JsonlSink(path, **options)
+    if output_format == "parquet":
+        return ParquetSink(path, **options)
+    raise ValueError(f"Unknown output format {output_format!r}; choose 'jsonl' or 'parquet'")
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import metrics
+
+# ==============================================================================
+# Per-host politeness scheduler.
+# Every host gets a token bucket. Its ceiling comes from robots.txt
+# (Crawl-delay / Request-rate via a MultiDomainRobotsAuditor) and its current
+# rate adapts to what the server tells us (AIMD):
+#   - 429 / 503 (or retries on them) halve the rate and honour Retry-After
+#   - slow responses (latency above target_latency) shrink the rate a little
+#   - fast, successful responses add rate_step back, up to the ceiling
+# Call wait(url) before a request and record(...) after it; http_client.get
+# does both when given scheduler=.
+# ==============================================================================
+
+_THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (now if now is not None else time.time()))
+
+
+class _HostState:
+    __slots__ = ("rate", "max_rate", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate, max_rate, now):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated = now
+        self.blocked_until = 0.0
+
+
+class PolitenessScheduler:
+    """
+    robots_auditor: optional MultiDomainRobotsAuditor; its crawl_delay(url) caps each host's rate.
+    default_rate / max_rate / min_rate: requests per second.
+    burst: how many requests may go out back to back after an idle period.
+    """
+
+    def __init__(self, robots_auditor=None, default_rate=4.0, max_rate=16.0, min_rate=0.05,
+                 burst=2, target_latency=2.0, rate_step=0.25):
+        self.robots_auditor = robots_auditor
+        self.default_rate = default_rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.target_latency = target_latency
+        self.rate_step = rate_step
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _ensure_host(self, host, url):
+        # Robots lookup may hit the network, so it happens outside the lock; the auditor
+        # lets only one thread fetch and compile a host's robots.txt, the others wait for it
+        if host in self._hosts:
+            return
+        max_rate = self.max_rate
+        if self.robots_auditor is not None:
+            delay = self.robots_auditor.crawl_delay(url)
+            if delay > 0:
+                max_rate = min(max_rate, 1.0 / delay)
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = _HostState(min(self.default_rate, max_rate), max_rate, time.monotonic())
+
+    def _reserve(self, url):
+        # Takes a token for url's host and returns how long the caller must sleep before sending
+        host = urlsplit(url).netloc.lower()
+        self._ensure_host(host, url)
+        with self._lock:
+            now = time.monotonic()
+            state = self._hosts[host]
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            state.tokens -= 1.0 # May go negative: that reserves a future slot
+            delay = 0.0 if state.tokens >= 0 else -state.tokens / state.rate
+            return max(delay, state.blocked_until - now)
+
+    def wait(self, url):
+        """Blocks until a request to url's host is allowed."""
+        delay = self._reserve(url)
+        if delay > 0:
+            metrics.observe("politeness_wait_seconds", delay, host=urlsplit(url).netloc.lower())
+            time.sleep(delay)
+
+    async def wait_async(self, url):
+        delay = self._reserve(url)
+        if delay > 0:
+            metrics.observe("politeness_wait_seconds", delay, host=urlsplit(url).netloc.lower())
+            await asyncio.sleep(delay)
+
+    def record(self, url, status_code=None, latency=None, retry_after=None, throttled_retries=0):
+        """
+        Feeds one response back into the host's rate.
+        status_code=None means the request failed without a response (treated like a throttle).
+        throttled_retries: 429/503 responses that the HTTP layer already retried away.
+        """
+        host = urlsplit(url).netloc.lower()
+        self._ensure_host(host, url)
+        with self._lock:
+            now = time.monotonic()
+            state = self._hosts[host]
+            if status_code is None or status_code in _THROTTLE_STATUSES or throttled_retries:
+                state.rate = max(self.min_rate, state.rate / 2)
+                if retry_after:
+                    state.blocked_until = max(state.blocked_until, now + retry_after)
+            elif latency is not None and latency > self.target_latency:
+                state.rate = max(self.min_rate, state.rate * 0.8)
+            elif status_code < 400:
+                state.rate = min(state.max_rate, state.rate + self.rate_step)
+
+    def record_response(self, url, response, latency):
+        """record() for a requests.Response, reading Retry-After and urllib3's retry history."""
+        throttled_retries = 0
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None:
+            throttled_retries = sum(1 for entry in retries.history if entry.status in _THROTTLE_STATUSES)
+        self.record(
+            url,
+            status_code=response.status_code,
+            latency=latency,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+            throttled_retries=throttled_retries,
+        )
+
+    def current_rate(self, url):
+        """Requests per second currently allowed for url's host (for logging)."""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            state = self._hosts.get(host)
+            return state.rate if state is not None else None
@@ -0,0 +1,251 @@
+from html_parsing import is_non_text_tag
+
+# ==============================================================================
+# Publisher adapters for the code-library crawl core (url_queue_builder.build_url_queue).
+# The core owns fetching, concurrency, politeness, caching, checkpoints, dedup
+# and fingerprints; an adapter only says what is specific to one publisher:
+#   - which links on a page lead further into the code (extract_links)
+#   - the ordinance text of a page, for change detection (extract_text)
+#   - optionally the page's text split into headed sections, for the search
+#     index (section_extractor, see ordinance_index)
+#   - optionally an event-protocol extractor for streaming parses (link_extractor)
+#   - optionally a publisher-specific URL clean-up (canonicalize), applied before
+#     the frontier's generic canonicalization
+# To support a new publisher, subclass PublisherAdapter and register it in PUBLISHERS.
+# ==============================================================================
+
+
+class PublisherAdapter:
+    """Base class; name keys cached parse results and label appears in reports."""
+
+    name = "publisher"
+    label = "Publisher"
+
+    def canonicalize(self, url):
+        """Publisher-specific URL clean-up (e.g. dropping session parameters). Default: unchanged."""
+        return url
+
+    def extract_links(self, soup, is_root):
+        """Raw hrefs to follow from a parsed page (BeautifulSoup); is_root is True for the start page."""
+        raise NotImplementedError
+
+    def extract_text(self, soup):
+        """Ordinance text of a parsed page, used for content fingerprints."""
+        return soup.get_text(" ")
+
+    def link_extractor(self, is_root, collect_text=False):
+        """
+        Event-protocol extractor (see html_parsing) for streaming parses, with .links, .done and,
+        if collect_text, .content_text. None means the publisher has no streaming support.
+        """
+        return None
+
+    def section_extractor(self):
+        """
+        Event-protocol extractor with .sections ([(heading, text)] of the ordinance body) and .done.
+        None means ordinance_index falls back to extract_text as one section per page.
+        """
+        return None
+
+
+# --- AmLegal (codelibrary.amlegal.com) ---
+# The overview page lists the code's ToC as div.codenav__toc > div.toc-entry > div.toc-entry__wrap > a;
+# every other page lists its children as div#codecontent > div.Normal-Level > a.
+
+class AmLegalAdapter(PublisherAdapter):
+    name = "amlegal"
+    label = "AmLegal"
+
+    def extract_links(self, soup, is_root):
+        links_found_on_page = [] # Raw hrefs found
+
+        if is_root:
+            toc_container = soup.find("div", class_="codenav__toc")
+            if toc_container:
+                toc_entries = toc_container.find_all("div", class_=lambda c: c is not None and "toc-entry" in c.split())
+                for entry in toc_entries:
+                    wrap = entry.find("div", class_="toc-entry__wrap")
+                    if wrap:
+                        link_tag = wrap.find("a")
+                        if link_tag and link_tag.get("href"):
+                            links_found_on_page.append(link_tag.get("href"))
+        else:
+            content_area = soup.find("div", id="codecontent")
+            if content_area:
+                normal_level_divs = content_area.find_all("div", class_="Normal-Level")
+                if normal_level_divs:
+                    for item_div in normal_level_divs:
+                        link_tag = item_div.find("a")
+                        if link_tag and link_tag.get("href"):
+                            links_found_on_page.append(link_tag.get("href"))
+
+        return links_found_on_page
+
+    def extract_text(self, soup):
+        # Text of the ordinance body (div#codecontent), or "" if the page has none
+        content_area = soup.find("div", id="codecontent")
+        return content_area.get_text(" ") if content_area else ""
+
+    def link_extractor(self, is_root, collect_text=False):
+        return AmLegalLinkExtractor(is_root, collect_text)
+
+    def section_extractor(self):
+        return HeadedSectionExtractor("codecontent")
+
+
+# --- Streaming AmLegal link extraction ---
+# Event-driven equivalent of AmLegalAdapter.extract_links for html_parsing.parse_stream.
+# It only tracks the one container we care about (div.codenav__toc on the overview
+# page, div#codecontent elsewhere) and sets .done when that container closes,
+# so the rest of a large chapter page is never downloaded or parsed.
+# collect_text=True also keeps the container's text (see .content_text) for fingerprinting.
+class AmLegalLinkExtractor:
+    def __init__(self, is_overview_page, collect_text=False):
+        self.is_overview_page = is_overview_page
+        self.collect_text = collect_text
+        self.links = []
+        self.done = False
+        self._text_parts = []
+        self._skip_depth = None      # Depth of an open script/style element inside the container
+        self._depth = 0
+        self._container_depth = None # Depth of the open target container
+        self._waiting_entries = []   # Depths of open toc-entry divs that haven't met their wrap yet
+        self._link_scopes = []       # [depth, found_first_a] for open toc-entry__wrap / Normal-Level divs
+
+    def start(self, tag, attrs):
+        if self.done:
+            return
+        self._depth += 1
+        if self._container_depth is None:
+            if tag == "div":
+                if self.is_overview_page:
+                    if "codenav__toc" in (attrs.get("class") or "").split():
+                        self._container_depth = self._depth
+                elif attrs.get("id") == "codecontent":
+                    self._container_depth = self._depth
+            return
+
+        if self._skip_depth is None and is_non_text_tag(tag):
+            self._skip_depth = self._depth
+        if tag == "div":
+            classes = (attrs.get("class") or "").split()
+            if self.is_overview_page:
+                if "toc-entry" in classes:
+                    self._waiting_entries.append(self._depth)
+                elif "toc-entry__wrap" in classes and self._waiting_entries:
+                    self._waiting_entries = [] # This is the first wrap for every waiting entry
+                    self._link_scopes.append([self._depth, False])
+            elif "Normal-Level" in classes:
+                self._link_scopes.append([self._depth, False])
+        elif tag == "a":
+            claimed = False
+            for scope in self._link_scopes:
+                if not scope[1]:
+                    scope[1] = True # Only the first <a> in each scope counts
+                    claimed = True
+            href = attrs.get("href")
+            if claimed and href:
+                self.links.append(href)
+
+    def end(self, tag):
+        if self.done:
+            return
+        depth = self._depth
+        self._depth -= 1
+        if self._link_scopes and self._link_scopes[-1][0] == depth:
+            self._link_scopes.pop()
+        if self._waiting_entries and self._waiting_entries[-1] == depth:
+            self._waiting_entries.pop()
+        if self._skip_depth == depth:
+            self._skip_depth = None
+        if self._container_depth == depth:
+            self.done = True
+
+    def text(self, data):
+        if self.collect_text and self._container_depth is not None and self._skip_depth is None and not self.done:
+            self._text_parts.append(data)
+
+    @property
+    def content_text(self):
+        return " ".join(self._text_parts)
+
+
+# --- Section text ---
+# Splits the text of one container (div#<container_id>) into sections at its
+# headings (h1-h6): .sections is [(heading, body text)], with heading "" for
+# text before the first heading. Sets .done when the container closes.
+_HEADING_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+
+
+class HeadedSectionExtractor:
+    def __init__(self, container_id):
+        self.container_id = container_id
+        self.sections = []
+        self.done = False
+        self._depth = 0
+        self._container_depth = None
+        self._skip_depth = None    # Depth of an open script/style element inside the container
+        self._heading_depth = None # Depth of the open heading element
+        self._heading_parts = []
+        self._body_parts = []
+        self._heading = ""
+
+    def start(self, tag, attrs):
+        if self.done:
+            return
+        self._depth += 1
+        if self._container_depth is None:
+            if attrs.get("id") == self.container_id:
+                self._container_depth = self._depth
+            return
+        if self._skip_depth is None and is_non_text_tag(tag):
+            self._skip_depth = self._depth
+        elif tag in _HEADING_TAGS and self._heading_depth is None:
+            self._close_section()
+            self._heading_depth = self._depth
+
+    def end(self, tag):
+        if self.done:
+            return
+        depth = self._depth
+        self._depth -= 1
+        if self._skip_depth == depth:
+            self._skip_depth = None
+        if self._heading_depth == depth:
+            self._heading_depth = None
+            self._heading = " ".join(" ".join(self._heading_parts).split())
+            self._heading_parts = []
+        if self._container_depth == depth:
+            self._close_section()
+            self.done = True
+
+    def text(self, data):
+        if self._container_depth is None or self._skip_depth is not None or self.done:
+            return
+        if self._heading_depth is not None:
+            self._heading_parts.append(data)
+        else:
+            self._body_parts.append(data)
+
+    def _close_section(self):
+        body = " ".join(" ".join(self._body_parts).split())
+        if self._heading or body:
+            self.sections.append((self._heading, body))
+        self._heading = ""
+        self._body_parts = []
+
+
+# Publisher name -> adapter class
+PUBLISHERS = {
+    AmLegalAdapter.name: AmLegalAdapter,
+}
+
+
+def get_adapter(publisher):
+    """Adapter instance for a publisher name (see PUBLISHERS), or publisher itself if it already is an adapter."""
+    if isinstance(publisher, PublisherAdapter):
+        return publisher
+    try:
+        return PUBLISHERS[publisher]()
+    except KeyError:
+        raise ValueError(f"Unknown publisher {publisher!r}; choose from {sorted(PUBLISHERS)}") from None
@@ -0,0 +1,167 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from crawl_frontier import canonicalize_url
+
+# ==============================================================================
+# Local HTTP response cache for nightly re-crawls.
+# Bodies are stored zlib-compressed in one SQLite file, keyed by canonical URL,
+# together with their ETag / Last-Modified validators. http_client.conditional_get
+# sends those validators back; on 304 Not Modified the stored body is reused.
+# Callers can also store what they parsed out of a body (store_parsed) and get
+# it back on a 304 (load_parsed), so unchanged pages are not even re-parsed.
+# The cache is bounded: least recently used entries are evicted past max_bytes.
+# ==============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    encoding TEXT,
+    body BLOB NOT NULL,
+    parsed BLOB,
+    parsed_kind TEXT,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+
+class ResponseCache:
+    """
+    path: SQLite file for the cache.
+    max_bytes: upper bound on stored (compressed) bytes; LRU entries are evicted beyond it.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, compression_level=6):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def validators(self, url):
+        """Returns (etag, last_modified) stored for url, or None if url is not cached."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM responses WHERE url = ?", (canonicalize_url(url),)
+            ).fetchone()
+        return row
+
+    def load_body(self, url):
+        """Returns (text, encoding) of the cached body and marks it recently used, or None."""
+        key = canonicalize_url(url)
+        with self._lock:
+            row = self._conn.execute("SELECT body, encoding FROM responses WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), key))
+        encoding = row[1] or "utf-8"
+        return zlib.decompress(row[0]).decode(encoding, errors="replace"), encoding
+
+    def store(self, url, response):
+        """Stores a 200 response body with its validators (replacing any previous body and parsed data)."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return False # Nothing to revalidate with, so caching it would never save a download
+        encoding = response.encoding or "utf-8"
+        body = zlib.compress(response.text.encode(encoding, errors="replace"), self.compression_level)
+        key = canonicalize_url(url)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                old = self._conn.execute("SELECT size FROM responses WHERE url = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(url, etag, last_modified, encoding, body, parsed, parsed_kind, size, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, ?, ?)",
+                    (key, etag, last_modified, encoding, body, len(body), now, now),
+                )
+                self._total_bytes += len(body) - (old[0] if old else 0)
+                self._evict_locked()
+        return True
+
+    def touch(self, url, response):
+        """Records a 304: refreshes validators the server sent back and the access time."""
+        key = canonicalize_url(url)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE responses SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+                    "accessed_at = ? WHERE url = ?",
+                    (response.headers.get("ETag"), response.headers.get("Last-Modified"), time.time(), key),
+                )
+
+    def store_parsed(self, url, kind, value):
+        """Attaches JSON-serialisable parse results (of type kind) to url's current body."""
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), self.compression_level)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE responses SET parsed = ?, parsed_kind = ? WHERE url = ?",
+                    (blob, kind, canonicalize_url(url)),
+                )
+
+    def load_parsed(self, url, kind):
+        """Returns parse results stored for url's current body, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT parsed FROM responses WHERE url = ? AND parsed_kind = ?", (canonicalize_url(url), kind)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def _evict_locked(self):
+        # Drop least recently used entries until we are back under 90% of max_bytes
+        if self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_at").fetchall()
+        evicted = []
+        for url, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((url,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", evicted)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedResponse:
+    """
+    What http_client.conditional_get returns: a small stand-in for requests.Response.
+    not_modified is True when the server answered 304 and .text comes from the cache.
+    """
+
+    def __init__(self, url, status_code, text, not_modified, response):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.not_modified = not_modified
+        self.response = response # The underlying requests.Response
+        self.headers = response.headers
+
+    def raise_for_status(self):
+        if not self.not_modified:
+            self.response.raise_for_status()
@@ -2,9 +2,19 @@
 #urllib.robotparser is a module for parsing robots.txt files
 #urllib.parse is a module for parsing URLs
 #import urljoin to join URLs
+#http_client gives us pooled keep-alive sessions shared with the other fetchers
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
 import requests
+import http_client
 from urllib.robotparser import RobotFileParser
-from urllib.parse import urljoin
+from robots_matcher import CompiledRobotsRules
+from urllib.parse import urljoin, urlsplit
 
 
 #define a class for the robots auditor
@@ -20,6 +30,7 @@ class RobotsAuditor:
     def __init__(self, user_agent="AvniProjectBot/1.0"): # Replace with your bot's actual user-agent
         self.user_agent = user_agent
         self.parser = RobotFileParser()
+        self.rules = None # CompiledRobotsRules once a robots.txt has been parsed (handles * and $ wildcards)
 
     #fetch_robots_txt is a method that fetches the robots.txt file for a given domain
     #domain_url is the URL of the domain
@@ -29,6 +40,7 @@ class RobotsAuditor:
         Fetches the robots.txt file for a given domain.
         Returns True if fetched and parsing was initiated, False if a critical error occurred.
         """
+        self.rules = None # Forget rules from any previous fetch
         # Ensure domain_url has a scheme (http or https)
         if not domain_url.startswith(('http://', 'https://')):
             if not "://" in domain_url: # simple check if any scheme is present
@@ -42,11 +54,12 @@ class RobotsAuditor:
         robots_url = urljoin(domain_url, "robots.txt") # Construct full URL for robots.txt
         print(f"Fetching robots.txt from: {robots_url}")
         try:
-            response = requests.get(robots_url, timeout=10) # Make the HTTP GET request
+            response = http_client.get(robots_url, timeout=10) # Make the HTTP GET request
             response.raise_for_status() # Raise an exception for HTTP errors (4xx client error, 5xx server error)
             
             # If successful, parse the content
             self.parser.parse(response.text.splitlines())
+            self.rules = CompiledRobotsRules.parse(response.text, self.user_agent)
             return True # Successfully fetched and parsed
         except requests.exceptions.HTTPError as e:
             print(f"HTTP error fetching {robots_url}: {e}")
@@ -79,8 +92,193 @@ class RobotsAuditor:
             print("Error: Robots.txt parser not initialized.")
             return False 
         
+        if self.rules is not None:
+            return self.rules.can_fetch(url_to_check)
         return self.parser.can_fetch(self.user_agent, url_to_check)
 
+    #can_fetch_many filters a whole list of URLs in one pass and returns the allowed ones in order
+    def can_fetch_many(self, urls):
+        if self.rules is not None:
+            return self.rules.can_fetch_many(urls)
+        return [url for url in urls if self.can_fetch(url)]
+
+#MultiDomainRobotsAuditor checks URLs on any number of domains with one object
+#rules are picked from the URL passed to can_fetch, so there is no separate fetch step
+#parsed rules live in an in-memory LRU (max_domains entries) so most lookups are a dict hit
+#cache_dir optionally keeps robots.txt bodies on disk between runs
+#expiry follows Cache-Control max-age / Expires when honour_http_cache is on, else default_ttl seconds
+#min_ttl keeps even "no-cache" rules in memory for a while so a crawl doesn't refetch robots.txt per URL
+class MultiDomainRobotsAuditor:
+    def __init__(self, user_agent="AvniProjectBot/1.0", max_domains=256, cache_dir=None,
+                 default_ttl=24 * 3600, min_ttl=60, error_ttl=300, honour_http_cache=True):
+        self.user_agent = user_agent
+        self.max_domains = max_domains
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.error_ttl = error_ttl # Network failures are cached briefly (memory only) so we retry soon
+        self.honour_http_cache = honour_http_cache
+        self._rules = OrderedDict() # origin -> (CompiledRobotsRules, expires_at), oldest first
+        self._lock = threading.Lock() # Guards _rules and _loading; fetch threads share one auditor
+        self._loading = {} # origin -> lock held while one thread loads its rules
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def can_fetch(self, url_to_check):
+        """Checks url_to_check against the robots.txt of its own domain."""
+        return self.rules_for(url_to_check).can_fetch(url_to_check)
+
+    #can_fetch_many filters a whole url_queue (e.g. from get_urls_from_amlegal) in one pass per domain
+    #returns the allowed URLs in their original order
+    def can_fetch_many(self, urls):
+        urls_by_origin = OrderedDict()
+        for url in urls:
+            # Slice out scheme://host instead of a full urlsplit per URL
+            host_end = url.find("/", url.find("://") + 3)
+            origin = (url if host_end < 0 else url[:host_end]).lower()
+            urls_by_origin.setdefault(origin, []).append(url)
+        if len(urls_by_origin) == 1: # Common case: one code library, order already preserved
+            (origin_urls,) = urls_by_origin.values()
+            return self.rules_for(origin_urls[0]).can_fetch_many(origin_urls)
+        allowed = set()
+        for origin_urls in urls_by_origin.values():
+            allowed.update(self.rules_for(origin_urls[0]).can_fetch_many(origin_urls))
+        return [url for url in urls if url in allowed]
+
+    #crawl_delay returns the minimum seconds between requests to url's domain (Crawl-delay / Request-rate)
+    def crawl_delay(self, url):
+        return self.rules_for(url).min_delay
+
+    #rules_for returns the parsed rules for the domain of url, loading them from memory, disk or network
+    #only one thread loads a given domain; others asking for it meanwhile wait and reuse its rules
+    def rules_for(self, url):
+        origin = _robots_origin(url)
+        rules = self._cached_rules(origin)
+        if rules is not None:
+            return rules
+        with self._lock:
+            loading = self._loading.setdefault(origin, threading.Lock())
+        with loading:
+            rules = self._cached_rules(origin) # Loaded by the thread we waited for
+            if rules is not None:
+                return rules
+            now = time.time()
+            record = self._load_from_disk(origin, now)
+            if record is None:
+                record = self._fetch(origin, now)
+                if record["persist"]:
+                    self._save_to_disk(origin, record)
+
+            rules = _build_robots_rules(record["status"], record["body"], self.user_agent)
+            with self._lock:
+                self._rules[origin] = (rules, record["expires_at"])
+                self._rules.move_to_end(origin)
+                while len(self._rules) > self.max_domains:
+                    self._rules.popitem(last=False) # Evict least recently used domain
+                del self._loading[origin]
+        return rules
+
+    def _cached_rules(self, origin):
+        with self._lock:
+            entry = self._rules.get(origin)
+            if entry is not None and entry[1] > time.time():
+                self._rules.move_to_end(origin)
+                return entry[0]
+        return None
+
+    def _fetch(self, origin, now):
+        robots_url = origin + "/robots.txt"
+        print(f"Fetching robots.txt from: {robots_url}")
+        try:
+            response = http_client.get(robots_url, headers={"User-Agent": self.user_agent}, timeout=10)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching {robots_url}: {e}. Assuming disallow all for {self.error_ttl}s.")
+            return {"status": None, "body": "", "expires_at": now + self.error_ttl, "persist": False}
+
+        if response.status_code not in _DEFINITIVE_STATUSES:
+            # 5xx, 429 and odd 4xx are transient; disallow for a short while and keep them out of the disk cache
+            print(f"Status {response.status_code} fetching {robots_url}. Assuming disallow all for {self.error_ttl}s.")
+            return {"status": response.status_code, "body": "", "expires_at": now + self.error_ttl, "persist": False}
+
+        ttl = self.default_ttl
+        if self.honour_http_cache:
+            ttl = _http_cache_ttl(response.headers, now, self.default_ttl)
+        body = response.text if response.status_code == 200 else ""
+        return {"status": response.status_code, "body": body,
+                "expires_at": now + max(ttl, self.min_ttl), "persist": ttl > 0}
+
+    def _cache_path(self, origin):
+        return os.path.join(self.cache_dir, hashlib.sha1(origin.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_from_disk(self, origin, now):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(origin), "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("origin") != origin or record.get("expires_at", 0) <= now:
+            return None
+        record["persist"] = False # Already on disk
+        return record
+
+    def _save_to_disk(self, origin, record):
+        if not self.cache_dir:
+            return
+        data = {"origin": origin, "status": record["status"], "body": record["body"], "expires_at": record["expires_at"]}
+        tmp_path = self._cache_path(origin) + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._cache_path(origin)) # Atomic swap so readers never see half a file
+        except OSError as e:
+            print(f"Could not write robots.txt cache for {origin}: {e}")
+
+
+def _robots_origin(url):
+    # scheme://host of url, lowercased; robots.txt is per scheme+host
+    if "://" not in url:
+        url = "http://" + url
+    split_url = urlsplit(url)
+    return f"{split_url.scheme.lower()}://{split_url.netloc.lower()}"
+
+
+# Statuses whose answer is worth caching for the full TTL; anything else is retried after error_ttl
+_DEFINITIVE_STATUSES = (200, 401, 403, 404, 410)
+
+
+def _build_robots_rules(status, body, user_agent):
+    # Same fallbacks as RobotsAuditor.fetch_robots_txt: 404 (or 410 Gone) allows all,
+    # other errors (or no response at all) disallow all for safety
+    if status == 200:
+        return CompiledRobotsRules.parse(body, user_agent)
+    if status in (404, 410):
+        return CompiledRobotsRules.allow_all()
+    return CompiledRobotsRules.disallow_all()
+
+
+def _http_cache_ttl(headers, now, default_ttl):
+    # Seconds the response may be reused for, from Cache-Control or Expires
+    cache_control = headers.get("Cache-Control", "").lower()
+    directives = [d.strip() for d in cache_control.split(",") if d.strip()]
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+    for directive in directives:
+        if directive.startswith("max-age="):
+            try:
+                return max(0, int(directive[len("max-age="):]))
+            except ValueError:
+                break
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            expires_at = parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return 0 # Invalid Expires means "already expired"
+        return max(0, expires_at - now)
+    return default_ttl
+
 # --- Main execution for testing ---
 if __name__ == "__main__":
     # --- Unit Test Example 1: Wikipedia ---
@@ -129,6 +327,14 @@ if __name__ == "__main__":
     else:
         print(f"Could not reliably fetch or parse robots.txt for {domain2} for the auditor to make a decision.")
 
+    # --- Multi-domain auditor: one object, rules picked per URL, cached on disk ---
+    print("\n--- Testing MultiDomainRobotsAuditor ---")
+    multi_auditor = MultiDomainRobotsAuditor(user_agent="AvniProjectBot/1.0", cache_dir=".robots_cache")
+    for url in ["https://en.wikipedia.org/wiki/Main_Page",
+                "https://codelibrary.amlegal.com/codes/chicago/latest/chicago_il/0-0-0-2595356",
+                "https://codelibrary.amlegal.com/search"]:
+        print(f"Can '{multi_auditor.user_agent}' fetch {url}? {multi_auditor.can_fetch(url)}")
+
     # --- Key Metric Checks --- (These print statements are fine as they are)
     print("\n--- Key Metric Checks ---")
     print("Robots coverage — ≥ 2 domains parsed: The tests above attempt to parse two domains.")
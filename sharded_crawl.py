@@ -0,0 +1,379 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from urllib.parse import urljoin
+
+import metrics
+from crawl_frontier import canonical_host, canonicalize_url, url_key
+from politeness import parse_retry_after
+from publisher_adapters import get_adapter
+from url_queue_builder import fetch_page
+
+# ==============================================================================
+# Sharded queue building for many code roots at once (every county we track).
+# All state lives in one SQLite file, the shared frontier store:
+#   roots   one row per code root (e.g. an AmLegal overview page)
+#   pages   every discovered page, keyed on (root, url_key); its state moves
+#           pending -> claimed -> done, or back to pending on an error until
+#           max_attempts, then failed. Pages at max_depth are stored as leaves
+#           (discovered, never fetched), like build_url_queue does.
+#   hosts   per-host request spacing shared by every worker
+# Workers are separate processes that pull small batches of pages from the
+# store instead of owning a fixed shard, so idle workers keep taking whatever
+# is left (work stealing). A claim is a lease: if a worker dies or stalls, its
+# pages are handed to another worker once the lease runs out.
+# Politeness is enforced in the store, not per process: each request reserves
+# the host's next slot (host_interval apart, raised to robots.txt Crawl-delay
+# when a robots auditor is given), and 429/503 responses double the host's
+# interval for every worker.
+# More machines can join a crawl by running
+#   python sharded_crawl.py worker --store STORE --user-agent ...
+# against the same store file. It must live on a filesystem where SQLite's
+# locking works (local disk, or a network filesystem with working POSIX locks).
+# Rerunning with the same store resumes; a finished store just returns results.
+# ==============================================================================
+
+PENDING, CLAIMED, DONE, LEAF, FAILED = range(5)
+
+_THROTTLE_STATUSES = (429, 503)
+
+# Longest spacing throttle backoff can push a host to, in seconds
+MAX_HOST_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS roots (root_id INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS pages (
+    root_id INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (root_id, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pages_by_state ON pages (state, depth);
+CREATE TABLE IF NOT EXISTS hosts (host TEXT PRIMARY KEY, base_interval REAL NOT NULL, interval REAL NOT NULL, next_allowed REAL NOT NULL);
+"""
+
+
+class ShardedCrawlStore:
+    """
+    The shared frontier store (one SQLite file). Every process opens its own instance.
+    Writes run in short BEGIN IMMEDIATE transactions, so concurrent workers queue up
+    on the write lock (up to timeout seconds) instead of failing.
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _write(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def configure(self, publisher, max_depth):
+        """Stores the crawl settings; raises ValueError if the store was started with different ones."""
+        with self._write() as conn:
+            stored = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('publisher', 'max_depth')").fetchall())
+            wanted = {"publisher": publisher, "max_depth": str(max_depth)}
+            if stored and stored != wanted:
+                raise ValueError(f"Store {self.path} was started with {stored}, not {wanted}")
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", wanted.items())
+
+    def settings(self):
+        """(publisher, max_depth) the store was configured with."""
+        stored = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        if "publisher" not in stored:
+            raise ValueError(f"Store {self.path} has no crawl configured yet")
+        return stored["publisher"], int(stored["max_depth"])
+
+    def add_roots(self, root_urls, host_interval, robots_auditor=None):
+        """Queues each root page (already known roots are left as they are) and sets up its host's spacing."""
+        now = time.time()
+        hosts = {}
+        for root_url in root_urls:
+            host = canonical_host(root_url)
+            if host not in hosts:
+                delay = robots_auditor.crawl_delay(root_url) if robots_auditor is not None else 0
+                hosts[host] = max(host_interval, delay or 0)
+        with self._write() as conn:
+            for root_url in root_urls:
+                canonical = canonicalize_url(root_url)
+                conn.execute("INSERT OR IGNORE INTO roots (url) VALUES (?)", (canonical,))
+                root_id = conn.execute("SELECT root_id FROM roots WHERE url = ?", (canonical,)).fetchone()[0]
+                conn.execute("INSERT OR IGNORE INTO pages (root_id, key, url, depth, state) VALUES (?, ?, ?, 0, ?)",
+                             (root_id, url_key(canonical), canonical, PENDING))
+            conn.executemany(
+                "INSERT INTO hosts (host, base_interval, interval, next_allowed) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(host) DO UPDATE SET base_interval = excluded.base_interval, "
+                "interval = MAX(interval, excluded.base_interval)",
+                ((host, interval, interval, now) for host, interval in hosts.items()),
+            )
+
+    def claim(self, worker, limit, lease_seconds):
+        """
+        Leases up to limit pages to worker, shallowest first; pages whose lease ran out are taken over.
+        Returns [(root_id, root_url, url, key, depth)].
+        """
+        now = time.time()
+        with self._write() as conn:
+            rows = conn.execute(
+                "SELECT pages.root_id, roots.url, pages.url, pages.key, pages.depth FROM pages JOIN roots USING (root_id) "
+                "WHERE pages.state = ? OR (pages.state = ? AND pages.lease_until < ?) ORDER BY pages.depth LIMIT ?",
+                (PENDING, CLAIMED, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE pages SET state = ?, worker = ?, lease_until = ? WHERE root_id = ? AND key = ?",
+                ((CLAIMED, worker, now + lease_seconds, root_id, key) for root_id, _, _, key, _ in rows),
+            )
+        return rows
+
+    def complete(self, root_id, key, child_urls, child_depth, max_depth):
+        """
+        Marks a page done and adds the canonical child_urls it links to (pages already known are skipped).
+        A fetch that finished after its lease ran out still counts; the worker that took the page over
+        just completes it a second time, which changes nothing.
+        """
+        child_state = PENDING if child_depth < max_depth else LEAF
+        with self._write() as conn:
+            conn.execute("UPDATE pages SET state = ?, worker = NULL, lease_until = NULL, error = NULL WHERE root_id = ? AND key = ?",
+                         (DONE, root_id, key))
+            conn.executemany(
+                "INSERT OR IGNORE INTO pages (root_id, key, url, depth, state) VALUES (?, ?, ?, ?, ?)",
+                ((root_id, url_key(child), child, child_depth, child_state) for child in child_urls),
+            )
+
+    def fail(self, worker, root_id, key, error, max_attempts):
+        """
+        Records worker's failed fetch; the page goes back to pending until it has failed max_attempts times.
+        Ignored (returns False) once worker no longer holds the page: its lease ran out and the page was
+        taken over or finished, and releasing it would hand another worker's claim to a third.
+        """
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE pages SET attempts = attempts + 1, error = ?, worker = NULL, lease_until = NULL, "
+                "state = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END WHERE root_id = ? AND key = ? AND state = ? AND worker = ?",
+                (error, max_attempts, FAILED, PENDING, root_id, key, CLAIMED, worker),
+            )
+        return cursor.rowcount > 0
+
+    def reserve_host(self, host):
+        """Books the host's next request slot; returns how many seconds to wait before using it."""
+        now = time.time()
+        with self._write() as conn:
+            row = conn.execute("SELECT interval, next_allowed FROM hosts WHERE host = ?", (host,)).fetchone()
+            if row is None:
+                return 0.0 # Not a root's host (add_roots sets every one up); nothing to space against
+            interval, next_allowed = row
+            slot = max(now, next_allowed)
+            conn.execute("UPDATE hosts SET next_allowed = ? WHERE host = ?", (slot + interval, host))
+        return slot - now
+
+    def report_host(self, host, throttled, retry_after=None):
+        """Throttled responses double the host's spacing (and honour Retry-After); successes ease it back to its base."""
+        now = time.time()
+        with self._write() as conn:
+            if throttled:
+                conn.execute(
+                    "UPDATE hosts SET interval = MIN(?, MAX(interval * 2, 0.1)), next_allowed = MAX(next_allowed, ?) WHERE host = ?",
+                    (MAX_HOST_INTERVAL, now + (retry_after or 0), host),
+                )
+            else:
+                conn.execute("UPDATE hosts SET interval = MAX(base_interval, interval * 0.9) WHERE host = ? AND interval > base_interval",
+                             (host,))
+
+    def outstanding(self):
+        """(pending pages, claimed pages)."""
+        counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM pages WHERE state IN (?, ?) GROUP BY state", (PENDING, CLAIMED)))
+        return counts.get(PENDING, 0), counts.get(CLAIMED, 0)
+
+    def progress(self):
+        """Page counts by state name."""
+        names = {PENDING: "pending", CLAIMED: "claimed", DONE: "done", LEAF: "leaf", FAILED: "failed"}
+        counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM pages GROUP BY state"))
+        return {name: counts.get(state, 0) for state, name in names.items()}
+
+    def results(self):
+        """{root URL: sorted discovered URLs}, the same url_queue build_url_queue returns (root page excluded)."""
+        results = {url: [] for (url,) in self._conn.execute("SELECT url FROM roots")}
+        for root_url, url in self._conn.execute(
+                "SELECT roots.url, pages.url FROM pages JOIN roots USING (root_id) WHERE pages.depth > 0 ORDER BY pages.url"):
+            results[root_url].append(url)
+        return results
+
+    def failed_pages(self):
+        """{root URL: [(url, depth, error, attempts)]} for pages that ran out of attempts."""
+        failed = {}
+        for root_url, url, depth, error, attempts in self._conn.execute(
+                "SELECT roots.url, pages.url, pages.depth, pages.error, pages.attempts FROM pages JOIN roots USING (root_id) "
+                "WHERE pages.state = ? ORDER BY pages.url", (FAILED,)):
+            failed.setdefault(root_url, []).append((url, depth, error, attempts))
+        return failed
+
+    def close(self):
+        self._conn.close()
+
+
+def run_worker(store_path, bot_user_agent, worker_id=None, batch_size=8, lease_seconds=300, max_attempts=3, poll_interval=1.0):
+    """
+    Crawls pages from the store until none are pending or claimed anywhere. Returns the number of pages fetched.
+    While other workers still hold claims it keeps polling, since their pages can add new work.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    headers = {"User-Agent": bot_user_agent}
+    store = ShardedCrawlStore(store_path)
+    pages_fetched = 0
+    try:
+        publisher, max_depth = store.settings()
+        adapter = get_adapter(publisher)
+        while True:
+            batch = store.claim(worker_id, batch_size, lease_seconds)
+            if not batch:
+                if store.outstanding() == (0, 0):
+                    break
+                time.sleep(poll_interval)
+                continue
+            for root_id, root_url, url, key, depth in batch:
+                host = canonical_host(url)
+                delay = store.reserve_host(host)
+                if delay > 0:
+                    metrics.observe("politeness_wait_seconds", delay, host=host)
+                    time.sleep(delay)
+                try:
+                    links_found_on_page, _ = fetch_page(adapter, url, headers, depth == 0)
+                except Exception as e:
+                    response = getattr(e, "response", None)
+                    if response is not None and response.status_code in _THROTTLE_STATUSES:
+                        store.report_host(host, throttled=True, retry_after=parse_retry_after(response.headers.get("Retry-After")))
+                    metrics.count("crawl_errors_total", crawl="sharded", error=type(e).__name__)
+                    store.fail(worker_id, root_id, key, str(e), max_attempts)
+                    continue
+                store.report_host(host, throttled=False)
+
+                # Same rules as the single-root crawl: canonical URLs on the root's own host only
+                root_host = canonical_host(root_url)
+                child_urls = set()
+                for rel_href in links_found_on_page:
+                    child_url = canonicalize_url(adapter.canonicalize(urljoin(url, rel_href)))
+                    if canonical_host(child_url) == root_host:
+                        child_urls.add(child_url)
+                store.complete(root_id, key, child_urls, depth + 1, max_depth)
+                metrics.count("crawl_pages_total", crawl="sharded")
+                pages_fetched += 1
+    finally:
+        store.close()
+    return pages_fetched
+
+
+def _write_merged_output(output_path, results, failed):
+    # One JSON line per root: {"root", "urls", "failed": [[url, depth, error, attempts], ...]}
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for root_url in sorted(results):
+            record = {"root": root_url, "urls": results[root_url], "failed": failed.get(root_url, [])}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, output_path)
+
+
+def build_url_queues_sharded(root_urls, bot_user_agent, store_path="sharded_crawl.sqlite", workers=None, publisher="amlegal", max_depth=2,
+                             host_interval=0.25, robots_auditor=None, batch_size=8, lease_seconds=300, max_attempts=3,
+                             output_path=None, progress_every=10.0):
+    """
+    Builds the url_queue of every root in root_urls with workers processes (default: one per CPU) sharing store_path.
+    host_interval: minimum seconds between requests to one host across all workers (robots_auditor can raise it).
+    output_path: also writes the merged results as JSON lines (see _write_merged_output).
+    Returns {canonical root URL: url_queue}.
+    """
+    workers = workers or os.cpu_count() or 1
+    root_urls = list(dict.fromkeys(root_urls))
+    store = ShardedCrawlStore(store_path)
+    try:
+        store.configure(getattr(publisher, "name", publisher), max_depth)
+        store.add_roots(root_urls, host_interval, robots_auditor)
+    finally:
+        store.close()
+
+    print(f"Sharded crawl of {len(root_urls)} roots with {workers} workers (store={store_path}, max_depth={max_depth})")
+    start_time = time.time()
+    if workers == 1:
+        pages_fetched = run_worker(store_path, bot_user_agent, None, batch_size, lease_seconds, max_attempts)
+    else:
+        # spawn: workers start clean instead of inheriting the parent's sessions and locks
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(run_worker, store_path, bot_user_agent, None, batch_size, lease_seconds, max_attempts)
+                       for _ in range(workers)]
+            monitor = ShardedCrawlStore(store_path)
+            try:
+                while wait(futures, timeout=progress_every)[1]:
+                    counts = monitor.progress()
+                    print(f"  {time.time() - start_time:6.0f} s  " + "  ".join(f"{name}={n}" for name, n in counts.items()))
+            finally:
+                monitor.close()
+            pages_fetched = sum(future.result() for future in futures)
+
+    store = ShardedCrawlStore(store_path)
+    try:
+        results = store.results()
+        failed = store.failed_pages()
+    finally:
+        store.close()
+    if output_path:
+        _write_merged_output(output_path, results, failed)
+
+    duration = time.time() - start_time
+    print(f"  Fetched {pages_fetched} pages in {duration:.2f} s; {sum(len(urls) for urls in results.values())} URLs "
+          f"across {len(results)} roots, {sum(len(pages) for pages in failed.values())} pages failed")
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Sharded multi-process queue building for many code roots.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    crawl_parser = commands.add_parser("crawl", help="Queue roots and crawl them with local worker processes")
+    crawl_parser.add_argument("roots_file", help="Text file with one code root URL per line")
+    crawl_parser.add_argument("--workers", type=int, default=None)
+    crawl_parser.add_argument("--publisher", default="amlegal")
+    crawl_parser.add_argument("--max-depth", type=int, default=2)
+    crawl_parser.add_argument("--host-interval", type=float, default=0.25)
+    crawl_parser.add_argument("--output", default="sharded_urls.jsonl")
+    worker_parser = commands.add_parser("worker", help="Join an existing crawl (e.g. from another machine)")
+    worker_parser.add_argument("--workers", type=int, default=1)
+    for command_parser in (crawl_parser, worker_parser):
+        command_parser.add_argument("--store", default="sharded_crawl.sqlite")
+        command_parser.add_argument("--user-agent", default="AvniProjectBot/1.0")
+    args = arg_parser.parse_args()
+
+    if args.command == "crawl":
+        with open(args.roots_file, "r", encoding="utf-8") as f:
+            root_urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        build_url_queues_sharded(root_urls, args.user_agent, args.store, args.workers, args.publisher, args.max_depth,
+                                 args.host_interval, output_path=args.output)
+    elif args.workers == 1:
+        print(f"Fetched {run_worker(args.store, args.user_agent)} pages")
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(run_worker, args.store, args.user_agent) for _ in range(args.workers)]
+            print(f"Fetched {sum(future.result() for future in futures)} pages")
+
+
+if __name__ == "__main__":
+    main()
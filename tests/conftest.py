@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# The project is a set of top-level modules, not an installed package; the fixture server lives in benchmarks/
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _REPO_DIR)
+sys.path.insert(0, os.path.join(_REPO_DIR, "benchmarks"))
+
+from fixture_server import FixtureServer, FixtureSite  # noqa: E402
+
+
+@pytest.fixture
+def fixture_server(tmp_path):
+    """
+    serve({site: {path_with_query: body or (status, content_type, body)}}, latency=0.0) records the
+    responses into a temporary fixture set and serves it; returns the started FixtureServer.
+    """
+    servers = []
+
+    def serve(sites, latency=0.0):
+        for name, responses in sites.items():
+            site = FixtureSite(str(tmp_path / name))
+            for path_url, response in responses.items():
+                status, content_type, body = response if isinstance(response, tuple) else (200, "text/html; charset=utf-8", response)
+                site.add(path_url, status, {"Content-Type": content_type}, body.encode("utf-8") if isinstance(body, str) else body)
+            site.save()
+        servers.append(FixtureServer(str(tmp_path), latency=latency).start())
+        return servers[-1]
+
+    yield serve
+    for server in servers:
+        server.stop()
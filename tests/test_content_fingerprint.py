@@ -0,0 +1,51 @@
+from content_fingerprint import FingerprintSnapshot, hamming_distance, simhash
+
+ORDINANCE = (
+    "Sec. 4-12. Keeping of fowl. No person shall keep more than six hens within the town limits, "
+    "and no roosters shall be kept on any lot smaller than one acre. Coops shall be set back at least "
+    "twenty feet from any dwelling on an adjoining lot and kept in a clean and sanitary condition."
+)
+
+
+def test_simhash_ignores_case_whitespace_and_punctuation():
+    reformatted = ORDINANCE.upper().replace(" ", "\n  ").replace(".", " ;")
+    assert simhash(reformatted) == simhash(ORDINANCE)
+    assert -(1 << 63) <= simhash(ORDINANCE) < (1 << 63)
+
+
+def test_similar_texts_are_closer_than_different_ones():
+    amended = ORDINANCE.replace("six hens", "eight hens")
+    unrelated = "Sec. 9-1. Parking. Vehicles shall not be parked on any public street for more than 72 hours."
+    assert 0 < hamming_distance(simhash(ORDINANCE), simhash(amended)) < hamming_distance(simhash(ORDINANCE), simhash(unrelated))
+    assert simhash("") == simhash("   ")
+
+
+def test_snapshot_reports_added_removed_and_changed(tmp_path):
+    snapshot = FingerprintSnapshot(str(tmp_path / "fingerprints.sqlite"))
+    first = {"/a": simhash("alpha text here"), "/b": simhash("beta text here"), "/c": simhash("gamma text here")}
+    assert snapshot.update(first, first) == {"added": ["/a", "/b", "/c"], "removed": [], "changed": []}
+
+    second = {"/a": first["/a"], "/b": simhash("beta text rewritten"), "/d": simhash("delta")}
+    assert snapshot.update(second, second) == {"added": ["/d"], "removed": ["/c"], "changed": ["/b"]}
+    assert snapshot.load() == second
+    snapshot.close()
+
+
+def test_unfetched_pages_keep_their_fingerprint(tmp_path):
+    snapshot = FingerprintSnapshot(str(tmp_path / "fingerprints.sqlite"))
+    snapshot.update(["/a", "/b"], {"/a": simhash("alpha")}) # /b discovered but never fetched
+    assert snapshot.load() == {"/a": simhash("alpha"), "/b": None}
+
+    # /a failed this time: not changed, old fingerprint kept; /b's first fingerprint counts as a change
+    assert snapshot.update(["/a", "/b"], {"/b": simhash("beta")})["changed"] == ["/b"]
+    assert snapshot.load() == {"/a": simhash("alpha"), "/b": simhash("beta")}
+    snapshot.close()
+
+
+def test_change_threshold_tolerates_small_edits(tmp_path):
+    amended = ORDINANCE.replace("six hens", "eight hens")
+    distance = hamming_distance(simhash(ORDINANCE), simhash(amended))
+    snapshot = FingerprintSnapshot(str(tmp_path / "fingerprints.sqlite"), change_threshold=distance)
+    snapshot.update(["/a"], {"/a": simhash(ORDINANCE)})
+    assert snapshot.update(["/a"], {"/a": simhash(amended)})["changed"] == []
+    snapshot.close()
@@ -0,0 +1,25 @@
+import pytest
+
+from crawl_frontier import CrawlFrontier, canonicalize_url
+
+
+@pytest.mark.parametrize("url, canonical", [
+    ("HTTPS://Example.COM:443/codes/a#section-2", "https://example.com/codes/a"),
+    ("http://example.com:80", "http://example.com/"),
+    ("http://example.com:8080/a", "http://example.com:8080/a"),
+    ("https://example.com/a?b=1&a=2", "https://example.com/a?b=1&a=2"),
+    ("https://example.com/a?q=a%20b", "https://example.com/a?q=a%20b"),
+    ("https://example.com/a?flag", "https://example.com/a?flag"),
+    ("https://example.com/Codes/A%2FB", "https://example.com/Codes/A%2FB"),
+])
+def test_canonicalize_url(url, canonical):
+    assert canonicalize_url(url) == canonical
+
+
+def test_frontier_keeps_urls_that_differ_only_in_their_query():
+    frontier = CrawlFrontier()
+    urls = ["https://example.com/a?q=a+b", "https://example.com/a?q=a%20b", "https://example.com/a?x=1&x=2",
+            "https://example.com/a?x=2&x=1", "https://example.com/a?flag", "https://example.com/a?flag="]
+    assert all(frontier.add(url, 1) for url in urls)
+    assert frontier.add("HTTPS://EXAMPLE.com:443/a?flag#top", 1) is None # Same page as "https://example.com/a?flag"
+    assert len(frontier) == len(urls)
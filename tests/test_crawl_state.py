@@ -0,0 +1,54 @@
+import pytest
+
+from crawl_state import CrawlCheckpoint
+from politeness import PolitenessScheduler
+from url_queue_builder import build_url_queue
+
+CODE = "/codes/town/latest"
+
+
+def _overview(chapters):
+    toc = "".join(f'<div class="toc-entry"><div class="toc-entry__wrap"><a href="{CODE}/{chapter}">{chapter}</a></div></div>'
+                  for chapter in chapters)
+    return f'<html><body><div class="codenav__toc">{toc}</div></body></html>'
+
+
+def _chapter(name):
+    return f'<html><body><div id="codecontent"><div class="Normal-Level"><a href="{CODE}/{name}-1">{name} 1</a></div></div></body></html>'
+
+
+class _Interrupt(PolitenessScheduler):
+    """Stops the crawl (like Ctrl-C) when it is about to request stop_url."""
+
+    def __init__(self, stop_url):
+        super().__init__(default_rate=1000.0, max_rate=1000.0)
+        self.stop_url = stop_url
+
+    def wait(self, url):
+        if url == self.stop_url:
+            raise KeyboardInterrupt
+        super().wait(url)
+
+
+def test_resumed_crawl_clears_errors_of_retried_pages(fixture_server, tmp_path):
+    # ch1 is missing on the first run and there on the second
+    server = fixture_server({"amlegal": {f"{CODE}/overview": _overview(["ch1", "ch2", "ch3"]),
+                                         f"{CODE}/ch2": _chapter("ch2"), f"{CODE}/ch3": _chapter("ch3")}})
+    base_url = server.base_url("amlegal")
+    root_url = base_url + f"{CODE}/overview"
+    checkpoint_path = str(tmp_path / "crawl.sqlite")
+
+    with pytest.raises(KeyboardInterrupt):
+        build_url_queue("amlegal", root_url, "TestBot/1.0", scheduler=_Interrupt(base_url + f"{CODE}/ch3"),
+                        checkpoint_path=checkpoint_path, checkpoint_every=1)
+    checkpoint = CrawlCheckpoint(checkpoint_path, root_url)
+    assert [error[0] for error in checkpoint.errors()] == [base_url + f"{CODE}/ch1"]
+    checkpoint.close()
+
+    server.sites["amlegal"].add(f"{CODE}/ch1", 200, {"Content-Type": "text/html; charset=utf-8"}, _chapter("ch1").encode())
+    url_queue, _ = build_url_queue("amlegal", root_url, "TestBot/1.0", checkpoint_path=checkpoint_path, checkpoint_every=1)
+
+    assert base_url + f"{CODE}/ch1-1" in url_queue
+    checkpoint = CrawlCheckpoint(checkpoint_path, root_url)
+    assert checkpoint.errors() == []
+    checkpoint.close()
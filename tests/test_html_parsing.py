@@ -0,0 +1,45 @@
+import pytest
+
+from html_parsing import available_backends, parse_stream, parse_with
+from wikipedia_scraper import WikipediaPageExtractor
+
+
+def _article(body):
+    return f'<html><body><div id="mw-content-text"><div class="mw-parser-output">{body}</div></div></body></html>'
+
+
+UNCLOSED_ROWS = _article(
+    '<table class="wikitable"><tr><td>1<td>2<tr><td>3<td>4</table>'
+    '<table class="wikitable"><thead><tr><th>h<tbody><tr><td>a<td>b<tbody><tr><td>c</table>'
+)
+EXPECTED_ROWS = [[["1", "2"], ["3", "4"]], [["h"], ["a", "b"], ["c"]]]
+
+
+class _StreamedResponse:
+    """Just enough of a requests response for parse_stream."""
+
+    def __init__(self, markup, chunk_size):
+        self.headers = {"Content-Type": "text/html; charset=utf-8"}
+        self._chunks = [markup[i:i + chunk_size] for i in range(0, len(markup), chunk_size)]
+
+    def iter_content(self, chunk_size, decode_unicode):
+        return iter(self._chunks)
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_unclosed_rows_match_across_backends(backend):
+    assert parse_with(UNCLOSED_ROWS, WikipediaPageExtractor(), backend).result()[1] == EXPECTED_ROWS
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64 * 1024])
+def test_unclosed_rows_streamed(chunk_size):
+    extractor = parse_stream(_StreamedResponse(UNCLOSED_ROWS, chunk_size), WikipediaPageExtractor())
+    assert extractor.result()[1] == EXPECTED_ROWS
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_comment_separates_text(backend):
+    assert parse_with(_article("<p>a<!--x-->b</p>"), WikipediaPageExtractor(), backend).result()[0] == "a b"
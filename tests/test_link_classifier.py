@@ -0,0 +1,13 @@
+import pytest
+
+from link_classifier import ARTICLE, LinkClassifier
+
+
+@pytest.mark.parametrize("title", [
+    "Who Framed Roger Rabbit?", "C#", "100% Pure", "AT&T", "Martha's Vineyard", "São Paulo", "Star Wars: Episode IV",
+])
+def test_article_url_round_trips(title):
+    classifier = LinkClassifier()
+    url = classifier.article_url(title)
+    assert url.startswith("https://en.wikipedia.org/wiki/")
+    assert classifier.classify(url) == (ARTICLE, title)
@@ -0,0 +1,131 @@
+import json
+from urllib.parse import urlencode
+
+import mediawiki_api
+from wikipedia_scraper import scrape_wikipedia_page, scrape_wikipedia_pages_api
+
+# Rendered div.mw-parser-output of each article, as action=parse returns it
+PARSER_OUTPUT = {
+    "Alpha": (
+        '<div class="mw-parser-output">'
+        '<table class="infobox"><tr><th>Population</th><td>18</td></tr></table>'
+        '<p>Alpha is a village linked to <a href="/wiki/Beta">Beta</a> and <a href="/wiki/AT%26T">AT&amp;T</a>.</p>'
+        '<table class="wikitable"><tr><th>Year</th><th>Pop.</th></tr><tr><td>2010</td><td>1</td></tr></table>'
+        '<p>See <a href="/wiki/Help:Contents">help</a>.</p></div>'
+    ),
+    "Beta": (
+        '<div class="mw-parser-output"><p>Beta is a town near <a href="/wiki/S%C3%A3o_Paulo">São Paulo</a>.</p>'
+        '<div class="thumb"><p>Caption text</p></div><div><p>More about Beta.</p></div></div>'
+    ),
+    "Gamma": '<div class="mw-parser-output"><p>Gamma links back to <a href="/wiki/Alpha">Alpha</a>.</p></div>',
+}
+# Article links of each page as the query API's link table lists them
+LINKS = {"Alpha": ["AT&T", "Beta"], "Beta": ["São Paulo"], "Gamma": ["Alpha"]}
+
+
+def _skin_page(title):
+    # What /wiki/<title> serves: the parser output inside the skin, with navigation links outside the content
+    return (f'<html><head><title>{title}</title></head><body><a href="/wiki/Main_Page">Main page</a>'
+            f'<div id="mw-content-text">{PARSER_OUTPUT[title]}</div><a href="/wiki/Special:Random">Random</a></body></html>')
+
+
+def _api_key(params):
+    return "/w/api.php?" + urlencode(dict(params, format="json", formatversion="2"))
+
+
+def _query_key(titles):
+    return _api_key({
+        "action": "query", "titles": "|".join(titles), "prop": "links|categories|pageprops", "plnamespace": "0",
+        "pllimit": "max", "cllimit": "max", "clshow": "!hidden", "redirects": "1",
+    })
+
+
+def _parse_key(title):
+    return _api_key({"action": "parse", "page": title, "prop": "text", "redirects": "1", "disableeditsection": "1", "disabletoc": "1"})
+
+
+def _page(title):
+    return {"ns": 0, "title": title, "links": [{"ns": 0, "title": link} for link in LINKS[title]]}
+
+
+def _json(data):
+    return 200, "application/json; charset=utf-8", json.dumps(data)
+
+
+def _responses():
+    responses = {"/wiki/" + title: _skin_page(title) for title in PARSER_OUTPUT}
+    responses["/wiki/Old_Alpha"] = _skin_page("Alpha") # Wikipedia serves a redirect's target under the redirect's URL
+    responses["/wiki/Nowhere"] = (404, "text/html; charset=utf-8", "<html><body>No such page</body></html>")
+    # batch 1: a redirect plus a page whose links arrive in two responses ("continue")
+    batch_1 = ["Alpha", "Old Alpha"]
+    responses[_query_key(batch_1)] = _json({
+        "continue": {"plcontinue": "1|0|Beta", "continue": "||"},
+        "query": {"redirects": [{"from": "Old Alpha", "to": "Alpha"}],
+                  "pages": [{"ns": 0, "title": "Alpha", "links": [{"ns": 0, "title": "AT&T"}]}]},
+    })
+    continued = _query_key(batch_1)[len("/w/api.php?"):]
+    responses["/w/api.php?" + continued + "&" + urlencode({"plcontinue": "1|0|Beta", "continue": "||"})] = _json({
+        "query": {"redirects": [{"from": "Old Alpha", "to": "Alpha"}],
+                  "pages": [{"ns": 0, "title": "Alpha", "links": [{"ns": 0, "title": "Beta"}]}]},
+    })
+    # batch 2: a missing page and an existing one
+    responses[_query_key(["Nowhere", "Beta"])] = _json({
+        "query": {"pages": [{"ns": 0, "title": "Nowhere", "missing": True}, _page("Beta")]},
+    })
+    # batch 3
+    responses[_query_key(["Gamma"])] = _json({"query": {"pages": [_page("Gamma")]}})
+    for title, html in PARSER_OUTPUT.items():
+        responses[_parse_key(title)] = _json({"parse": {"title": title, "pageid": 1, "text": html}})
+    # action=parse follows the redirect on the server side
+    responses[_parse_key("Old Alpha")] = _json({"parse": {"title": "Alpha", "pageid": 1, "text": PARSER_OUTPUT["Alpha"]}})
+    return responses
+
+
+PATHS = ["/wiki/Alpha", "/wiki/Old_Alpha", "/wiki/Nowhere", "/wiki/Beta", "/wiki/Gamma"]
+
+
+def test_api_backend_matches_html_scrape(fixture_server):
+    server = fixture_server({"wikipedia": _responses()})
+    base_url = server.base_url("wikipedia")
+    urls = [base_url + path for path in PATHS]
+
+    api_results = scrape_wikipedia_pages_api(urls, "TestBot/1.0", api_url=base_url + "/w/api.php", batch_size=2, include_infobox=True)
+    # 3 query batches (the first one continued once) and one parse per distinct existing page
+    assert server.requests_served("wikipedia") == 4 + 3
+
+    for url in urls:
+        html_result = scrape_wikipedia_page(url, "TestBot/1.0", include_infobox=True)
+        if url.endswith("/Nowhere"):
+            assert api_results[url] is None
+            assert html_result == (None, None, None, None)
+        else:
+            assert api_results[url] == html_result
+            assert html_result[0] # The fixtures do have text, so equality is not vacuous
+    assert api_results[base_url + "/wiki/Alpha"][3] == [("Population", "18")]
+
+
+def test_api_links_only_match_html_links(fixture_server):
+    server = fixture_server({"wikipedia": _responses()})
+    base_url = server.base_url("wikipedia")
+    urls = [base_url + path for path in PATHS]
+
+    api_results = scrape_wikipedia_pages_api(urls, "TestBot/1.0", api_url=base_url + "/w/api.php", include_text=False, batch_size=2)
+
+    assert api_results[base_url + "/wiki/Nowhere"] is None
+    for url in urls:
+        if not url.endswith("/Nowhere"):
+            assert api_results[url] == ("", [], scrape_wikipedia_page(url, "TestBot/1.0")[2])
+
+
+def test_single_page_api_backend(fixture_server):
+    server = fixture_server({"wikipedia": _responses()})
+    base_url = server.base_url("wikipedia")
+    assert (scrape_wikipedia_page(base_url + "/wiki/Old_Alpha", "TestBot/1.0", api_url=base_url + "/w/api.php")
+            == scrape_wikipedia_page(base_url + "/wiki/Alpha", "TestBot/1.0"))
+    assert scrape_wikipedia_page(base_url + "/wiki/Alpha", "TestBot/1.0", api_url=base_url + "/w/api.php",
+                                 include_infobox=True)[3] == [("Population", "18")]
+
+
+def test_title_from_url():
+    assert mediawiki_api.title_from_url("https://en.wikipedia.org/wiki/Who_Framed_Roger_Rabbit%3F") == "Who Framed Roger Rabbit?"
+    assert mediawiki_api.title_from_url("Monowi,_Nebraska") == "Monowi, Nebraska"
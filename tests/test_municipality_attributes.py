@@ -0,0 +1,112 @@
+import datetime
+import operator
+import random
+
+import pytest
+
+from municipality_attributes import COLUMNS, MunicipalityStore, parse_infobox
+from output_sinks import open_sink
+
+STATES = ["Nebraska", "Kansas", "Iowa", "Ohio"]
+GOVERNMENT_TYPES = ["Mayor-council", "Council-manager", "Commission"]
+
+
+def _random_store(n_rows, seed=7):
+    rng = random.Random(seed)
+
+    def maybe(value):
+        return None if rng.random() < 0.3 else value # Roughly a third of every column is missing
+
+    store = MunicipalityStore()
+    for i in range(n_rows):
+        store.add(f"Town {i}", f"https://en.wikipedia.org/wiki/Town_{i}", {
+            "population": maybe(float(rng.choice([0, 1, 18, 50, 50, 1000, rng.randrange(100000)]))),
+            "area_km2": maybe(round(rng.uniform(0, 200), 1)),
+            "incorporated": maybe(rng.randrange(-40000, 20000)),
+            "state": maybe(rng.choice(STATES)),
+            "government_type": maybe(rng.choice(GOVERNMENT_TYPES)),
+        })
+    return store
+
+
+def _value(name, value):
+    # A condition value as the row dicts hold it
+    return datetime.date.fromisoformat(value) if COLUMNS[name] == "date" else value
+
+
+_COMPARISONS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq, "!=": operator.ne}
+
+
+def _brute_force(rows, conditions):
+    def matches(row, name, op, value):
+        stored = row[name]
+        if stored is None:
+            return False # Missing values never match
+        if op == "in":
+            return stored in value
+        if op == "between":
+            return _value(name, value[0]) <= stored <= _value(name, value[1])
+        return _COMPARISONS[op](stored, _value(name, value))
+
+    return [index for index, row in enumerate(rows) if all(matches(row, *condition) for condition in conditions)]
+
+
+CONDITIONS = [
+    ("population", "<", 50), ("population", "<=", 50), ("population", ">", 1000), ("population", ">=", 0),
+    ("population", "==", 50), ("population", "!=", 50), ("population", "between", (18, 1000)),
+    ("population", "in", {0, 18}), ("area_km2", ">", 100), ("area_km2", "between", (10, 20)),
+    ("incorporated", "<", "1900-01-01"), ("incorporated", "between", ("1900-01-01", "1910-12-31")),
+    ("incorporated", "!=", "1970-01-01"), ("state", "==", "Nebraska"), ("state", "!=", "Kansas"),
+    ("state", "in", {"Iowa", "Ohio", "Atlantis"}), ("state", "==", "Atlantis"), ("state", "!=", "Atlantis"),
+    ("government_type", "==", "Commission"), ("government_type", "!=", "Commission"),
+]
+
+
+def test_filter_matches_brute_force():
+    store = _random_store(1500)
+    rng = random.Random(11)
+    queries = [[condition] for condition in CONDITIONS] + [rng.sample(CONDITIONS, rng.randint(2, 4)) for _ in range(100)]
+    rows = [store.row(index) for index in range(len(store))]
+    for conditions in queries:
+        assert store.filter(*conditions) == _brute_force(rows, conditions), conditions
+    # Indexes are rebuilt after add()
+    store.add("Monowi", "https://en.wikipedia.org/wiki/Monowi,_Nebraska", {"population": 1.0, "state": "Nebraska"})
+    rows.append(store.row(len(store) - 1))
+    for conditions in queries[:len(CONDITIONS)]:
+        assert store.filter(*conditions) == _brute_force(rows, conditions), conditions
+
+
+def test_unfiltered_and_bad_conditions():
+    store = _random_store(10)
+    assert store.filter() == list(range(10))
+    with pytest.raises(ValueError):
+        store.filter(("state", "<", "Ohio"))
+    with pytest.raises(ValueError):
+        store.filter(("nonexistent", "==", 1))
+
+
+MONOWI_ROWS = [
+    ("Country", "United States"), ("State", "Nebraska"), ("County", "Boyd"),
+    ("Incorporated", "1902"),
+    ("Area", ""), ("• Total", "0.21 sq mi (0.54 km 2 )"), ("• Land", "0.21 sq mi (0.54 km 2 )"),
+    ("Elevation", "1,650 ft (500 m)"),
+    ("Population ( 2020 )", ""), ("• Total", "2"), ("• Density", "9.5/sq mi (3.7/km 2 )"),
+    ("", "Coordinates: 42°49′45″N 98°19′47″W"),
+]
+
+
+def test_parse_infobox_and_sink_round_trip(tmp_path):
+    attributes = parse_infobox(MONOWI_ROWS)
+    assert attributes["population"] == 2 and attributes["population_year"] == 2020
+    assert attributes["area_km2"] == pytest.approx(0.54) and attributes["elevation_m"] == 500
+    assert attributes["incorporated_year"] == 1902 and attributes["state"] == "Nebraska"
+
+    path = str(tmp_path / "pages.jsonl")
+    url = "https://en.wikipedia.org/wiki/Monowi,_Nebraska"
+    with open_sink(path) as sink:
+        sink.write_page(url, 0.0, "Monowi is a village.", [], [], MONOWI_ROWS)
+        sink.write_page("https://en.wikipedia.org/wiki/Nebraska", 0.0, "A state.", [], [])
+    store = MunicipalityStore.from_records(path)
+    assert len(store) == 1
+    assert store.select(("state", "==", "Nebraska"), columns=["name", "population", "incorporated"]) == [
+        {"name": "Monowi, Nebraska", "population": 2.0, "incorporated": datetime.date(1902, 1, 1)}]
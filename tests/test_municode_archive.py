@@ -0,0 +1,68 @@
+import io
+import json
+
+import pytest
+
+from municode_archive import iter_municonext_toc, iter_municonext_toc_events
+
+BASE = "https://library.municode.com"
+
+TOC = {
+    "Docs": [
+        {"NodePath": "/ch1", "Title": "Chapter 1", "Id": 1, "ChildNodes": [
+            {"NodePath": "ch1/art1", "Title": "Article I", "HasChildren": False, "ChildNodes": []},
+            {"NodePath": "/ch1/art2", "Title": "Article II", "ChildNodes": [
+                {"NodePath": "/ch1/art2/s1", "Title": "Sec. 1", "Meta": {"NodePath": "/not-a-node", "Title": "x"}},
+            ]},
+        ]},
+        {"Title": "Appendix without a path", "ChildNodes": [
+            {"NodePath": "/app/a", "Title": "Appendix A", "Score": 1.5, "Tags": ["NodePath", None]},
+        ]},
+        {"NodePath": "/ch2", "ChildNodes": [{"NodePath": "/ch2/s1", "Title": "Sec. 2-1"}]},
+    ],
+}
+
+
+def _events(value, prefix=""):
+    # ijson.parse-style (prefix, event, value) stream for an already-decoded JSON value
+    if isinstance(value, dict):
+        yield prefix, "start_map", None
+        for key, item in value.items():
+            yield prefix, "map_key", key
+            yield from _events(item, f"{prefix}.{key}" if prefix else key)
+        yield prefix, "end_map", None
+    elif isinstance(value, list):
+        yield prefix, "start_array", None
+        for item in value:
+            yield from _events(item, prefix + ".item" if prefix else "item")
+        yield prefix, "end_array", None
+    elif value is None:
+        yield prefix, "null", None
+    elif isinstance(value, bool):
+        yield prefix, "boolean", value
+    elif isinstance(value, str):
+        yield prefix, "string", value
+    else:
+        yield prefix, "number", value
+
+
+def test_toc_walk_yields_urls_with_title_paths():
+    assert list(iter_municonext_toc(TOC, BASE)) == [
+        (BASE + "/ch1", ("Chapter 1",)),
+        (BASE + "/ch1/art1", ("Chapter 1", "Article I")),
+        (BASE + "/ch1/art2", ("Chapter 1", "Article II")),
+        (BASE + "/ch1/art2/s1", ("Chapter 1", "Article II", "Sec. 1")),
+        (BASE + "/app/a", ("Appendix without a path", "Appendix A")),
+        (BASE + "/ch2", ()),
+        (BASE + "/ch2/s1", ("Sec. 2-1",)),
+    ]
+
+
+def test_event_walk_matches_tree_walk():
+    assert list(iter_municonext_toc_events(_events(TOC), BASE)) == list(iter_municonext_toc(TOC, BASE))
+
+
+def test_event_walk_matches_tree_walk_with_ijson():
+    ijson = pytest.importorskip("ijson")
+    events = ijson.parse(io.BytesIO(json.dumps(TOC).encode("utf-8")))
+    assert list(iter_municonext_toc_events(events, BASE)) == list(iter_municonext_toc(TOC, BASE))
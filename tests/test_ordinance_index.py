@@ -0,0 +1,52 @@
+import pytest
+
+import ordinance_index
+from ordinance_index import OrdinanceIndex, OrdinanceIndexWriter
+
+SECTIONS = [
+    ("tippecanoe", "https://example.test/1", "§ 10.09 Chicken coops", "No chicken coop shall be located in a residential district."),
+    ("tippecanoe", "https://example.test/2", "§ 10.10 Keeping of chickens", "The keeping of chickens is permitted on farms."),
+    ("monowi", "https://example.test/3", "§ 3.04 Dogs", "Dogs shall be leashed in the village."),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "ordinances.idx")
+    with OrdinanceIndexWriter(path) as writer:
+        for section in SECTIONS:
+            writer.add_section(*section)
+    index = OrdinanceIndex(path)
+    yield index
+    index.close()
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("§ 10.09", [0]),
+    ('"§ 10.09"', [0]),
+    ("chicken - coop", [0]),
+    ("chicken AND § AND coop", [0]),
+    ("chickens OR (NOT &)", [1]),
+    ('"keeping of chickens" AND NOT commercial', [1]),
+    ("shall", [0, 2]),
+])
+def test_search_ids(index, query, expected):
+    assert index.search_ids(query) == expected
+
+
+@pytest.mark.parametrize("query", ["§", "NOT -", '""', "", "(chicken", "chicken )"])
+def test_malformed_queries_raise(index, query):
+    with pytest.raises(ValueError):
+        index.search_ids(query)
+
+
+def test_close_after_interrupted_query(index, monkeypatch):
+    def interrupt(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(ordinance_index.bisect, "bisect_left", interrupt)
+    with pytest.raises(KeyboardInterrupt) as excinfo:
+        index.search_ids('"keeping of chickens"')
+    # excinfo keeps the traceback, and with it the frames of the interrupted query, alive
+    assert excinfo.traceback
+    index.close()
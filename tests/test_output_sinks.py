@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import pytest
+
+from output_sinks import JsonlSink, open_sink
+
+TABLES = [[["Town", "Population"], ["Gary", "69,093"]], [["Year"], ["1906"]]]
+
+
+def _write_town(sink, url="https://en.wikipedia.org/wiki/Gary,_Indiana"):
+    sink.write_page(url, 1700000000.5, "Gary is a city.", TABLES, ["/wiki/Lake_County"], [("Founded", "1906")])
+    sink.write_error(url + "_(disambiguation)", 1700000001.0, ValueError("no content"))
+
+
+def _read_jsonl(path, opener=open):
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_writes_in_batches(tmp_path):
+    path = str(tmp_path / "pages.jsonl")
+    sink = JsonlSink(path, batch_size=3)
+    _write_town(sink) # page, 2 tables, infobox, error
+    assert sink.records_written == 3 # The last two are still buffered
+    assert len(_read_jsonl(path)) == 3
+    sink.close()
+    assert sink.records_written == 5
+
+    records = _read_jsonl(path)
+    assert [record["record"] for record in records] == ["page", "table", "table", "infobox", "error"]
+    assert records[0] == {"record": "page", "url": "https://en.wikipedia.org/wiki/Gary,_Indiana", "fetched_at": 1700000000.5,
+                          "main_text": "Gary is a city.", "links": ["/wiki/Lake_County"]}
+    assert [record["rows"] for record in records[1:3]] == TABLES
+    assert records[2]["table_index"] == 1
+    assert records[3]["rows"] == [["Founded", "1906"]]
+    assert records[4]["error"] == "no content"
+
+
+def test_gzip_runs_append_as_members(tmp_path):
+    path = str(tmp_path / "pages.jsonl.gz")
+    for url in ("https://example.org/a", "https://example.org/b"):
+        with open_sink(path) as sink:
+            _write_town(sink, url)
+    records = _read_jsonl(path, gzip.open)
+    assert len(records) == 10
+    assert [record["url"] for record in records if record["record"] == "page"] == ["https://example.org/a", "https://example.org/b"]
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    path = str(tmp_path / "pages.parquet")
+    with open_sink(path, batch_size=2) as sink:
+        _write_town(sink)
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    rows = parquet_file.read().to_pylist()
+    assert [row["record"] for row in rows] == ["page", "table", "table", "infobox", "error"]
+    assert rows[0]["links"] == ["/wiki/Lake_County"] and rows[0]["fetched_at"].timestamp() == 1700000000.5
+    assert rows[1]["rows"] == TABLES[0] and rows[1]["main_text"] is None
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        open_sink(str(tmp_path / "pages.csv"), output_format="csv")
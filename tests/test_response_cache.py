@@ -0,0 +1,71 @@
+import secrets
+
+import http_client
+from response_cache import ResponseCache
+
+HTML = "text/html; charset=utf-8"
+
+
+class _Response:
+    # Just what ResponseCache.store reads off a requests.Response
+    def __init__(self, text, etag=None):
+        self.text = text
+        self.encoding = "utf-8"
+        self.headers = {"ETag": etag} if etag else {}
+
+
+def test_not_modified_is_answered_from_the_cache(fixture_server, tmp_path):
+    server = fixture_server({"site": {"/page": "placeholder"}})
+    site = server.sites["site"]
+    url = server.base_url("site") + "/page"
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+    site.add("/page", 200, {"Content-Type": HTML, "ETag": '"v1"'}, "<p>café</p>".encode("utf-8"))
+    first = http_client.conditional_get(url, cache, timeout=5)
+    assert not first.not_modified and first.text == "<p>café</p>"
+    cache.store_parsed(url, "links", ["/a", "/b"])
+
+    site.add("/page", 304, {"ETag": '"v1"'}, b"")
+    second = http_client.conditional_get(url, cache, timeout=5)
+    assert second.response.request.headers["If-None-Match"] == '"v1"'
+    assert second.not_modified and second.status_code == 304
+    assert second.text == "<p>café</p>"
+    assert cache.load_parsed(url, "links") == ["/a", "/b"]
+
+    site.add("/page", 200, {"Content-Type": HTML, "ETag": '"v2"'}, b"<p>new</p>")
+    third = http_client.conditional_get(url, cache, timeout=5)
+    assert not third.not_modified and third.text == "<p>new</p>"
+    assert cache.validators(url) == ('"v2"', None)
+    assert cache.load_parsed(url, "links") is None # Parsed data belonged to the old body
+    cache.close()
+
+
+def test_responses_without_validators_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert not cache.store("https://example.org/a", _Response("body"))
+    assert cache.validators("https://example.org/a") is None
+    cache.close()
+
+
+def _body():
+    return secrets.token_hex(4000) # Barely compressible, so every entry is about the same size
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.store("https://example.org/a", _Response(_body(), '"a"'))
+    entry_size = cache.total_bytes
+    cache.max_bytes = int(entry_size * 3.5)
+    cache.store("https://example.org/b", _Response(_body(), '"b"'))
+    cache.store("https://example.org/c", _Response(_body(), '"c"'))
+    assert cache.load_body("https://example.org/a") is not None # a is now more recent than b
+
+    cache.store("https://example.org/d", _Response(_body(), '"d"'))
+    assert cache.validators("https://example.org/b") is None
+    assert [cache.validators(f"https://example.org/{name}") is not None for name in "acd"] == [True] * 3
+    assert cache.total_bytes <= cache.max_bytes * 0.9
+    cache.close()
+
+    reopened = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert reopened.total_bytes == cache.total_bytes
+    reopened.close()
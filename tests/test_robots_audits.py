@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import http_client
+from politeness import PolitenessScheduler
+from robots_audits import MultiDomainRobotsAuditor
+
+ROBOTS_TXT = (200, "text/plain", "User-agent: *\nCrawl-delay: 2\nDisallow: /private/\n")
+
+
+def test_concurrent_lookups_fetch_robots_once(fixture_server):
+    # Slow responses keep every thread's lookup in flight at once
+    server = fixture_server({"site": {"/robots.txt": ROBOTS_TXT}}, latency=0.2)
+    base_url = server.base_url("site")
+    auditor = MultiDomainRobotsAuditor("TestBot/1.0")
+    urls = [f"{base_url}/page/{i}" for i in range(16)] + [f"{base_url}/private/{i}" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        allowed = list(pool.map(auditor.can_fetch, urls))
+    assert allowed == [True] * 16 + [False] * 16
+    assert server.requests_served("site") == 1
+
+
+def test_scheduler_shares_one_robots_fetch(fixture_server):
+    server = fixture_server({"site": {"/robots.txt": ROBOTS_TXT}}, latency=0.2)
+    url = server.base_url("site") + "/page"
+    scheduler = PolitenessScheduler(MultiDomainRobotsAuditor("TestBot/1.0"))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: scheduler.record(url, 200, 0.1), range(8)))
+    assert server.requests_served("site") == 1
+    assert scheduler.current_rate(url) <= 0.5 # Capped by the 2 s Crawl-delay
+
+
+@pytest.fixture
+def no_retries():
+    # The pooled client retries 429s with backoff; one request per lookup keeps the counts exact
+    http_client.configure_http_client(max_retries=0)
+    yield
+    http_client.configure_http_client(max_retries=3)
+
+
+def test_rate_limited_robots_disallows_without_caching(fixture_server, tmp_path, no_retries):
+    server = fixture_server({"site": {"/robots.txt": (429, "text/plain", "slow down")}})
+    url = server.base_url("site") + "/page"
+    cache_dir = tmp_path / "robots"
+    assert not MultiDomainRobotsAuditor("TestBot/1.0", cache_dir=str(cache_dir)).can_fetch(url)
+    assert not list(cache_dir.glob("*.json"))
+    # A fresh auditor asks again instead of trusting a day-old 429
+    MultiDomainRobotsAuditor("TestBot/1.0", cache_dir=str(cache_dir)).can_fetch(url)
+    assert server.requests_served("site") == 2
+
+
+def test_only_missing_robots_allows_all(fixture_server, no_retries):
+    server = fixture_server({
+        "gone": {"/robots.txt": (410, "text/plain", "")},
+        "bad": {"/robots.txt": (400, "text/plain", "")},
+    })
+    auditor = MultiDomainRobotsAuditor("TestBot/1.0")
+    assert auditor.can_fetch(server.base_url("gone") + "/page")
+    assert not auditor.can_fetch(server.base_url("bad") + "/page")
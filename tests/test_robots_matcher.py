@@ -0,0 +1,75 @@
+import pytest
+
+from robots_matcher import CompiledRobotsRules
+
+ROBOTS_TXT = """
+User-agent: *
+Disallow: /private/
+Allow: /private/public/
+Disallow: /*.pdf$
+Disallow: /search*q=
+Allow: /shared
+Disallow: /shared
+Disallow: /tmp$
+
+User-agent: TestBot
+Disallow: /only-testbot/
+"""
+
+# (path, allowed) for the "*" group above
+CASES = [
+    ("/", True),
+    ("/robots.txt", True),
+    ("/private/", False),
+    ("/private/page", False),
+    ("/private/public/page", True),       # Longer Allow beats shorter Disallow
+    ("/docs/report.pdf", False),          # "*" spans directories, "$" anchors the end
+    ("/docs/report.pdf?download=1", True),
+    ("/docs/report.pdfx", True),
+    ("/search?q=zoning", False),
+    ("/search/advanced?page=2&q=x", False),
+    ("/search?page=2", True),
+    ("/shared/file", True),               # Allow wins a tie of equal length
+    ("/tmp", False),
+    ("/tmp/", True),
+    ("/%7Eowner/private/", True),
+    ("/priv%61te/page", False),           # Percent-encoding is normalized before matching
+]
+
+
+@pytest.fixture
+def rules():
+    return CompiledRobotsRules.parse(ROBOTS_TXT, "OtherBot/2.0")
+
+
+@pytest.mark.parametrize("path, allowed", CASES)
+def test_can_fetch(rules, path, allowed):
+    assert rules.can_fetch("https://example.org" + path) is allowed
+
+
+def test_can_fetch_many_matches_can_fetch():
+    urls = ["https://example.org" + path + suffix for path, _ in CASES for suffix in ("", "#frag")]
+    expected = [url for url in urls if CompiledRobotsRules.parse(ROBOTS_TXT, "OtherBot/2.0").can_fetch(url)]
+    assert CompiledRobotsRules.parse(ROBOTS_TXT, "OtherBot/2.0").can_fetch_many(urls) == expected
+
+
+def test_named_group_replaces_star_group():
+    rules = CompiledRobotsRules.parse(ROBOTS_TXT, "testbot/1.0")
+    assert not rules.can_fetch("https://example.org/only-testbot/page")
+    assert rules.can_fetch("https://example.org/private/page")
+
+
+def test_verdicts_are_memoized(rules):
+    url = "https://example.org/private/page#top"
+    assert not rules.can_fetch(url)
+    assert rules._verdicts == {"/private/page": False}
+    # A repeat lookup (even from can_fetch_many) is answered from the memo, not the regex
+    rules._verdicts["/private/page"] = True
+    assert rules.can_fetch(url)
+    assert rules.can_fetch_many([url]) == [url]
+
+
+def test_fallbacks():
+    assert CompiledRobotsRules.allow_all().can_fetch_many(["https://example.org/a"]) == ["https://example.org/a"]
+    assert not CompiledRobotsRules.disallow_all().can_fetch("https://example.org/robots.txt")
+    assert CompiledRobotsRules.parse("User-agent: *\nDisallow:\n", "TestBot").can_fetch("https://example.org/a")
@@ -0,0 +1,67 @@
+import threading
+
+from sharded_crawl import ShardedCrawlStore
+
+ROOT = "https://codes.example.org/codes/town/latest/overview"
+
+
+def _store(tmp_path, roots=(ROOT,)):
+    store = ShardedCrawlStore(str(tmp_path / "store.sqlite"))
+    store.configure("amlegal", 2)
+    store.add_roots(list(roots), host_interval=0)
+    return store
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    store = _store(tmp_path)
+    [page] = store.claim("a", 10, lease_seconds=-1) # Lease already over
+    assert store.claim("b", 10, lease_seconds=300) == [page]
+    assert store.claim("c", 10, lease_seconds=300) == [] # b's lease is live
+    store.close()
+
+
+def test_stale_worker_cannot_release_a_taken_over_page(tmp_path):
+    store = _store(tmp_path)
+    [(root_id, _, _, key, _)] = store.claim("a", 10, lease_seconds=-1)
+    store.claim("b", 10, lease_seconds=300)
+    assert not store.fail("a", root_id, key, "timeout", max_attempts=3)
+    assert store.outstanding() == (0, 1) # Still b's
+    assert store.fail("b", root_id, key, "timeout", max_attempts=3)
+    assert store.outstanding() == (1, 0)
+    store.close()
+
+
+def test_late_completion_counts_and_outlives_the_new_claim(tmp_path):
+    store = _store(tmp_path)
+    [(root_id, _, _, key, _)] = store.claim("a", 10, lease_seconds=-1)
+    store.claim("b", 10, lease_seconds=300)
+    store.complete(root_id, key, [ROOT.replace("overview", "ch1")], 1, 2)
+    assert not store.fail("b", root_id, key, "timeout", max_attempts=1) # Done pages are never demoted
+    assert store.progress()["done"] == 1
+    assert store.results() == {ROOT: [ROOT.replace("overview", "ch1")]}
+    store.close()
+
+
+def test_concurrent_claimers_never_share_a_page(tmp_path):
+    roots = [ROOT.replace("town", f"town{i}") for i in range(300)]
+    _store(tmp_path, roots).close()
+    claimed = {"a": [], "b": [], "c": []}
+    start = threading.Barrier(len(claimed))
+
+    def claim_all(worker):
+        store = ShardedCrawlStore(str(tmp_path / "store.sqlite"))
+        start.wait()
+        while True:
+            batch = store.claim(worker, 4, lease_seconds=300)
+            if not batch:
+                break
+            claimed[worker].extend(url for _, _, url, _, _ in batch)
+        store.close()
+
+    threads = [threading.Thread(target=claim_all, args=(worker,)) for worker in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    all_claimed = [url for urls in claimed.values() for url in urls]
+    assert sorted(all_claimed) == sorted(roots)
@@ -0,0 +1,65 @@
+import pytest
+
+import metrics
+from url_queue_builder import build_url_queue
+
+CODE = "/codes/town/latest"
+
+
+def _overview(chapters):
+    toc = "".join(f'<div class="toc-entry"><div class="toc-entry__wrap"><a href="{CODE}/{chapter}">{chapter}</a></div></div>'
+                  for chapter in chapters)
+    return f'<html><body><div class="codenav__toc">{toc}</div></body></html>'
+
+
+def _content(hrefs):
+    links = "".join(f'<div class="Normal-Level"><a href="{href}">{href}</a></div>' for href in hrefs)
+    return f'<html><body><div id="codecontent">{links}</div><a href="{CODE}/footer">outside the content</a></body></html>'
+
+
+def _code_site():
+    # Six chapters of three sections each; sections cross-link, repeat links with fragments and
+    # point off-host, and ch6 is missing, so both modes have the same duplicates and errors to handle
+    chapters = [f"ch{i}" for i in range(1, 7)]
+    pages = {f"{CODE}/overview": _overview(chapters + ["ch1"])}
+    for chapter in chapters[:-1]:
+        sections = [f"{CODE}/{chapter}-{n}" for n in range(1, 4)]
+        pages[f"{CODE}/{chapter}"] = _content(sections + [sections[0] + "#part-b", f"{CODE}/ch1-1", "https://elsewhere.example/x"])
+        for section in sections:
+            pages[section] = _content([section + "-a", section + "-b"])
+    return pages
+
+
+@pytest.mark.parametrize("max_depth, streaming", [(2, False), (3, False), (3, True)])
+def test_async_crawl_finds_the_same_urls_as_sync(fixture_server, max_depth, streaming):
+    server = fixture_server({"amlegal": _code_site()}, latency=0.005)
+    root_url = server.base_url("amlegal") + f"{CODE}/overview"
+
+    sync_queue, _ = build_url_queue("amlegal", root_url, "TestBot/1.0", max_depth=max_depth, streaming=streaming)
+    sync_requests = server.requests_served("amlegal")
+    async_queue, _ = build_url_queue("amlegal", root_url, "TestBot/1.0", max_depth=max_depth, streaming=streaming,
+                                     use_async=True, max_concurrency_per_host=4)
+
+    assert async_queue == sync_queue
+    assert len(sync_queue) == 6 + 5 * 3 + (5 * 3 * 2 if max_depth == 3 else 0)
+    assert server.requests_served("amlegal") == 2 * sync_requests # Each page fetched once per mode
+
+
+def _histogram_count(name):
+    return sum(histogram["count"] for histogram in metrics.snapshot()["histograms"] if histogram["name"] == name)
+
+
+def test_async_crawl_reuses_pooled_connections(fixture_server):
+    server = fixture_server({"amlegal": _code_site()}, latency=0.005)
+    root_url = server.base_url("amlegal") + f"{CODE}/overview"
+    metrics.reset()
+    metrics.enable()
+    try:
+        build_url_queue("amlegal", root_url, "TestBot/1.0", max_depth=3, use_async=True, max_concurrency_per_host=4)
+        connects = _histogram_count("http_connect_seconds")
+    finally:
+        metrics.disable()
+        metrics.reset()
+    # Keep-alive: the new host's pool opens one connection per concurrent fetch, not one per page
+    assert server.requests_served("amlegal") == 1 + 6 + 5 * 3
+    assert 1 <= connects <= 4
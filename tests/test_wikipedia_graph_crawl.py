@@ -0,0 +1,30 @@
+import json
+
+from wikipedia_scraper import crawl_wikipedia_graph
+
+
+def _article(body):
+    return f'<html><body><div id="mw-content-text"><div class="mw-parser-output">{body}</div></div></body></html>'
+
+
+def test_titles_with_reserved_characters_are_fetched_and_recorded(fixture_server, tmp_path):
+    pages = {
+        "/wiki/Seed": _article('<p>Links: <a href="/wiki/Who_Framed_Roger_Rabbit%3F">film</a> <a href="/wiki/AT%26T">company</a></p>'),
+        "/wiki/Who_Framed_Roger_Rabbit%3F": _article("<p>A 1988 film.</p>"),
+        "/wiki/AT%26T": _article("<p>A telecommunications company.</p>"),
+    }
+    server = fixture_server({"wikipedia": pages})
+    base_url = server.base_url("wikipedia")
+    output_path = str(tmp_path / "crawl.jsonl")
+
+    summary = crawl_wikipedia_graph([base_url + "/wiki/Seed"], "TestBot/1.0", max_depth=1, output_path=output_path,
+                                    fetch_workers=2, base_url=base_url)
+
+    assert summary["pages"] == 3 and summary["errors"] == 0
+    with open(output_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert {record["url"]: record["main_text"] for record in records if record["record"] == "page"} == {
+        base_url + "/wiki/Seed": "Links: film company",
+        base_url + "/wiki/Who_Framed_Roger_Rabbit%3F": "A 1988 film.",
+        base_url + "/wiki/AT%26T": "A telecommunications company.",
+    }
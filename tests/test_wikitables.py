@@ -0,0 +1,86 @@
+import datetime
+import math
+
+from wikitables import MISSING_DATE, expand_spans, normalize_table
+
+
+def th(text, rowspan=1, colspan=1):
+    return (text, rowspan, colspan, True)
+
+
+def td(text, rowspan=1, colspan=1):
+    return (text, rowspan, colspan, False)
+
+
+def test_expand_spans_fills_rowspans_and_colspans():
+    texts, flags = expand_spans([
+        [td("a", rowspan=2), td("b", colspan=2)],
+        [td("c"), td("d", rowspan=2)],
+        [td("e"), td("f")],
+    ])
+    assert texts == [["a", "b", "b"], ["a", "c", "d"], ["e", "f", "d"]]
+    assert flags == [[False] * 3] * 3
+
+
+def test_expand_spans_pads_short_rows_with_uncovered_slots():
+    texts, flags = expand_spans([[th("Name")], [td("x"), td("y")]])
+    assert texts == [["Name", ""], ["x", "y"]]
+    assert flags == [[True, None], [False, False]]
+
+
+def test_short_header_row_is_still_the_header():
+    table = normalize_table([
+        [th("Town"), th("Population")],
+        [td("Gary"), td("69,093"), td("note")],
+        [td("Hell"), td("72"), td("")],
+    ])
+    assert table.header == ["Town", "Population", "column_3"]
+    assert table.n_rows == 2
+    assert table.column_types["Population"] == "number"
+
+
+def test_stacked_headers_are_joined_and_repeated_headers_dropped():
+    table = normalize_table([
+        [th("Town", rowspan=2), th("Population", colspan=2)],
+        [th("2010"), th("2020")],
+        [td("Gary"), td("80,294"), td("69,093")],
+        [th("Section break", colspan=3)],
+        [th("Town"), th("Population"), th("Population")],
+        [td("Hell"), td("72"), td("72")],
+    ])
+    assert table.header == ["Town", "Population 2010", "Population 2020"]
+    assert table.n_rows == 2
+    assert table.row(1) == ["Hell", 72.0, 72.0]
+
+
+def test_duplicate_and_missing_header_names():
+    table = normalize_table([[th("Name"), th(""), th("Name")], [td("a"), td("b"), td("c")]])
+    assert table.header == ["Name", "column_2", "Name (2)"]
+
+
+def test_column_types_are_inferred():
+    table = normalize_table([
+        [th("Town"), th("Area"), th("Incorporated"), th("Location"), th("Notes")],
+        [td("Gary[1]"), td("57.18 sq mi"), td("July 14, 1906"), td("41°35′N 87°20′W"), td("steel")],
+        [td("Hell"), td("—"), td("1841-01-01"), td("42.43; -83.98"), td("")],
+        [td("Boring"), td("1,000"), td("3 March 1874"), td("?"), td("12")],
+    ])
+    assert table.column_types == {"Town": "text", "Area": "number", "Incorporated": "date",
+                                  "Location": "coordinates", "Notes": "text"}
+    assert table.column("Town") == ["Gary", "Hell", "Boring"]
+    assert math.isnan(table.column("Area")[1])
+    assert table.row(0)[1:4] == [57.18, datetime.date(1906, 7, 14), (41 + 35 / 60, -(87 + 20 / 60))]
+    assert table.row(1)[1] is None and table.row(2)[3] is None
+    assert table.column("Incorporated").typecode == "q"
+
+
+def test_mostly_numeric_column_tolerates_a_stray_cell():
+    rows = [[th("Value")]] + [[td(str(i))] for i in range(9)] + [[td("about 10")]]
+    table = normalize_table(rows)
+    assert table.column_types == {"Value": "number"}
+    assert math.isnan(table.column("Value")[-1])
+
+
+def test_sparse_date_column_uses_missing_date():
+    table = normalize_table([[th("Date")], [td("2025-05-08")], [td("")]])
+    assert list(table.column("Date")) == [(datetime.date(2025, 5, 8) - datetime.date(1970, 1, 1)).days, MISSING_DATE]
@@ -1,97 +1,199 @@
-import requests
+import http_client
 import json # Though not used by AmLegal parser, often useful
 import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlsplit # For urljoin and get_base_url
+from crawl_frontier import CrawlFrontier, canonical_host, canonicalize_url
+from crawl_state import CrawlCheckpoint
+from html_parsing import parse_stream
+from content_fingerprint import FingerprintSnapshot, simhash
+import metrics
+from publisher_adapters import AmLegalAdapter, AmLegalLinkExtractor, get_adapter # AmLegalLinkExtractor re-exported for existing imports
+
+# Failed pages listed individually in the end-of-crawl report
+_REPORTED_ERRORS = 5
 
 # --- Helper to get the base URL (scheme + domain) ---
-# Useful for AmLegal if URLs are relative
+# Useful for publishers whose URLs are relative
 def get_base_url(url):
     split_url = urlsplit(url)
     return f"{split_url.scheme}://{split_url.netloc}"
 
-# --- American Legal Publishing Parser ---
-def get_urls_from_amlegal(city_overview_url, bot_user_agent, max_depth=2):
-    print(f"Processing AmLegal: {city_overview_url} (max_depth={max_depth})")
-    start_time = time.time()
-    
-    scrape_queue = [(city_overview_url, 0)] 
-    queued_tasks = set([(city_overview_url, 0)]) # Keep track of (url, depth) in queue
+# Fetches one page and returns (links found on it, SimHash of its ordinance text or None).
+# The adapter (publisher_adapters.PublisherAdapter) decides which links and text count;
+# the fingerprint is only computed when fingerprint=True.
+def fetch_page(adapter, url, headers, is_root, scheduler=None, streaming=False, cache=None, fingerprint=False):
+    cache_kind = f"{adapter.name}_page"
+    if cache is not None:
+        # Conditional GET: an unchanged page (304) reuses the links (and fingerprint) parsed last time
+        response = http_client.conditional_get(url, cache, scheduler=scheduler, headers=headers, timeout=15)
+        response.raise_for_status()
+        if response.not_modified:
+            cached_page = cache.load_parsed(url, cache_kind)
+            if cached_page is not None and (cached_page[1] is not None or not fingerprint):
+                metrics.count("cache_revalidated_total", module=adapter.name)
+                return cached_page[0], cached_page[1]
+        with metrics.timer("parse_seconds", module=adapter.name, mode="bs4"):
+            soup = BeautifulSoup(response.text, "html.parser")
+            links_found_on_page = adapter.extract_links(soup, is_root)
+            content_hash = simhash(adapter.extract_text(soup)) if fingerprint else None
+        cache.store_parsed(url, cache_kind, [links_found_on_page, content_hash])
+        return links_found_on_page, content_hash
 
-    final_ordinance_base_urls = set()
-    visited_page_bases = set() 
+    extractor = adapter.link_extractor(is_root, collect_text=fingerprint) if streaming else None
+    if extractor is not None:
+        response = http_client.get(url, scheduler=scheduler, headers=headers, timeout=15, stream=True)
+        response.raise_for_status()
+        with metrics.timer("parse_seconds", module=adapter.name, mode="stream"): # Includes reading the body
+            extractor = parse_stream(response, extractor)
+        return extractor.links, simhash(extractor.content_text) if fingerprint else None
 
-    headers = {"User-Agent": bot_user_agent}
-    target_domain = urlsplit(city_overview_url).netloc
-    overview_page_base_url = urlsplit(city_overview_url)._replace(fragment="").geturl()
+    response = http_client.get(url, scheduler=scheduler, headers=headers, timeout=15)
+    response.raise_for_status()
+    with metrics.timer("parse_seconds", module=adapter.name, mode="bs4"):
+        soup = BeautifulSoup(response.text, "html.parser")
+        return adapter.extract_links(soup, is_root), simhash(adapter.extract_text(soup)) if fingerprint else None
 
+# --- Crawl state shared by both modes ---
+# Sets up the frontier, restoring it from checkpoint (crawl_state.CrawlCheckpoint) when one was saved.
+# Returns (frontier, canonical start URL, discovered URLs so far).
+def _start_frontier(start_url, checkpoint):
+    frontier = CrawlFrontier(allowed_host=canonical_host(start_url), track_new_keys=checkpoint is not None)
+    root_url = canonicalize_url(start_url)
+    if checkpoint is not None:
+        discovered = checkpoint.load(frontier)
+        if discovered is not None:
+            state = "complete" if checkpoint.is_complete else "in progress"
+            print(f"  Resuming from checkpoint ({state}): {len(discovered)} URLs found, {len(frontier)} queued")
+            return frontier, root_url, discovered
+    frontier.add(start_url, 0)
+    return frontier, root_url, []
 
-    while scrape_queue:
-        current_url_to_process, current_depth = scrape_queue.pop(0)
-        queued_tasks.remove((current_url_to_process, current_depth)) # Remove from tracking set
+# --- Async crawl mode ---
+# Fetches a whole BFS depth level at once. requests is blocking, so each fetch
+# runs in a worker thread; a semaphore per host caps how many are in flight.
+# With a checkpoint, state is saved after every level.
+# fingerprints (dict) is filled with URL -> content SimHash; the last level is then fetched too.
+async def _crawl_async(adapter, start_url, headers, max_depth, max_concurrency_per_host, scheduler=None, streaming=False, checkpoint=None, cache=None,
+                       fingerprints=None):
+    loop = asyncio.get_running_loop()
+    frontier, root_url, final_ordinance_base_urls = _start_frontier(start_url, checkpoint)
+    saved_count = len(final_ordinance_base_urls)
+    crawl_errors = []
+    host_semaphores = {}
 
-        current_url_base = urlsplit(current_url_to_process)._replace(fragment="").geturl()
+    async def fetch_level_entry(url, is_root):
+        host = urlsplit(url).netloc
+        if host not in host_semaphores:
+            host_semaphores[host] = asyncio.Semaphore(max_concurrency_per_host)
+        async with host_semaphores[host]:
+            # With a scheduler, the worker thread sleeps until the host's next slot
+            return await loop.run_in_executor(executor, fetch_page, adapter, url, headers, is_root, scheduler, streaming, cache,
+                                              fingerprints is not None and not is_root)
 
-        if current_url_base in visited_page_bases:
-            continue
-        
-        # print(f"  Depth {current_depth}: Processing {current_url_to_process}") 
-        visited_page_bases.add(current_url_base)
+    with ThreadPoolExecutor(max_workers=max_concurrency_per_host) as executor:
+        while frontier:
+            current_level = frontier.pop_level()
+            current_depth = current_level[0][1]
+            metrics.set_gauge("frontier_size", len(frontier), crawl=adapter.name)
+            metrics.set_gauge("level_size", len(current_level), crawl=adapter.name)
+            for current_url, _ in current_level:
+                if current_url != root_url: # Add to final if not the start page
+                    final_ordinance_base_urls.append(current_url)
 
-        if current_url_base != overview_page_base_url: # Add to final if not the overview page
-            final_ordinance_base_urls.add(current_url_base)
+            errors = []
+            fetched = []
+            if current_depth < max_depth or fingerprints is not None:
+                results = await asyncio.gather(
+                    *(fetch_level_entry(url, url == root_url) for url, _ in current_level),
+                    return_exceptions=True,
+                )
 
-        if current_depth >= max_depth:
-            continue
+                for (current_url, _), result in zip(current_level, results):
+                    if isinstance(result, Exception):
+                        metrics.count("crawl_errors_total", crawl=adapter.name, error=type(result).__name__)
+                        errors.append((current_url, current_depth, str(result)))
+                        continue
+                    metrics.count("crawl_pages_total", crawl=adapter.name)
+                    fetched.append(current_url)
+                    links_found_on_page, content_hash = result
+                    if content_hash is not None:
+                        fingerprints[current_url] = content_hash
+                    if current_depth < max_depth:
+                        for rel_href in links_found_on_page:
+                            frontier.add(adapter.canonicalize(urljoin(current_url, rel_href)), current_depth + 1)
 
-        try:
-            response = requests.get(current_url_to_process, headers=headers, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            links_found_on_page = [] # Raw hrefs found
-            is_overview_page = current_url_base == overview_page_base_url
-
-            if is_overview_page:
-                toc_container = soup.find("div", class_="codenav__toc")
-                if toc_container:
-                    toc_entries = toc_container.find_all("div", class_=lambda c: c is not None and "toc-entry" in c.split())
-                    for entry in toc_entries:
-                        wrap = entry.find("div", class_="toc-entry__wrap")
-                        if wrap:
-                            link_tag = wrap.find("a")
-                            if link_tag and link_tag.get("href"):
-                                links_found_on_page.append(link_tag.get("href"))
-            else: 
-                content_area = soup.find("div", id="codecontent")
-                if content_area:
-                    normal_level_divs = content_area.find_all("div", class_="Normal-Level")
-                    if normal_level_divs: 
-                        for item_div in normal_level_divs:
-                            link_tag = item_div.find("a")
-                            if link_tag and link_tag.get("href"):
-                                links_found_on_page.append(link_tag.get("href"))
-            
-            for rel_href in links_found_on_page:
-                full_url = urljoin(current_url_to_process, rel_href)
-                if urlsplit(full_url).netloc == target_domain: # Stay on target domain
-                    full_url_base_to_check = urlsplit(full_url)._replace(fragment="").geturl()
-                    
-                    task_to_add = (full_url, current_depth + 1)
-                    if full_url_base_to_check not in visited_page_bases and task_to_add not in queued_tasks:
-                        # print(f"    Queueing {task_to_add}") # Debug
-                        scrape_queue.append(task_to_add)
-                        queued_tasks.add(task_to_add)
-        except Exception as e:
-            print(f"  ❗️ Error processing {current_url_to_process} at depth {current_depth}: {e}")
+            crawl_errors.extend(errors)
+            if checkpoint is not None:
+                checkpoint.save(frontier, final_ordinance_base_urls[saved_count:], errors, fetched=fetched)
+                saved_count = len(final_ordinance_base_urls)
 
+    return final_ordinance_base_urls, crawl_errors
 
-    duration = time.time() - start_time
-    url_queue = sorted(list(final_ordinance_base_urls))
-    
-    print(f"\n--- Results for {city_overview_url} (AmLegal) ---")
+# --- Sync crawl mode ---
+# One page at a time. With a checkpoint, state is saved every checkpoint_every pages.
+def _crawl_sync(adapter, start_url, headers, max_depth, scheduler=None, streaming=False, checkpoint=None, checkpoint_every=100, cache=None,
+                fingerprints=None):
+    # Frontier dedups on the canonical URL at enqueue time and stays on the code's host
+    frontier, root_url, final_ordinance_base_urls = _start_frontier(start_url, checkpoint)
+    saved_count = len(final_ordinance_base_urls)
+    errors = [] # Since the last checkpoint
+    fetched = [] # Since the last checkpoint
+    crawl_errors = []
+    pages_since_checkpoint = 0
+
+    while frontier:
+        current_url, current_depth = frontier.pop()
+        metrics.set_gauge("frontier_size", len(frontier), crawl=adapter.name)
+
+        if current_url != root_url: # Add to final if not the start page
+            final_ordinance_base_urls.append(current_url)
+
+        if current_depth < max_depth or fingerprints is not None:
+            try:
+                is_root = current_url == root_url
+                links_found_on_page, content_hash = fetch_page(adapter, current_url, headers, is_root, scheduler, streaming, cache,
+                                                                fingerprints is not None and not is_root)
+                metrics.count("crawl_pages_total", crawl=adapter.name)
+                fetched.append(current_url)
+                if content_hash is not None:
+                    fingerprints[current_url] = content_hash
+
+                if current_depth < max_depth:
+                    for rel_href in links_found_on_page:
+                        frontier.add(adapter.canonicalize(urljoin(current_url, rel_href)), current_depth + 1)
+            except Exception as e:
+                metrics.count("crawl_errors_total", crawl=adapter.name, error=type(e).__name__)
+                errors.append((current_url, current_depth, str(e)))
+                crawl_errors.append(errors[-1])
+
+        pages_since_checkpoint += 1
+        if checkpoint is not None and pages_since_checkpoint >= checkpoint_every:
+            checkpoint.save(frontier, final_ordinance_base_urls[saved_count:], errors, fetched=fetched)
+            saved_count = len(final_ordinance_base_urls)
+            errors = []
+            fetched = []
+            pages_since_checkpoint = 0
+
+    if checkpoint is not None:
+        checkpoint.save(frontier, final_ordinance_base_urls[saved_count:], errors, fetched=fetched)
+
+    return final_ordinance_base_urls, crawl_errors
+
+# --- Results / KPI report shared by both crawl modes ---
+# Errors are summarized here rather than printed as they happen (metrics.crawl_errors_total counts them live)
+def _report_results(label, start_url, url_queue, duration, crawl_errors=()):
+    print(f"\n--- Results for {start_url} ({label}) ---")
     print(f"Total unique URLs found: {len(url_queue)}")
     print(f"Time taken: {duration:.2f} s")
+    if crawl_errors:
+        print(f"Errors: {len(crawl_errors)} pages failed")
+        for url, depth, error in crawl_errors[:_REPORTED_ERRORS]:
+            print(f"  ❗️ {url} at depth {depth}: {error}")
+        if len(crawl_errors) > _REPORTED_ERRORS:
+            print(f"  ... and {len(crawl_errors) - _REPORTED_ERRORS} more.")
 
     # KPIs
     if len(url_queue) >= 400:
@@ -105,18 +207,100 @@ def get_urls_from_amlegal(city_overview_url, bot_user_agent, max_depth=2):
         print(f"METRIC: Queue build time (<= 15s) - FAILED (Took {duration:.2f}s)")
     # Else: no URLs found, time KPI less relevant or also failed.
 
+# --- Publisher-agnostic queue builder ---
+# publisher: a name registered in publisher_adapters.PUBLISHERS (e.g. "amlegal") or an adapter instance.
+# start_url is the publisher's root page for one code (AmLegal: the overview page with the ToC).
+# use_async=True fetches each depth level concurrently (at most
+# max_concurrency_per_host requests in flight per host) instead of one page at a time.
+# scheduler (politeness.PolitenessScheduler) throttles requests per host; None means no throttling.
+# streaming=True parses each page incrementally as it downloads and stops at the end of the ToC/content div
+# (only for adapters with a link_extractor; others fall back to a whole-page parse).
+# checkpoint_path (SQLite file) saves the crawl state as it goes; rerunning with the same path resumes
+# where the previous run stopped (or returns the saved result if that run finished).
+# cache (response_cache.ResponseCache) revalidates pages with ETag/Last-Modified; unchanged pages
+# reuse their cached links without re-parsing. Takes precedence over streaming (it needs whole bodies).
+# fingerprints (an empty dict) is filled with URL -> SimHash of each page's ordinance text; every
+# discovered URL is then fetched, including the last depth level (see get_publisher_changes).
+def build_url_queue(publisher, start_url, bot_user_agent, max_depth=2, use_async=False, max_concurrency_per_host=8, scheduler=None, streaming=False,
+                    checkpoint_path=None, checkpoint_every=100, cache=None, fingerprints=None):
+    adapter = get_adapter(publisher)
+    mode = "async" if use_async else "sync"
+    print(f"Processing {adapter.label}: {start_url} (max_depth={max_depth}, mode={mode})")
+    start_time = time.time()
+
+    headers = {"User-Agent": bot_user_agent}
+
+    checkpoint = CrawlCheckpoint(checkpoint_path, start_url) if checkpoint_path else None
+    try:
+        if use_async:
+            final_ordinance_base_urls, crawl_errors = asyncio.run(
+                _crawl_async(adapter, start_url, headers, max_depth, max_concurrency_per_host, scheduler, streaming, checkpoint, cache,
+                             fingerprints)
+            )
+        else:
+            final_ordinance_base_urls, crawl_errors = _crawl_sync(adapter, start_url, headers, max_depth, scheduler, streaming,
+                                                                  checkpoint, checkpoint_every, cache, fingerprints)
+        if checkpoint is not None and not checkpoint.is_complete:
+            checkpoint.save(CrawlFrontier(), complete=True)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    duration = time.time() - start_time
+    url_queue = sorted(set(final_ordinance_base_urls)) # Retried pages can be listed twice after a resume
+    _report_results(adapter.label, start_url, url_queue, duration, crawl_errors)
+
     return url_queue, duration
 
+# --- American Legal Publishing Parser ---
+# build_url_queue with the AmLegal adapter; takes the same options.
+def get_urls_from_amlegal(city_overview_url, bot_user_agent, max_depth=2, use_async=False, max_concurrency_per_host=8, scheduler=None, streaming=False,
+                          checkpoint_path=None, checkpoint_every=100, cache=None, fingerprints=None):
+    return build_url_queue(AmLegalAdapter(), city_overview_url, bot_user_agent, max_depth, use_async, max_concurrency_per_host, scheduler, streaming,
+                           checkpoint_path, checkpoint_every, cache, fingerprints)
+
+# --- Incremental change detection ---
+# Crawls like build_url_queue (extra keyword arguments are passed through) while fingerprinting
+# every ordinance page, compares against the snapshot saved at snapshot_path by the previous run and
+# then replaces it. Returns {"added": [...], "removed": [...], "changed": [...]}; the first run reports
+# every URL as added. Feed only these to downstream indexing instead of rebuilding everything.
+# change_threshold: SimHash bits that may differ before a page counts as changed (0 = any text change).
+def get_publisher_changes(publisher, start_url, bot_user_agent, snapshot_path, change_threshold=0, **crawl_options):
+    fingerprints = {}
+    url_queue, _ = build_url_queue(publisher, start_url, bot_user_agent, fingerprints=fingerprints, **crawl_options)
+
+    snapshot = FingerprintSnapshot(snapshot_path, change_threshold=change_threshold)
+    try:
+        changes = snapshot.update(url_queue, fingerprints)
+    finally:
+        snapshot.close()
+
+    print(f"Changes since last snapshot: {len(changes['added'])} added, "
+          f"{len(changes['removed'])} removed, {len(changes['changed'])} changed")
+    return changes
+
+def get_amlegal_changes(city_overview_url, bot_user_agent, snapshot_path, change_threshold=0, **crawl_options):
+    return get_publisher_changes(AmLegalAdapter(), city_overview_url, bot_user_agent, snapshot_path, change_threshold, **crawl_options)
+
 # --- Main block to test ---
 if __name__ == "__main__":
+    from politeness import PolitenessScheduler
+    from robots_audits import MultiDomainRobotsAuditor
+
     my_user_agent = "AvniProjectBot/1.0" # Your bot's user agent
 
     # Test American Legal Publishing
     # Target URL for Tippecanoe County, IN (Overview page which contains the ToC)
     amlegal_test_url = "https://codelibrary.amlegal.com/codes/tippecanoe/latest/overview"
     
+    # Throttle per host using AmLegal's robots.txt Crawl-delay and the server's 429/Retry-After feedback
+    scheduler = PolitenessScheduler(robots_auditor=MultiDomainRobotsAuditor(user_agent=my_user_agent))
+
+    # Per-request timings, frontier size and error counts, sampled every 5 s (see metrics.py)
+    # metrics.enable(metrics.JsonlExporter("crawl_metrics.jsonl"), metrics.PrometheusTextfileExporter("crawl.prom"), interval=5)
+
     print(f"\nAttempting to fetch URLs for Tippecanoe County, OH (AmLegal) from {amlegal_test_url}...")
-    amlegal_urls, amlegal_time = get_urls_from_amlegal(amlegal_test_url, my_user_agent, max_depth=3)
+    amlegal_urls, amlegal_time = get_urls_from_amlegal(amlegal_test_url, my_user_agent, max_depth=3, use_async=True, scheduler=scheduler)
 
     if amlegal_urls:
         print(f"Successfully found {len(amlegal_urls)} unique URLs in {amlegal_time:.2f}s for Tippecanoe (AmLegal).")
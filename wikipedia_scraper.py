@@ -1,116 +1,710 @@
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin # For handling relative links
+import http_client # Pooled keep-alive sessions shared by all fetchers
+from urllib.parse import urljoin, unquote # For handling relative links
 import csv
+import heapq
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from html_parsing import parse_with, parse_stream, is_non_text_tag
+from output_sinks import open_sink
+from wikitables import normalize_table
+from link_classifier import ARTICLE, LinkClassifier, PageLinks, article_url
+from crawl_frontier import BloomFilter
+import mediawiki_api
+import metrics
 
-def scrape_wikipedia_page(url, user_agent):
+_WIKIPEDIA_BASE_URL = "https://en.wikipedia.org" # For constructing full URLs
+
+
+# Classes of direct-child divs whose paragraphs are not article text
+_EXCLUDED_DIV_CLASSES = frozenset(["infobox", "thumb", "tright", "tleft", "rellink", "noprint", "mw-references-wrap"])
+
+
+def _span(value):
+    # rowspan/colspan attribute -> int >= 1 (browsers read the leading digits and ignore the rest)
+    digits = ""
+    for char in (value or "").strip():
+        if not char.isdigit():
+            break
+        digits += char
+    return max(1, int(digits)) if digits else 1
+
+
+# --- Single-pass extractor ---
+# Collects the main text, the wikitables and the article links in ONE walk over
+# the document (see html_parsing for the event protocol and parser backends).
+# The rules are the same as the original find_all-based code:
+#   text:   <p> directly under div.mw-parser-output (inside div#mw-content-text), then
+#           <p> inside direct-child <div>s of it that contain no <table> and no
+#           infobox, thumbnail, hatnote, noprint or reference-list element
+#           (the original code meant to skip those too, but passed the CSS
+#           selectors to find() as tag names, so only <table> ever matched)
+#   tables: every table.wikitable; a row per <tr>, a cell per <th>/<td>
+#           (raw_tables keeps each table's own rows with rowspan/colspan for wikitables.py)
+#   links:  /wiki/ links without ":" inside div#mw-content-text (whole page if it is missing)
+#   infobox: the first table.infobox as (label, value) rows - a row's <th> and <td>
+#           text; header rows (a <th> without a <td>) have value "", full-width
+#           <td> rows (coordinates, images) label "" - for municipality_attributes.
+#           Tables nested in the infobox count as cell text.
+# text_only=True skips tables and links and sets .done as soon as div.mw-parser-output
+# closes, which lets parse_stream stop downloading the rest of the page.
+# link_classifier (link_classifier.LinkClassifier) additionally sorts every link in
+# div#mw-content-text by kind into .link_graph (a PageLinks), with its section heading
+# and, if keep_link_context, its anchor text.
+class WikipediaPageExtractor:
+    def __init__(self, text_only=False, link_classifier=None, keep_link_context=True):
+        self.text_only = text_only
+        self.link_classifier = None if text_only else link_classifier
+        self.link_graph = PageLinks(keep_link_context) if self.link_classifier is not None else None
+        self.done = False
+        self.found_content_div = False
+        self.found_parser_output = False
+        self.direct_paragraphs = []  # Text of <p> directly under parser output
+        self.div_paragraphs = []     # Text of <p> inside table-free direct-child divs
+        self.tables = []             # One list of rows per wikitable
+        self.raw_tables = []         # Per wikitable: its own rows of [cell, rowspan, colspan, is_header]
+        self.content_links = set()
+        self.page_links = set()      # Only used if there is no div#mw-content-text
+        self.categories = set()      # Category names linked anywhere on the page ("Cities in Indiana")
+        self.infobox_classes = set() # Classes of infobox tables, e.g. {"infobox", "ib-settlement", "vcard"}
+        self.infobox_rows = []       # (label, value) rows of the first infobox
+
+        self._depth = 0
+        self._content_depth = None   # Depth of the open div#mw-content-text
+        self._output_depth = None    # Depth of the open div.mw-parser-output
+        self._child_div = None       # [depth, excluded, paragraphs] for the open direct-child div
+        self._paragraph = None       # [depth, text parts, target list] for the <p> being captured
+        self._skip_depth = None      # Depth of an open <script>/<style>
+        self._open_tables = []       # [depth, rows]
+        self._table_stack = []       # [depth, raw rows, or None for a non-wikitable table] for every open table
+        self._open_rows = []         # [depth, cells]
+        self._open_cells = []        # [depth, text parts]
+        self._anchor = None          # [depth, href, text parts] for the open <a> (link_classifier only)
+        self._heading = None         # [depth, text parts] for the open <h2>-<h4> (link_classifier only)
+        self._infobox_depth = None   # Depth of the open first infobox table
+        self._infobox_nested = 0     # Tables open inside it
+        self._infobox_row = None     # [depth, <th> parts, <td> parts, has <td>]
+        self._infobox_cell = None    # [depth, text parts] for the open <th>/<td> of that row
+
+    def start(self, tag, attrs):
+        if self.done:
+            return
+        self._depth += 1
+        depth = self._depth
+
+        if self._skip_depth is None and is_non_text_tag(tag):
+            self._skip_depth = depth
+        if self._child_div is not None and not self._child_div[1] and "class" in attrs:
+            if not _EXCLUDED_DIV_CLASSES.isdisjoint((attrs.get("class") or "").split()):
+                self._child_div[1] = True
+        if self._infobox_depth is not None and self._infobox_nested == 0:
+            self._start_infobox_element(tag, depth)
+
+        if tag == "div":
+            if self._content_depth is None and not self.found_content_div and attrs.get("id") == "mw-content-text":
+                self.found_content_div = True
+                self._content_depth = depth
+            elif (self._content_depth is not None and not self.found_parser_output
+                  and "mw-parser-output" in (attrs.get("class") or "").split()):
+                self.found_parser_output = True
+                self._output_depth = depth
+            elif self._output_depth is not None and depth == self._output_depth + 1:
+                self._child_div = [depth, False, []]
+        elif tag == "p":
+            if self._paragraph is None and self._output_depth is not None:
+                if depth == self._output_depth + 1:
+                    self._paragraph = [depth, [], self.direct_paragraphs]
+                elif self._child_div is not None:
+                    self._paragraph = [depth, [], self._child_div[2]]
+        elif tag == "a":
+            href = None if self.text_only else attrs.get("href")
+            if href and href.startswith("/wiki/"):
+                if ":" not in href: # ":" rules out Help:, File:, Category:, ...
+                    if self._content_depth is not None:
+                        self.content_links.add(href)
+                    elif not self.found_content_div:
+                        self.page_links.add(href)
+                elif href.startswith("/wiki/Category:"):
+                    self.categories.add(unquote(href[15:].partition("#")[0]).replace("_", " "))
+            if self.link_classifier is not None and self._content_depth is not None and self._anchor is None:
+                href = attrs.get("href")
+                if href:
+                    self._anchor = [depth, href, []]
+        elif tag in ("h2", "h3", "h4"):
+            if self.link_classifier is not None and self._output_depth is not None and self._heading is None:
+                self._heading = [depth, []]
+        elif tag == "table":
+            if self._child_div is not None:
+                self._child_div[1] = True
+            classes = (attrs.get("class") or "").split()
+            if self._infobox_depth is not None:
+                self._infobox_nested += 1
+            if "infobox" in classes:
+                self.infobox_classes.update(classes)
+                if not self.text_only and self._infobox_depth is None and not self.infobox_rows:
+                    self._infobox_depth = depth
+            if not self.text_only and "wikitable" in classes:
+                rows = []
+                raw_rows = []
+                self.tables.append(rows)
+                self.raw_tables.append(raw_rows)
+                self._open_tables.append([depth, rows])
+                self._table_stack.append([depth, raw_rows])
+            elif self._open_tables:
+                self._table_stack.append([depth, None])
+        elif tag == "tr":
+            if self._open_tables:
+                cells = []
+                for _, rows in self._open_tables:
+                    rows.append(cells)
+                raw_rows = self._table_stack[-1][1]
+                raw_cells = None
+                if raw_rows is not None:
+                    raw_cells = []
+                    raw_rows.append(raw_cells)
+                self._open_rows.append([depth, cells, raw_cells])
+        elif tag == "th" or tag == "td":
+            if self._open_rows:
+                parts = []
+                for _, cells, _ in self._open_rows:
+                    cells.append(parts)
+                raw_cells = self._open_rows[-1][2]
+                if raw_cells is not None:
+                    raw_cells.append([parts, _span(attrs.get("rowspan")), _span(attrs.get("colspan")), tag == "th"])
+                self._open_cells.append([depth, parts])
+
+    def _start_infobox_element(self, tag, depth):
+        if tag == "tr":
+            self._infobox_row = [depth, [], [], False]
+        elif (tag == "th" or tag == "td") and self._infobox_row is not None and self._infobox_cell is None:
+            if tag == "th":
+                self._infobox_cell = [depth, self._infobox_row[1]]
+            else:
+                self._infobox_row[3] = True
+                self._infobox_cell = [depth, self._infobox_row[2]]
+
+    def _end_infobox_element(self, depth):
+        if self._infobox_cell is not None and self._infobox_cell[0] == depth:
+            self._infobox_cell = None
+        elif self._infobox_row is not None and self._infobox_row[0] == depth:
+            _, label_parts, value_parts, has_value = self._infobox_row
+            label = " ".join(label_parts)
+            value = " ".join(value_parts)
+            if label or value:
+                self.infobox_rows.append((label, value if has_value else ""))
+            self._infobox_row = None
+        elif self._infobox_depth == depth:
+            self._infobox_depth = None
+
+    def end(self, tag):
+        if self.done:
+            return
+        depth = self._depth
+        self._depth -= 1
+
+        if self._skip_depth == depth:
+            self._skip_depth = None
+        if self._infobox_depth is not None:
+            if tag == "table" and self._infobox_nested and depth > self._infobox_depth:
+                self._infobox_nested -= 1
+            elif self._infobox_nested == 0:
+                self._end_infobox_element(depth)
+        if self._anchor is not None and self._anchor[0] == depth:
+            _, href, parts = self._anchor
+            kind, target = self.link_classifier.classify(href)
+            self.link_graph.add(kind, target, " ".join(parts))
+            self._anchor = None
+        if self._heading is not None and self._heading[0] == depth:
+            self.link_graph.start_section(" ".join(self._heading[1]))
+            self._heading = None
+        if self._paragraph is not None and self._paragraph[0] == depth:
+            self._paragraph[2].append(" ".join(self._paragraph[1]))
+            self._paragraph = None
+        if self._open_cells and self._open_cells[-1][0] == depth:
+            cell = self._open_cells.pop()[1]
+            cell[:] = [" ".join(cell)] # Collapse text parts into the final cell string
+        elif self._open_rows and self._open_rows[-1][0] == depth:
+            self._open_rows.pop()
+        elif self._table_stack and self._table_stack[-1][0] == depth:
+            if self._table_stack.pop()[1] is not None:
+                self._open_tables.pop()
+        if self._child_div is not None and self._child_div[0] == depth:
+            if not self._child_div[1]:
+                self.div_paragraphs.extend(self._child_div[2])
+            self._child_div = None
+        if self._output_depth == depth:
+            self._output_depth = None
+            if self.text_only:
+                self.done = True
+        if self._content_depth == depth:
+            self._content_depth = None
+
+    def text(self, data):
+        if self._skip_depth is not None or self.done:
+            return
+        data = data.strip()
+        if not data:
+            return
+        if self._paragraph is not None:
+            self._paragraph[1].append(data)
+        for _, parts in self._open_cells:
+            parts.append(data)
+        if self._anchor is not None:
+            self._anchor[2].append(data)
+        if self._heading is not None:
+            self._heading[1].append(data)
+        if self._infobox_cell is not None:
+            self._infobox_cell[1].append(data)
+
+    def table_cells(self):
+        """Each wikitable's own rows as lists of (text, rowspan, colspan, is_header), for wikitables.normalize_table."""
+        return [
+            [[(parts[0] if parts else "", rowspan, colspan, is_header) for parts, rowspan, colspan, is_header in raw_row]
+             for raw_row in raw_rows if raw_row]
+            for raw_rows in self.raw_tables
+        ]
+
+    def result(self):
+        """Returns (main_text, tables_data, links) in the same shape scrape_wikipedia_page returns."""
+        main_text = "\n\n".join(filter(None, self.direct_paragraphs + self.div_paragraphs))
+        tables_data = []
+        for rows in self.tables:
+            table_rows = [[cell[0] if cell else "" for cell in row] for row in rows if row]
+            if table_rows:
+                tables_data.append(table_rows)
+        hrefs = self.content_links if self.found_content_div else self.page_links
+        links = sorted(_WIKIPEDIA_BASE_URL + href if "/." not in href else urljoin(_WIKIPEDIA_BASE_URL, href) for href in hrefs)
+        return main_text, tables_data, links
+
+
+def extract_wikipedia_page(html, parser_backend=None):
+    """Parses article HTML and returns (main_text, tables_data, links). No network access."""
+    return parse_with(html, WikipediaPageExtractor(), parser_backend).result()
+
+
+def extract_wikipedia_tables(html, parser_backend=None):
+    """
+    Parses article HTML and returns its wikitables as wikitables.WikiTable objects:
+    rowspan/colspan expanded, header rows detected, columns typed. No network access.
+    """
+    extractor = parse_with(html, WikipediaPageExtractor(), parser_backend)
+    return [table for table in map(normalize_table, extractor.table_cells()) if table.n_columns]
+
+
+def extract_wikipedia_links(html, link_classifier=None, keep_context=True, parser_backend=None):
+    """
+    Parses article HTML and returns a link_classifier.PageLinks with every link in
+    div#mw-content-text classified (article, namespace, red link, external, anchor).
+    link_classifier defaults to one for en.wikipedia.org. No network access.
+    """
+    if link_classifier is None:
+        link_classifier = LinkClassifier(_WIKIPEDIA_BASE_URL)
+    extractor = WikipediaPageExtractor(link_classifier=link_classifier, keep_link_context=keep_context)
+    return parse_with(html, extractor, parser_backend).link_graph
+
+
+def extract_wikipedia_infobox(html, parser_backend=None):
+    """Parses article HTML and returns its first infobox as (label, value) rows (see WikipediaPageExtractor). No network access."""
+    return parse_with(html, WikipediaPageExtractor(), parser_backend).infobox_rows
+
+
+def _wrap_parser_output(parser_output_html):
+    # action=parse returns only div.mw-parser-output; the extractor's rules expect it inside div#mw-content-text
+    return f'<div id="mw-content-text">{parser_output_html}</div>'
+
+
+# --- Streaming text-only scrape ---
+# Most callers only want the article paragraphs. This streams the response through
+# the incremental tokenizer and stops reading once div.mw-parser-output closes, so
+# neither the full body nor a DOM tree is ever held in memory.
+def scrape_wikipedia_text_streaming(url, user_agent, scheduler=None):
+    print(f"Streaming Wikipedia page text: {url}")
+    headers = {"User-Agent": user_agent}
+    try:
+        response = http_client.get(url, scheduler=scheduler, headers=headers, timeout=15, stream=True)
+        response.raise_for_status()
+        extractor = parse_stream(response, WikipediaPageExtractor(text_only=True))
+    except requests.RequestException as e:
+        print(f"  ❗️ Error fetching page: {e}")
+        return None
+    main_text = extractor.result()[0]
+    if not main_text:
+        print("  No main text extracted. Check selectors.")
+    return main_text
+
+
+# scheduler (politeness.PolitenessScheduler) throttles requests per host; None means no throttling
+# parser_backend picks the HTML parser ("selectolax", "lxml" or "html.parser"); None = fastest installed
+# cache (response_cache.ResponseCache) revalidates with ETag/Last-Modified; an unchanged page (304)
+# returns the results extracted last time without downloading or parsing it again
+# api_url (e.g. mediawiki_api.DEFAULT_API_URL) fetches the article through the MediaWiki action API
+# (action=parse) instead: same results, without the skin HTML around the article. cache is not used then.
+def scrape_wikipedia_page(url, user_agent, scheduler=None, parser_backend=None, cache=None, api_url=None, include_infobox=False):
+    """
+    Returns (main_text, tables_data, links); with include_infobox=True, (main_text, tables_data, links, infobox_rows)
+    where infobox_rows are the first infobox's (label, value) rows (see municipality_attributes).
+    """
+    result = _scrape_wikipedia_page(url, user_agent, scheduler, parser_backend, cache, api_url)
+    return result if include_infobox else result[:3]
+
+
+def _scrape_wikipedia_page(url, user_agent, scheduler, parser_backend, cache, api_url):
     print(f"Scraping Wikipedia page: {url}")
     headers = {"User-Agent": user_agent}
     
     # --- Extracted Data Storage ---
-    article_text_parts = []
-    links = set() # To store unique Wikipedia links
+    main_text = None
+    links = [] # Unique Wikipedia links, sorted
     tables_data = [] # Will store lists of lists for each table
+    infobox_rows = [] # (label, value) rows of the first infobox
 
     try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status() # Check for HTTP errors
-        
-        soup = BeautifulSoup(response.text, "html.parser")
+        if api_url is not None:
+            title = mediawiki_api.title_from_url(url)
+            html = _wrap_parser_output(mediawiki_api.parse_page_html(title, user_agent, api_url, scheduler))
+        elif cache is not None:
+            response = http_client.conditional_get(url, cache, scheduler=scheduler, headers=headers, timeout=15)
+            response.raise_for_status()
+            cached_result = cache.load_parsed(url, "wikipedia_page") if response.not_modified else None
+            if cached_result is not None and len(cached_result) == 4: # Entries from before infoboxes were kept get parsed again
+                print("  Not modified since the last scrape; using cached results.")
+                main_text, tables_data, links, infobox_rows = cached_result
+                return main_text, tables_data, links, [tuple(row) for row in infobox_rows]
+            html = response.text
+        else:
+            response = http_client.get(url, scheduler=scheduler, headers=headers, timeout=15)
+            response.raise_for_status() # Check for HTTP errors
+            html = response.text
         
-        # --- TODO: Logic to extract main text ---
+        # One pass over the document collects text, tables and links together
+        with metrics.timer("parse_seconds", module="wikipedia", mode="page"):
+            extractor = parse_with(html, WikipediaPageExtractor(), parser_backend)
+            main_text, tables_data, links = extractor.result()
+            infobox_rows = extractor.infobox_rows
+        if cache is not None and api_url is None:
+            cache.store_parsed(url, "wikipedia_page", [main_text, tables_data, links, infobox_rows])
+
+        # --- Main article text ---
         # Wikipedia article content is usually within a div with id="mw-content-text"
         # and then within that, often in <p> tags for main text.
-        # We need to avoid sidebars, nav boxes, etc.
         print("\n--- Extracting Main Article Text ---")
-        content_div = soup.find("div", id="mw-content-text")
-        if content_div:
-            # Find the main parser output div (often class="mw-parser-output")
-            parser_output_div = content_div.find("div", class_="mw-parser-output")
-            if parser_output_div:
-                # Extract text primarily from <p> tags directly under parser_output_div
-                # This is a starting point; might need refinement.
-                for p_tag in parser_output_div.find_all("p", recursive=False): # Only direct children paragraphs
-                    article_text_parts.append(p_tag.get_text(separator=" ", strip=True))
-                
-                # Also get text from paragraphs within other common content elements like divs
-                # that are direct children of parser_output_div (excluding tables, infoboxes etc.)
-                for child_element in parser_output_div.find_all(recursive=False):
-                    if child_element.name == 'div' and not child_element.find(['table', '.infobox', '.thumb', '.tright', '.tleft', '.rellink', '.noprint', '.mw-references-wrap']):
-                        for p_tag_in_div in child_element.find_all("p"):
-                             article_text_parts.append(p_tag_in_div.get_text(separator=" ", strip=True))
-            else:
-                print("  Could not find 'div.mw-parser-output' within 'div#mw-content-text'.")
-        else:
+        if not extractor.found_content_div:
             print("  Could not find 'div#mw-content-text'.")
-
-        main_text = "\n\n".join(filter(None, article_text_parts)) # Join non-empty parts
+        elif not extractor.found_parser_output:
+            print("  Could not find 'div.mw-parser-output' within 'div#mw-content-text'.")
         print(f"  Extracted text (first 500 chars): {main_text[:500]}...")
         if not main_text:
             print("  No main text extracted. Check selectors.")
 
 
-        # --- TODO: Logic to extract Tables ---
-        print("\n--- Extracting Tables ---")
+        # --- Tables ---
         # Tables in Wikipedia are usually <table> tags with class "wikitable"
-        # or sometimes "infobox" for the side box (which we might want to treat differently or exclude)
-        
-        # Let's target general "wikitable" first
-        for table_count, table_tag in enumerate(soup.find_all("table", class_="wikitable")):
-            print(f"  Processing wikitable {table_count + 1}...")
-            current_table_data = []
-            for row in table_tag.find_all("tr"):
-                row_data = []
-                # Get th (header) and td (data) cells
-                for cell in row.find_all(["th", "td"]):
-                    row_data.append(cell.get_text(separator=" ", strip=True))
-                if row_data: # Only add if the row had some cells
-                    current_table_data.append(row_data)
-            if current_table_data:
-                tables_data.append(current_table_data)
-                print(f"    Extracted {len(current_table_data)} rows.")
-        
+        print("\n--- Extracting Tables ---")
+        metrics.count("wikipedia_tables_total", len(tables_data))
+        metrics.count("wikipedia_table_rows_total", sum(len(table) for table in tables_data))
         if not tables_data:
             print("  No wikitables found or extracted.")
         else:
             print(f"  Total wikitables extracted: {len(tables_data)}")
 
 
-        # --- TODO: Logic to extract Wikipedia Links ---
-        print("\n--- Extracting Wikipedia Links ---")
+        # --- Wikipedia Links ---
         # Links to other Wikipedia articles are <a> tags whose href starts with "/wiki/"
         # and does not contain a colon ":" (to exclude Special pages, File pages, etc.)
-        # and often within the main content area (e.g., inside 'div#mw-content-text')
-        
-        # If content_div was found earlier, search within it for better context.
-        search_area_for_links = content_div if content_div else soup # Fallback to whole soup
-
-        base_wikipedia_url = "https://en.wikipedia.org" # For constructing full URLs
-
-        for link_tag in search_area_for_links.find_all("a", href=True):
-            href = link_tag["href"]
-            if href.startswith("/wiki/") and ":" not in href and not href.startswith("/wiki/Help:") and not href.startswith("/wiki/File:") and not href.startswith("/wiki/Category:") and not href.startswith("/wiki/Portal:") and not href.startswith("/wiki/Template:") and not href.startswith("/wiki/Wikipedia:") and not href.startswith("/wiki/Special:"):
-                full_url = urljoin(base_wikipedia_url, href)
-                links.add(full_url)
-        
+        print("\n--- Extracting Wikipedia Links ---")
         print(f"  Found {len(links)} unique Wikipedia article links.")
-        # Print a few examples
-        # for i, link_url in enumerate(list(links)[:5]):
-        #     print(f"    {i+1}. {link_url}")
 
 
     except requests.RequestException as e:
         print(f"  ❗️ Error fetching page: {e}")
-        return None, None, None # Return None for all if fetching fails
+        return None, None, None, None # Return None for all if fetching fails
     except Exception as e:
         print(f"  ❗️ An unexpected error occurred: {e}")
         # Depending on the error, some data might have been partially extracted
         # For simplicity, return what we have or None
-        return main_text if 'main_text' in locals() else None, \
+        return main_text, \
                tables_data if tables_data else None, \
-               list(links) if links else None
+               links if links else None, \
+               infobox_rows if infobox_rows else None
+
+    return main_text, tables_data, links, infobox_rows
+
+
+# --- Bulk mode ---
+# Fetching is I/O-bound and parsing is CPU-bound (and GIL-bound), so they get
+# separate pools: fetch_workers threads download pages while parse_workers
+# processes run the page extractor. At most max_in_flight pages are held in
+# memory at once; results go to an output_sinks sink (JSONL or Parquet) as soon as
+# each page is parsed, in batches of output_batch_size records.
+
+def read_wikipedia_links(source):
+    """Yields article URLs from a CSV file (like wikipedia_links.csv) or from any iterable of URLs."""
+    if isinstance(source, str):
+        with open(source, "r", newline="", encoding="utf-8") as csvfile:
+            for row in csv.reader(csvfile):
+                if row and row[0].startswith("http"): # Skips the header row
+                    yield row[0].strip()
+    else:
+        for url in source:
+            yield url
+
+
+def _fetch_page_html(url, headers, scheduler):
+    response = http_client.get(url, scheduler=scheduler, headers=headers, timeout=15)
+    response.raise_for_status()
+    return response.text
+
+
+def _parse_page_worker(url, html, parser_backend):
+    # Runs in a worker process; must stay a top-level function so it can be pickled.
+    # The parse time goes back with the result: metrics recorded in a worker process would be lost.
+    start_time = time.perf_counter()
+    extractor = parse_with(html, WikipediaPageExtractor(), parser_backend)
+    return url, extractor.result(), extractor.infobox_rows, time.perf_counter() - start_time
+
+
+def scrape_wikipedia_pages_bulk(links, user_agent, output_path="wikipedia_bulk.jsonl", fetch_workers=8,
+                                parse_workers=None, max_in_flight=None, scheduler=None, parser_backend=None,
+                                output_format=None, output_batch_size=100):
+    """
+    Scrapes every URL in links (CSV path or iterable) and writes page, table and error records
+    to output_path (see output_sinks; ".parquet" writes Parquet, ".jsonl" / ".jsonl.gz" appends JSON lines).
+    parse_workers=None uses every CPU; parse_workers=0 parses in this process (handy for debugging).
+    Returns a summary dict with page, error and timing counts.
+    """
+    if parse_workers is None:
+        parse_workers = os.cpu_count() or 1
+    if max_in_flight is None:
+        max_in_flight = 2 * (fetch_workers + max(parse_workers, 1))
+    headers = {"User-Agent": user_agent}
+    start_time = time.time()
+    summary = {"pages": 0, "errors": 0}
+    print(f"Bulk scraping Wikipedia pages (fetch_workers={fetch_workers}, parse_workers={parse_workers}) -> {output_path}")
+
+    url_iter = iter(read_wikipedia_links(links))
+    fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers)
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+    pending = {} # future -> (stage, url)
+
+    try:
+        with open_sink(output_path, output_format, batch_size=output_batch_size) as sink:
+            while True:
+                # Keep the pipeline topped up without reading the whole link list into memory
+                while len(pending) < max_in_flight:
+                    url = next(url_iter, None)
+                    if url is None:
+                        break
+                    pending[fetch_pool.submit(_fetch_page_html, url, headers, scheduler)] = ("fetch", url)
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, url = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        summary["errors"] += 1 # Details go to the sink as an error record
+                        metrics.count("crawl_errors_total", crawl="wikipedia_bulk", stage=stage, error=type(e).__name__)
+                        sink.write_error(url, time.time(), e)
+                        continue
+
+                    if stage == "fetch":
+                        if parse_pool is not None:
+                            pending[parse_pool.submit(_parse_page_worker, url, result, parser_backend)] = ("parse", url)
+                            continue
+                        result = _parse_page_worker(url, result, parser_backend)
+
+                    _, (main_text, tables_data, page_links), infobox_rows, parse_seconds = result
+                    metrics.observe("parse_seconds", parse_seconds, module="wikipedia", mode="bulk")
+                    metrics.count("crawl_pages_total", crawl="wikipedia_bulk")
+                    metrics.set_gauge("in_flight", len(pending), crawl="wikipedia_bulk")
+                    summary["pages"] += 1
+                    sink.write_page(url, time.time(), main_text, tables_data, page_links, infobox_rows)
+    finally:
+        fetch_pool.shutdown(wait=True, cancel_futures=True)
+        if parse_pool is not None:
+            parse_pool.shutdown(wait=True, cancel_futures=True)
+
+    summary["seconds"] = time.time() - start_time
+    print(f"  Scraped {summary['pages']} pages ({summary['errors']} errors) in {summary['seconds']:.2f} s")
+    return summary
+
+
+# --- MediaWiki API bulk mode ---
+# Resolves up to 50 titles per request (existence, redirects, links) with the action API.
+# include_text=False stops there: links only, tens of times fewer requests than fetching
+# every page. include_text=True then fetches each existing page once with action=parse
+# (redirects and duplicates collapsed, missing pages skipped) for text and tables.
 
-    return main_text, tables_data, sorted(list(links))
+def scrape_wikipedia_pages_api(links, user_agent, api_url=mediawiki_api.DEFAULT_API_URL, include_text=True,
+                               scheduler=None, parser_backend=None, batch_size=mediawiki_api.MAX_TITLES_PER_QUERY,
+                               include_infobox=False):
+    """
+    Returns {url: (main_text, tables_data, links)} for every URL in links (CSV path or iterable),
+    with None for pages that do not exist. With include_text=False, main_text is "" and
+    tables_data is [], and links comes from the API's link table.
+    include_infobox=True adds the first infobox's (label, value) rows as a fourth item
+    (always [] with include_text=False, which never fetches the page HTML).
+    """
+    urls = list(read_wikipedia_links(links))
+    titles = {url: mediawiki_api.title_from_url(url) for url in urls}
+    print(f"Fetching {len(urls)} Wikipedia pages through {api_url} (include_text={include_text})")
+    pages = mediawiki_api.query_pages(titles.values(), user_agent, api_url, scheduler, batch_size)
+
+    results = {}
+    parsed = {} # resolved title -> triple, so redirects to one page are parsed once
+    for url, title in titles.items():
+        page = pages[title]
+        if not page["exists"]:
+            results[url] = None
+            continue
+        if not include_text:
+            # Same rule as the HTML extractor: titles with ":" are left out
+            page_links = sorted(article_url(_WIKIPEDIA_BASE_URL, link) for link in page["links"] if ":" not in link)
+            results[url] = ("", [], page_links, []) if include_infobox else ("", [], page_links)
+            continue
+        if page["title"] not in parsed:
+            html = mediawiki_api.parse_page_html(page["title"], user_agent, api_url, scheduler)
+            extractor = parse_with(_wrap_parser_output(html), WikipediaPageExtractor(), parser_backend)
+            parsed[page["title"]] = extractor.result() + (extractor.infobox_rows,)
+        results[url] = parsed[page["title"]] if include_infobox else parsed[page["title"]][:3]
+    return results
+
+
+# --- Link-graph crawl ---
+# Follows article links outward from seed pages, best-first: a heap orders the
+# frontier by a priority score (municipality_priority by default), so pages that
+# look like municipalities, or are linked from one, are fetched before the rest.
+# Visited titles go into a Bloom filter (~1.8 MB per million titles at the default
+# error rate) instead of a set of strings; a false positive only means a page is skipped.
+
+_PLACE_TITLE = re.compile(r"^[^,()]+, [A-Z][A-Za-z .'-]+$") # "Monowi, Nebraska"
+_MUNICIPALITY_WORDS = re.compile(
+    r"\b(?:city|town|township|village|borough|county|parish|municipality|hamlet|"
+    r"census-designated place|unincorporated community|ghost town)\b", re.IGNORECASE)
+_MUNICIPAL_CATEGORY = re.compile(
+    r"\b(?:cities|towns|villages|townships|boroughs|municipalities|populated places|counties|"
+    r"census-designated places|unincorporated communities|ghost towns)\b", re.IGNORECASE)
+_MUNICIPAL_SECTION = re.compile(
+    r"\b(?:communities|cities|towns|villages|townships|municipalities|places|settlements|localities)\b", re.IGNORECASE)
+
+
+def page_municipality_score(extractor):
+    """How much a parsed page looks like a municipality: settlement infobox and municipal categories."""
+    score = 0.0
+    if "ib-settlement" in extractor.infobox_classes:
+        score += 2.0
+    elif extractor.infobox_classes:
+        score += 0.5
+    score += min(3, sum(1 for category in extractor.categories if _MUNICIPAL_CATEGORY.search(category)))
+    return score
+
+
+def municipality_priority(title, anchor_text, section, parent_score, depth):
+    """Default crawl priority of an article link (higher is fetched sooner)."""
+    score = parent_score
+    if _PLACE_TITLE.match(title):
+        score += 2.0
+    if _MUNICIPALITY_WORDS.search(title) or _MUNICIPALITY_WORDS.search(anchor_text or ""):
+        score += 1.0
+    if section and _MUNICIPAL_SECTION.search(section):
+        score += 1.0
+    return score - depth # Shallower first among equals
+
+
+def _fetch_and_extract(url, headers, scheduler, link_classifier, parser_backend):
+    html = _fetch_page_html(url, headers, scheduler)
+    with metrics.timer("parse_seconds", module="wikipedia", mode="graph"):
+        return parse_with(html, WikipediaPageExtractor(link_classifier=link_classifier), parser_backend)
+
+
+def crawl_wikipedia_graph(seed_urls, user_agent, max_depth=2, max_pages=1000, priority=municipality_priority,
+                          scheduler=None, fetch_workers=8, output_path=None, parser_backend=None,
+                          visited_capacity=1000000, visited_error_rate=0.001, max_frontier=1000000,
+                          municipality_threshold=2.0, base_url=_WIKIPEDIA_BASE_URL):
+    """
+    Crawls the article link graph from seed_urls up to max_depth links away, fetching at most max_pages pages.
+    priority(title, anchor_text, section, parent_score, depth) ranks links; parent_score is
+    page_municipality_score of the page the link was found on.
+    output_path: optional sink (see output_sinks) for one page record per fetched page.
+    Returns a summary dict: page/error counts, timing, and "municipalities" - URLs of fetched pages
+    scoring at least municipality_threshold.
+    base_url selects the wiki (e.g. "https://de.wikipedia.org").
+    """
+    headers = {"User-Agent": user_agent}
+    link_classifier = LinkClassifier(base_url)
+    visited = BloomFilter(visited_capacity, visited_error_rate)
+    frontier = [] # Heap of (-priority, seq, depth, title)
+    seq = 0
+    for url in seed_urls:
+        kind, title = link_classifier.classify(url)
+        if kind == ARTICLE and visited.add(title):
+            frontier.append((-float("inf"), seq, 0, title))
+            seq += 1
+    heapq.heapify(frontier)
+
+    start_time = time.time()
+    summary = {"pages": 0, "errors": 0, "municipalities": []}
+    print(f"Crawling the Wikipedia link graph from {len(frontier)} seeds (max_depth={max_depth}, max_pages={max_pages})")
+
+    sink = open_sink(output_path) if output_path else None
+    pending = {} # future -> (url, depth)
+    started = 0
+    try:
+        with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool:
+            while True:
+                while frontier and len(pending) < fetch_workers and started < max_pages:
+                    _, _, depth, title = heapq.heappop(frontier)
+                    url = link_classifier.article_url(title) # Percent-encoded; also the URL recorded for the page
+                    pending[fetch_pool.submit(_fetch_and_extract, url, headers, scheduler, link_classifier, parser_backend)] = (url, depth)
+                    started += 1
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = pending.pop(future)
+                    try:
+                        extractor = future.result()
+                    except Exception as e:
+                        summary["errors"] += 1
+                        metrics.count("crawl_errors_total", crawl="wikipedia_graph", error=type(e).__name__)
+                        if sink is not None:
+                            sink.write_error(url, time.time(), e)
+                        continue
+
+                    summary["pages"] += 1
+                    metrics.count("crawl_pages_total", crawl="wikipedia_graph")
+                    metrics.set_gauge("frontier_size", len(frontier), crawl="wikipedia_graph")
+                    metrics.set_gauge("in_flight", len(pending), crawl="wikipedia_graph")
+                    page_score = page_municipality_score(extractor)
+                    if page_score >= municipality_threshold:
+                        summary["municipalities"].append(url)
+                    if sink is not None:
+                        main_text, tables_data, page_links = extractor.result()
+                        sink.write_page(url, time.time(), main_text, tables_data, page_links, extractor.infobox_rows)
+
+                    if depth >= max_depth:
+                        continue
+                    for kind, target, section, anchor_text in extractor.link_graph:
+                        if kind != "article" or len(frontier) >= max_frontier or target in visited:
+                            continue
+                        visited.add(target)
+                        link_priority = priority(target, anchor_text, section, page_score, depth + 1)
+                        heapq.heappush(frontier, (-link_priority, seq, depth + 1, target))
+                        seq += 1
+    finally:
+        if sink is not None:
+            sink.close()
+
+    summary["frontier"] = len(frontier)
+    summary["seconds"] = time.time() - start_time
+    print(f"  Crawled {summary['pages']} pages ({summary['errors']} errors, {len(summary['municipalities'])} municipalities) "
+          f"in {summary['seconds']:.2f} s; {summary['frontier']} links left in the frontier")
+    return summary
 
 
 if __name__ == "__main__":
@@ -121,7 +715,7 @@ if __name__ == "__main__":
 
     print(f"Starting Wikipedia scrape for: {target_url}\n")
     
-    article_text, all_tables, wiki_links = scrape_wikipedia_page(target_url, my_user_agent)
+    article_text, all_tables, wiki_links, infobox_rows = scrape_wikipedia_page(target_url, my_user_agent, include_infobox=True)
 
     if article_text:
         print("\n\n=== Main Article Text (Snippet) ===")
@@ -147,22 +741,19 @@ if __name__ == "__main__":
     else:
         print("\n\nNo Wikipedia links extracted.")
 
-    # --- Save tables to CSV files ---
-    if all_tables:
-        for i, table in enumerate(all_tables):
-            filename = f"wikipedia_table_{i+1}.csv"
-            with open(filename, "w", newline='', encoding="utf-8") as csvfile:
-                writer = csv.writer(csvfile)
-                for row in table:
-                    writer.writerow(row)
-            print(f"Saved table {i+1} to {filename}")
-
-    # --- Save links to a CSV file ---
-    if wiki_links:
-        links_filename = "wikipedia_links.csv"
-        with open(links_filename, "w", newline='', encoding="utf-8") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["Wikipedia Article Link"])
-            for link in wiki_links:
-                writer.writerow([link])
-        print(f"Saved {len(wiki_links)} links to {links_filename}")
+    # --- Save the page (text, every table, the links and the infobox) as records in one JSONL file ---
+    # Use a ".parquet" path for columnar output (needs pyarrow); municipality_attributes reads the infobox records
+    if article_text or all_tables or wiki_links:
+        output_filename = "wikipedia_pages.jsonl"
+        with open_sink(output_filename) as sink:
+            sink.write_page(target_url, time.time(), article_text, all_tables or [], wiki_links or [], infobox_rows)
+        print(f"Saved the page, {len(all_tables or [])} tables and {len(wiki_links or [])} links to {output_filename}")
+
+    # --- Bulk mode: scrape every article linked from the page above ---
+    # Fetches with a thread pool and parses in a process pool, writing records as it goes.
+    # scrape_wikipedia_pages_bulk(wiki_links, my_user_agent, output_path="wikipedia_bulk.parquet",
+    #                             fetch_workers=8, parse_workers=4)
+
+    # --- Link-graph crawl: follow links outward, municipality-looking pages first ---
+    # crawl_wikipedia_graph([target_url], my_user_agent, max_depth=2, max_pages=500,
+    #                       output_path="wikipedia_crawl.jsonl")
@@ -0,0 +1,302 @@
+import datetime
+import re
+from array import array
+
+# ==============================================================================
+# Wikitable normalization.
+# Turns the raw rows of a wikitable (cells with rowspan/colspan, see
+# WikipediaPageExtractor.table_cells) into a WikiTable:
+#   1. spans are expanded into a rectangular grid (a spanned cell's text is
+#      repeated in every slot it covers)
+#   2. the leading all-<th> rows become the header; stacked header rows are
+#      joined per column ("Population" over "2020" -> "Population 2020")
+#   3. every column is typed once, here, and stored column-oriented:
+#        "number"      array('d'), NaN where a cell is empty or not a number
+#        "date"        array('q') of days since 1970-01-01, MISSING_DATE where absent
+#        "coordinates" array('d') of lat, lon pairs (interleaved), NaN where absent
+#        "text"        list of str
+# The arrays support the buffer protocol, so e.g. numpy.frombuffer(column) or
+# numpy.frombuffer(dates, dtype="datetime64[D]") read them without copying.
+# ==============================================================================
+
+# Same value as numpy's NaT, so date columns map straight onto datetime64[D]
+MISSING_DATE = -(1 << 63)
+
+# Fraction of a column's non-empty cells that must parse for it to get that type
+TYPE_THRESHOLD = 0.8
+
+# HTML caps spans at these values; anything larger is a typo that would blow up the grid
+_MAX_COLSPAN = 1000
+_MAX_ROWSPAN = 65534
+
+# Placeholders editors put in empty cells; they never count against a column's type
+_MISSING_MARKERS = frozenset(["—", "–", "-", "?", "N/A", "n/a", "NA", "TBD", "unknown", "Unknown"])
+
+_NAN = float("nan")
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+_FOOTNOTE = re.compile(r"\[\s*(?:[a-z]|\d+|note \d+|citation needed|nb \d+)\s*\]", re.IGNORECASE)
+
+_NUMBER = re.compile(
+    r"^[~≈]?\s*[$€£¥]?\s*([-−–+]?)\s*(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*"
+    r"(?:%|km2|km²|sq\s?mi|mi2|mi²|sq\s?km|ha|acres|km|mi|m|ft)?$"
+)
+
+_MONTHS = {
+    name: number
+    for number, names in enumerate((
+        ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"),
+        ("may",), ("june", "jun"), ("july", "jul"), ("august", "aug"),
+        ("september", "sep", "sept"), ("october", "oct"), ("november", "nov"), ("december", "dec"),
+    ), start=1)
+    for name in names
+}
+_ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+_MDY_DATE = re.compile(r"^([A-Za-z]+)\.?\s+(\d{1,2}),?\s+(\d{4})$")
+_DMY_DATE = re.compile(r"^(\d{1,2})\s+([A-Za-z]+)\.?,?\s+(\d{4})$")
+
+# 40°25′N 86°53′W, 40.417°N 86.883°W, 40°25′12″N 86°53′24″W (minutes/seconds optional; ' and " accepted)
+_DMS_PART = r"(\d+(?:\.\d+)?)\s*°\s*(?:(\d+(?:\.\d+)?)\s*[′']\s*)?(?:(\d+(?:\.\d+)?)\s*[″\"]\s*)?([NSEW])"
+_DMS_COORDINATES = re.compile(_DMS_PART + r"[\s,]+" + _DMS_PART)
+# 40.417; -86.883 (the machine-readable form inside Wikipedia's {{coord}} output)
+_DECIMAL_COORDINATES = re.compile(r"([-−]?\d{1,2}\.\d+)\s*[;,]\s*([-−]?\d{1,3}\.\d+)")
+
+
+def expand_spans(rows):
+    """
+    Lays out rows of (text, rowspan, colspan, is_header) cells on a rectangular grid.
+    Returns (texts, header_flags), both lists of equal-length rows; slots no cell covers are "" / None.
+    """
+    texts = []
+    flags = []
+    carried = {} # column -> [rows still to fill, text, is_header] for cells spanning down
+    for row in rows:
+        row_texts = []
+        row_flags = []
+        col = 0
+        for text, rowspan, colspan, is_header in row:
+            while col in carried: # Slots taken by rowspans from rows above
+                col = _fill_carried(carried, col, row_texts, row_flags)
+            colspan = min(colspan, _MAX_COLSPAN)
+            rowspan = min(rowspan, _MAX_ROWSPAN)
+            for _ in range(colspan):
+                _place(row_texts, row_flags, col, text, is_header)
+                if rowspan > 1:
+                    carried[col] = [rowspan - 1, text, is_header]
+                col += 1
+        # Rowspans reaching past this row's last cell
+        for carried_col in sorted(c for c in carried if c >= col):
+            _fill_carried(carried, carried_col, row_texts, row_flags)
+        texts.append(row_texts)
+        flags.append(row_flags)
+
+    width = max((len(row) for row in texts), default=0)
+    for row_texts, row_flags in zip(texts, flags):
+        if len(row_texts) < width:
+            row_flags.extend([None] * (width - len(row_texts)))
+            row_texts.extend([""] * (width - len(row_texts)))
+    return texts, flags
+
+
+def _place(row_texts, row_flags, col, text, is_header):
+    if col >= len(row_texts):
+        row_texts.extend([""] * (col + 1 - len(row_texts)))
+        row_flags.extend([None] * (col + 1 - len(row_flags)))
+    row_texts[col] = text
+    row_flags[col] = is_header
+
+
+def _fill_carried(carried, col, row_texts, row_flags):
+    span = carried[col]
+    _place(row_texts, row_flags, col, span[1], span[2])
+    span[0] -= 1
+    if span[0] == 0:
+        del carried[col]
+    return col + 1
+
+
+def clean_cell(text):
+    """Cell text without footnote markers like "[ 3 ]" / "[a]" and with collapsed whitespace."""
+    if "[" in text:
+        text = _FOOTNOTE.sub("", text)
+    return " ".join(text.split())
+
+
+def parse_number(text):
+    """Float value of a cell like "1,234", "−3.5", "12%", "$4.2", "31.9 km2"; None if it isn't one."""
+    match = _NUMBER.match(text)
+    if match is None:
+        return None
+    sign, whole, fraction = match.groups()
+    value = float(whole.replace(",", "") + (fraction or ""))
+    return -value if sign and sign != "+" else value
+
+
+def parse_date(text):
+    """Days since 1970-01-01 for "2025-05-08", "May 8, 2025" or "8 May 2025"; None otherwise."""
+    match = _ISO_DATE.match(text)
+    if match is not None:
+        year, month, day = (int(group) for group in match.groups())
+    else:
+        match = _MDY_DATE.match(text)
+        if match is not None:
+            month_name, day, year = match.groups()
+        else:
+            match = _DMY_DATE.match(text)
+            if match is None:
+                return None
+            day, month_name, year = match.groups()
+        month = _MONTHS.get(month_name.lower())
+        if month is None:
+            return None
+        year, day = int(year), int(day)
+    try:
+        return datetime.date(year, month, day).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        return None
+
+
+def _dms_to_degrees(degrees, minutes, seconds, hemisphere):
+    value = float(degrees) + float(minutes or 0) / 60 + float(seconds or 0) / 3600
+    return -value if hemisphere in "SW" else value
+
+
+def parse_coordinates(text):
+    """(lat, lon) in decimal degrees from DMS ("40°25′N 86°53′W") or decimal ("40.4; -86.9") text; None otherwise."""
+    match = _DMS_COORDINATES.search(text)
+    if match is not None:
+        groups = match.groups()
+        first = _dms_to_degrees(*groups[:4])
+        second = _dms_to_degrees(*groups[4:])
+        if groups[3] in "EW": # Written lon-first
+            first, second = second, first
+        return first, second
+    match = _DECIMAL_COORDINATES.search(text)
+    if match is not None:
+        lat, lon = (float(group.replace("−", "-")) for group in match.groups())
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            return lat, lon
+    return None
+
+
+def _infer_type(values):
+    # Tries the narrowest types first; each parser runs once per cell at most
+    present = [value for value in values if value and value not in _MISSING_MARKERS]
+    if not present:
+        return "text", None
+    needed = TYPE_THRESHOLD * len(present)
+    for column_type, parser in (("number", parse_number), ("date", parse_date), ("coordinates", parse_coordinates)):
+        parsed = []
+        misses = 0
+        for value in present:
+            result = parser(value)
+            if result is None:
+                misses += 1
+                if misses > len(present) - needed:
+                    break
+            parsed.append(result)
+        else:
+            return column_type, dict(zip(present, parsed))
+    return "text", None
+
+
+def _typed_column(values, column_type, parsed):
+    if column_type == "number":
+        return array("d", [_NAN if parsed.get(value) is None else parsed[value] for value in values])
+    if column_type == "date":
+        return array("q", [MISSING_DATE if parsed.get(value) is None else parsed[value] for value in values])
+    if column_type == "coordinates":
+        column = array("d")
+        for value in values:
+            column.extend(parsed.get(value) or (_NAN, _NAN))
+        return column
+    return list(values)
+
+
+class WikiTable:
+    """
+    One normalized wikitable.
+    header: column names, in order (unique; repeated names get " (2)", " (3)", ...).
+    columns: name -> typed column (see the module comment); column_types: name -> type name.
+    """
+
+    def __init__(self, header, columns, column_types, n_rows):
+        self.header = header
+        self.columns = columns
+        self.column_types = column_types
+        self.n_rows = n_rows
+
+    @property
+    def n_columns(self):
+        return len(self.header)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def row(self, index):
+        """Row index as a list of Python values (None for missing; dates as datetime.date, coordinates as (lat, lon))."""
+        values = []
+        for name in self.header:
+            column, column_type = self.columns[name], self.column_types[name]
+            if column_type == "number":
+                value = column[index]
+                values.append(None if value != value else value)
+            elif column_type == "date":
+                value = column[index]
+                values.append(None if value == MISSING_DATE else datetime.date.fromordinal(value + _EPOCH_ORDINAL))
+            elif column_type == "coordinates":
+                lat, lon = column[2 * index], column[2 * index + 1]
+                values.append(None if lat != lat else (lat, lon))
+            else:
+                values.append(column[index])
+        return values
+
+    def __repr__(self):
+        return f"<WikiTable {self.n_rows} rows x {self.n_columns} columns: {self.column_types}>"
+
+
+def _header_names(header_rows, width):
+    names = []
+    for col in range(width):
+        parts = []
+        for row in header_rows:
+            text = row[col]
+            if text and (not parts or parts[-1] != text): # A colspan'd group label is only used once
+                parts.append(text)
+        names.append(" ".join(parts) or f"column_{col + 1}")
+    seen = {}
+    for i, name in enumerate(names):
+        count = seen.get(name, 0) + 1
+        seen[name] = count
+        if count > 1:
+            names[i] = f"{name} ({count})"
+    return names
+
+
+def _is_header_row(row_flags):
+    # Every cell the row has is a <th>; uncovered slots (None) don't count either way
+    return any(row_flags) and all(flag or flag is None for flag in row_flags)
+
+
+def normalize_table(rows):
+    """
+    Builds a WikiTable from raw rows of (text, rowspan, colspan, is_header) cells.
+    All-<th> rows after the header (repeated headers, section captions) are dropped from the data.
+    """
+    texts, flags = expand_spans(rows)
+    width = len(texts[0]) if texts else 0
+
+    header_count = 0
+    while header_count < len(texts) and _is_header_row(flags[header_count]):
+        header_count += 1
+    header = _header_names([[clean_cell(text) for text in row] for row in texts[:header_count]], width)
+
+    body = [row for row, row_flags in zip(texts[header_count:], flags[header_count:]) if not _is_header_row(row_flags)]
+    columns = {}
+    column_types = {}
+    for col, name in enumerate(header):
+        values = [clean_cell(row[col]) for row in body]
+        column_type, parsed = _infer_type(values)
+        columns[name] = _typed_column(values, column_type, parsed)
+        column_types[name] = column_type
+    return WikiTable(header, columns, column_types, len(body))